@@ -0,0 +1,59 @@
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+from birdpy.cards import BuildReport, CardIndex, build_entries, write_thin_list
+from birdpy.jsonout import write_stream
+
+# Define paths
+CARD_LIST_PATH = os.path.join('apestudio', 'list', 'cardList.csv')
+NFT_LIST_PATH = os.path.join('apestudio', 'list', 'apesnftlist.csv')
+THIN_NFT_LIST_PATH = os.path.join('apestudio', 'list', 'apesnftlist-thin.csv')
+JSON_OUTPUT_PATH = os.path.join('apestudio', 'list', 'apes_metadata.json')
+REPORT_OUTPUT_PATH = os.path.join('apestudio', 'list', 'build_report.json')
+
+def build_metadata(nft_list_path=NFT_LIST_PATH, write_thin=False):
+    """
+    Builds apes_metadata.json by joining the NFT list against cardList.csv.
+
+    cardList.csv is loaded once into an index keyed by Card Id, so the NFT
+    list only needs nftId, cardId, fortune, power and rarity. Orphan card ids,
+    cards without exactly 10 editions and name/bitcoinText/sticker values
+    that disagree with cardList.csv are reported in build_report.json.
+
+    Args:
+        nft_list_path: apesnftlist.csv or a thin list with only the NFT columns.
+        write_thin: Also write the thin list to THIN_NFT_LIST_PATH.
+    """
+    for path in (CARD_LIST_PATH, nft_list_path):
+        if not os.path.exists(path):
+            print(f"Error: File not found: {path}")
+            return
+
+    try:
+        cards = CardIndex.from_csv(CARD_LIST_PATH)
+        report = BuildReport()
+        entry_count = write_stream(build_entries(nft_list_path, cards, report), JSON_OUTPUT_PATH)
+
+        with open(REPORT_OUTPUT_PATH, 'w', encoding='utf-8') as f:
+            json.dump(report.to_dict(), f, indent=2)
+
+        if write_thin:
+            write_thin_list(nft_list_path, THIN_NFT_LIST_PATH)
+            print(f"Thin NFT list saved to: {THIN_NFT_LIST_PATH}")
+
+        print(f"Loaded {len(cards)} cards. Wrote {entry_count} entries to: {JSON_OUTPUT_PATH}")
+        if report.ok:
+            print("No data problems found.")
+        else:
+            print(f"Orphan card ids: {sorted(report.orphans)}")
+            print(f"Cards with the wrong edition count: {report.edition_counts}")
+            print(f"Mismatched fields: {len(report.mismatches)}, conflicting cardList rows: {len(report.card_conflicts)}, skipped rows: {len(report.skipped)}")
+            print(f"Details in: {REPORT_OUTPUT_PATH}")
+
+    except Exception as e:
+        print(f"An unexpected error occurred: {e}")
+
+if __name__ == "__main__":
+    build_metadata()
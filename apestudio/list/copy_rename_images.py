@@ -1,24 +1,58 @@
 import csv
+import json
 import os
-import shutil
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+from birdpy import instrument
+from birdpy.fanout import fan_out
+from birdpy.imageindex import ImageIndex
+from birdpy.renditions import DEFAULT_PROFILES, render_fan_out
+from birdpy.verify import format_report, verify
 
 # Define paths
 SOURCE_CSV_FILE = os.path.join('apestudio', 'list', 'apesnftlist.csv')
 SOURCE_IMAGES_DIR = os.path.join('apestudio', 'list', 'monkeyCards')
 DEST_IMAGES_DIR = os.path.join('apestudio', 'list', 'monkeyNfts')
+RENDITIONS_DIR = os.path.join('apestudio', 'list', 'renditions')
+IMAGE_INDEX_PATH = os.path.join(SOURCE_IMAGES_DIR, '.imageindex.sqlite')
+
+# dHash bits two card images may differ in before they are reported as look-alikes
+LOOK_ALIKE_DISTANCE = 2
 
-def copy_and_rename_images():
+def source_image_name(card_id):
+    """Name of the monkeyCards image for a cardId."""
+    # Handle the special case for cardId '85'
+    if card_id == '85':
+        return '085.webp'
+    return f"{card_id}.webp"
+
+def copy_and_rename_images(render_dir=None, profiles=DEFAULT_PROFILES):
     """
     Reads cardId and fileName from apesnftlist.csv,
     copies images from monkeyCards, and renames them in monkeyNfts.
+    Each card image is hashed once and every NFT is hardlinked (or reflinked)
+    to it on a thread pool; files that already match are left alone and an
+    interrupted run resumes from its journal.
+
+    With render_dir (e.g. RENDITIONS_DIR) every card is also rendered once
+    per profile and linked to its NFTs under render_dir/<profile name>.
     """
-    # Create destination directory if it doesn't exist
-    if not os.path.exists(DEST_IMAGES_DIR):
-        os.makedirs(DEST_IMAGES_DIR)
-        print(f"Created directory: {DEST_IMAGES_DIR}")
+    warning_count = 0
+    instrumentation = instrument.get()
 
-    copied_count = 0
-    error_count = 0
+    def plan(reader):
+        nonlocal warning_count
+        for row in reader:
+            card_id = row['cardId']
+            file_name = row['fileName']
+
+            if not card_id or not file_name:
+                instrumentation.warn('missing_card_id', f"Warning: Missing cardId or fileName in row: {row}", row=row)
+                warning_count += 1
+                continue
+
+            yield source_image_name(card_id), file_name
 
     try:
         with open(SOURCE_CSV_FILE, 'r', newline='', encoding='utf-8') as csvfile:
@@ -28,47 +62,90 @@ def copy_and_rename_images():
                 print(f"Error: 'cardId' or 'fileName' column not found in {SOURCE_CSV_FILE}")
                 return
 
-            for row in reader:
-                try:
-                    card_id = row['cardId']
-                    file_name = row['fileName']
-
-                    if not card_id or not file_name:
-                        print(f"Warning: Missing cardId or fileName in row: {row}")
-                        error_count += 1
-                        continue
-
-                    # Handle the special case for cardId '85'
-                    if card_id == '85':
-                        source_image_name = '085.webp'
-                    else:
-                        source_image_name = f"{card_id}.webp"
-                    
-                    source_image_path = os.path.join(SOURCE_IMAGES_DIR, source_image_name)
-                    
-                    destination_image_path = os.path.join(DEST_IMAGES_DIR, file_name)
-
-                    if os.path.exists(source_image_path):
-                        shutil.copy2(source_image_path, destination_image_path)
-                        # print(f"Copied {source_image_path} to {destination_image_path}")
-                        copied_count += 1
-                    else:
-                        print(f"Error: Source image not found: {source_image_path}")
-                        error_count += 1
-                
-                except Exception as e:
-                    print(f"Error processing row {row}: {e}")
-                    error_count += 1
+            if not os.path.exists(DEST_IMAGES_DIR):
+                print(f"Created directory: {DEST_IMAGES_DIR}")
+            items = list(plan(reader))
+        with instrumentation.stage('apes-fan-out'):
+            result = fan_out(items, SOURCE_IMAGES_DIR, DEST_IMAGES_DIR)
+
+        for source_name, _ in result.missing_sources:
+            path = os.path.join(SOURCE_IMAGES_DIR, source_name)
+            instrumentation.warn('missing_source', f"Error: Source image not found: {path}", level='error', path=path)
+        for file_name, error in result.errors:
+            instrumentation.warn('copy_failed', f"Error processing {file_name}: {error}", level='error',
+                                 file=file_name, error=error)
+        error_count = warning_count + len(result.missing_sources) + len(result.errors)
 
         print(f"\nScript finished.")
-        print(f"Successfully copied {copied_count} images.")
+        print(f"Successfully copied {result.created} images.")
+        print(f"Skipped {result.skipped + result.resumed} images that were already up to date.")
         if error_count > 0:
             print(f"Encountered {error_count} errors/warnings.")
 
+        if render_dir:
+            with instrumentation.stage('apes-render'):
+                renders = render_fan_out(items, SOURCE_IMAGES_DIR, render_dir, profiles)
+            for source_name, profile_name, error in renders.errors:
+                instrumentation.warn('render_failed', f"Error rendering {source_name} ({profile_name}): {error}",
+                                     level='error', file=source_name, profile=profile_name, error=error)
+            print(f"Rendered {renders.rendered} images ({renders.cached} cached) "
+                  f"from {renders.sources} distinct cards.")
+
     except FileNotFoundError:
         print(f"Error: Source CSV file not found: {SOURCE_CSV_FILE}")
     except Exception as e:
         print(f"An unexpected error occurred: {e}")
 
+def verify_images(report_path=None):
+    """
+    Checks that monkeyNfts has exactly one image per row of apesnftlist.csv,
+    each with the content of its cardId's monkeyCards image
+    (birdpy.verify). With report_path the report is also written as JSON.
+
+    Returns:
+        bool: True if nothing is missing, extra, mismatched or stale.
+    """
+    with open(SOURCE_CSV_FILE, 'r', newline='', encoding='utf-8') as csvfile:
+        items = [(source_image_name(row['cardId']), row['fileName'])
+                 for row in csv.DictReader(csvfile) if row['cardId'] and row['fileName']]
+    with instrument.get().stage('apes-verify'):
+        report = verify(items, SOURCE_IMAGES_DIR, DEST_IMAGES_DIR)
+    print(format_report(report))
+    if report_path:
+        with open(report_path, 'w', encoding='utf-8') as f:
+            json.dump(report.to_dict(), f, indent=2)
+    return report.ok
+
+def check_card_images(max_distance=LOOK_ALIKE_DISTANCE):
+    """
+    QA of monkeyCards before the copy: every card should have its own image.
+    Byte-identical card images are errors (their NFTs would be identical
+    too); cards that only look alike (birdpy.imageindex dHash) are listed
+    to be checked by eye.
+
+    Returns:
+        bool: True if no two card images are byte-identical.
+    """
+    with instrument.get().stage('apes-image-check'):
+        with ImageIndex(IMAGE_INDEX_PATH) as index:
+            index.update([SOURCE_IMAGES_DIR])
+            identical = list(index.duplicates([SOURCE_IMAGES_DIR]).values())
+            look_alike = index.near_duplicates(max_distance, [SOURCE_IMAGES_DIR])
+    for paths in identical:
+        print(f"Error: identical card images: {', '.join(os.path.basename(path) for path in paths)}")
+    for distance, a, b in look_alike:
+        print(f"Warning: {os.path.basename(a)} and {os.path.basename(b)} look alike ({distance} bits apart)")
+    print(f"{len(identical)} group(s) of identical card images, {len(look_alike)} look-alike pair(s).")
+    return not identical
+
 if __name__ == "__main__":
-    copy_and_rename_images() 
\ No newline at end of file
+    if '--check-images' in sys.argv[1:]:
+        ok = check_card_images()
+        instrument.get().report()
+        sys.exit(0 if ok else 1)
+    if '--verify' in sys.argv[1:]:
+        ok = verify_images()
+        instrument.get().report()
+        sys.exit(0 if ok else 1)
+    copy_and_rename_images()
+    instrument.get().report()
\ No newline at end of file
@@ -1,22 +1,112 @@
 import csv
-import json
 import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+from birdpy import instrument
+from birdpy.jsonout import write_shards, write_stream
 
 CSV_FILE_PATH = os.path.join('apestudio', 'list', 'apesnftlist.csv')
 JSON_OUTPUT_PATH = os.path.join('apestudio', 'list', 'apes_metadata.json')
+JSONL_OUTPUT_PATH = os.path.join('apestudio', 'list', 'apes_metadata.jsonl')
+SHARDS_OUTPUT_DIR = os.path.join('apestudio', 'list', 'metadata')
 
-def convert_csv_to_json():
+def build_entries(reader):
     """
-    Converts data from apesnftlist.csv to a structured JSON file.
+    Yields one JSON entry per CSV row, as the rows are read.
     The meta.name field will include a cycling sequence number (1-10)
     based on the occurrences of each cardId.
     """
+    card_id_counters = {} # To track the sequence for each cardId
+    instrumentation = instrument.get()
+    progress = instrumentation.progress('csv-to-json')
+
+    for row in reader:
+        progress.update()
+        try:
+            current_card_id = row.get('cardId', '').strip()
+            original_name = row.get('name', '').strip()
+
+            if not current_card_id:
+                instrumentation.warn('missing_card_id', f"Warning: Skipping row due to missing or empty cardId: {row}", row=row)
+                continue
+            if not original_name:
+                 instrumentation.warn('missing_name', f"Warning: Skipping row due to missing or empty name for cardId {current_card_id}: {row}", row=row)
+                 continue
+
+
+            # Increment counter for the current cardId
+            card_id_counters[current_card_id] = card_id_counters.get(current_card_id, 0) + 1
+            
+            # Calculate sequence number (1-10, cycling)
+            sequence_num = ((card_id_counters[current_card_id] - 1) % 10) + 1
+            
+            meta_name = f"{original_name} #{sequence_num}"
+
+            attributes = [
+                {"trait_type": "nftId", "value": row.get('nftId', '')},
+                {"trait_type": "name", "value": original_name},
+                {"trait_type": "cardId", "value": current_card_id},
+                {"trait_type": "bitcoinText", "value": row.get('bitcoinText', '')},
+                {"trait_type": "sticker", "value": row.get('sticker', '')},
+                {"trait_type": "fortune", "value": row.get('fortune', '')},
+                {"trait_type": "power", "value": row.get('power', '')},
+                {"trait_type": "rarity", "value": row.get('rarity', '')}
+            ]
+            
+            # Filter out attributes where value might be None from a missing column in a row (though header check exists)
+            # or if explicitly empty and you want to exclude them.
+            # For this implementation, we keep them as empty strings if CSV has empty values for them.
+            # attributes = [attr for attr in attributes if attr['value'] is not None]
+
+
+            yield {
+                "file": row.get('fileName', ''),
+                "meta": {
+                    "name": meta_name,
+                    "attributes": attributes
+                }
+            }
+
+        except Exception as e:
+            instrumentation.warn('bad_row', f"Error processing row: {row}. Error: {e}", level='error', row=row, error=str(e))
+            continue # Skip rows that cause an error
+
+    progress.close()
+
+def shard_name(entry):
+    """<nftId>.json, the per-token layout marketplaces ingest; None (skipped) without an nftId."""
+    nft_id = str(entry['meta']['attributes'][0]['value']).strip()
+    if not nft_id:
+        instrument.get().warn('missing_nft_id', f"Warning: No shard for {entry['file'] or entry['meta']['name']}: missing nftId")
+        return None
+    return f"{nft_id}.json"
+
+def convert_csv_to_json(output_format='json', compact=False, output_path=None):
+    """
+    Converts data from apesnftlist.csv to a structured JSON file.
+    Entries are written as they are built, so memory does not grow with
+    the collection size.
+
+    Args:
+        output_format: 'json' for one array (apes_metadata.json), 'ndjson' for
+            one entry per line, or 'sharded' for one <nftId>.json per token.
+        compact: Write without indentation or spaces.
+        output_path: Output file (or folder for 'sharded'). Defaults to
+            JSON_OUTPUT_PATH, JSONL_OUTPUT_PATH or SHARDS_OUTPUT_DIR.
+
+    Returns:
+        bool: True if at least one entry was written.
+    """
     if not os.path.exists(CSV_FILE_PATH):
         print(f"Error: CSV file not found at {CSV_FILE_PATH}")
-        return
+        return False
 
-    json_data_list = []
-    card_id_counters = {} # To track the sequence for each cardId
+    if output_path is None:
+        output_path = {'json': JSON_OUTPUT_PATH, 'ndjson': JSONL_OUTPUT_PATH, 'sharded': SHARDS_OUTPUT_DIR}.get(output_format)
+    if output_path is None:
+        print(f"Error: Unknown output format: {output_format}")
+        return False
 
     try:
         with open(CSV_FILE_PATH, mode='r', newline='', encoding='utf-8') as csvfile:
@@ -24,85 +114,41 @@ def convert_csv_to_json():
             
             if not reader.fieldnames:
                 print(f"Error: CSV file {CSV_FILE_PATH} is empty or has no header.")
-                return
+                return False
 
             required_columns = ['fileName', 'name', 'nftId', 'cardId', 'bitcoinText', 'sticker', 'fortune', 'power', 'rarity']
             missing_columns = [col for col in required_columns if col not in reader.fieldnames]
             if missing_columns:
                 print(f"Error: Missing required columns in CSV: {', '.join(missing_columns)}")
-                return
-
-            for row in reader:
-                try:
-                    current_card_id = row.get('cardId', '').strip()
-                    original_name = row.get('name', '').strip()
-
-                    if not current_card_id:
-                        print(f"Warning: Skipping row due to missing or empty cardId: {row}")
-                        continue
-                    if not original_name:
-                         print(f"Warning: Skipping row due to missing or empty name for cardId {current_card_id}: {row}")
-                         continue
-
-
-                    # Increment counter for the current cardId
-                    card_id_counters[current_card_id] = card_id_counters.get(current_card_id, 0) + 1
-                    
-                    # Calculate sequence number (1-10, cycling)
-                    sequence_num = ((card_id_counters[current_card_id] - 1) % 10) + 1
-                    
-                    meta_name = f"{original_name} #{sequence_num}"
-
-                    attributes = [
-                        {"trait_type": "nftId", "value": row.get('nftId', '')},
-                        {"trait_type": "name", "value": original_name},
-                        {"trait_type": "cardId", "value": current_card_id},
-                        {"trait_type": "bitcoinText", "value": row.get('bitcoinText', '')},
-                        {"trait_type": "sticker", "value": row.get('sticker', '')},
-                        {"trait_type": "fortune", "value": row.get('fortune', '')},
-                        {"trait_type": "power", "value": row.get('power', '')},
-                        {"trait_type": "rarity", "value": row.get('rarity', '')}
-                    ]
-                    
-                    # Filter out attributes where value might be None from a missing column in a row (though header check exists)
-                    # or if explicitly empty and you want to exclude them.
-                    # For this implementation, we keep them as empty strings if CSV has empty values for them.
-                    # attributes = [attr for attr in attributes if attr['value'] is not None]
-
-
-                    json_entry = {
-                        "file": row.get('fileName', ''),
-                        "meta": {
-                            "name": meta_name,
-                            "attributes": attributes
-                        }
-                    }
-                    json_data_list.append(json_entry)
-
-                except Exception as e:
-                    print(f"Error processing row: {row}. Error: {e}")
-                    continue # Skip rows that cause an error
-
-        if not json_data_list:
-            print("No data processed. Output JSON will be empty or not created.")
-            return
+                return False
+
+            # Write the JSON data to file
+            output_dir = output_path if output_format == 'sharded' else os.path.dirname(output_path)
+            if not os.path.exists(output_dir) and output_dir: # Ensure output_dir is not an empty string
+                 os.makedirs(output_dir)
+                 print(f"Created directory: {output_dir}")
 
-        # Write the JSON data to file
-        output_dir = os.path.dirname(JSON_OUTPUT_PATH)
-        if not os.path.exists(output_dir) and output_dir: # Ensure output_dir is not an empty string
-             os.makedirs(output_dir)
-             print(f"Created directory: {output_dir}")
-             
-        with open(JSON_OUTPUT_PATH, 'w', encoding='utf-8') as jsonfile:
-            json.dump(json_data_list, jsonfile, indent=2) # indent=2 for pretty printing
+            with instrument.get().stage('csv-to-json'):
+                if output_format == 'sharded':
+                    entry_count = write_shards(build_entries(reader), output_path, shard_name, compact=compact)
+                else:
+                    entry_count = write_stream(build_entries(reader), output_path, output_format, compact=compact)
+
+        if not entry_count:
+            print("No data processed. Output JSON will be empty or not created.")
+            return False
 
-        print(f"Successfully converted CSV to JSON. Output saved to: {JSON_OUTPUT_PATH}")
-        print(f"Total entries processed: {len(json_data_list)}")
+        print(f"Successfully converted CSV to JSON. Output saved to: {output_path}")
+        print(f"Total entries processed: {entry_count}")
+        return True
 
     except FileNotFoundError:
         print(f"Error: Could not find the CSV file at {CSV_FILE_PATH}")
     except Exception as e:
         print(f"An unexpected error occurred: {e}")
+    return False
 
 if __name__ == "__main__":
-    convert_csv_to_json() 
\ No newline at end of file
+    ok = convert_csv_to_json()
+    instrument.get().report()
+    sys.exit(0 if ok else 1)
@@ -0,0 +1,233 @@
+"""
+Benchmarks of the collection scripts on synthetic data.
+
+    python benchmarks/run.py                               # scales 1000, 10000, 100000
+    python benchmarks/run.py --scale 1000000 --only dedup
+    python benchmarks/run.py --compare benchmarks/results/<old>.json
+
+For every scale a synthetic collection is generated (birdpy.synthetic) and
+each script function runs on it the way the scripts run it: a few timed
+repeats, then one more run under tracemalloc for the peak Python memory.
+Results go to a JSON file (benchmarks/results/<commit>-<time>.json by
+default) that --compare can diff against a later run.
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import runpy
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timezone
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+from birdpy.synthetic import generate_collection
+
+DEFAULT_SCALES = (1_000, 10_000, 100_000)
+RESULTS_DIR = os.path.join(ROOT, 'benchmarks', 'results')
+
+
+def script(*parts):
+    return runpy.run_path(os.path.join(ROOT, *parts))
+
+
+# Each benchmark: setup(data, work) -> function to time. setup runs once per
+# scale; the function must do the full job again on every call and return
+# the script's result, which is falsy when the script failed.
+
+def bench_dedup(data, work):
+    extrair = script('tlbpy', 'list.py')['extrair_enderecos_unicos']
+    source = os.path.join(data, 'tlbpy', 'tlbmints.csv')
+    return lambda: extrair(source, os.path.join(work, 'tlbhlist.csv'))
+
+
+def bench_drop_gen(data, work):
+    holders = os.path.join(work, 'holders.csv')
+    script('tlbpy', 'list.py')['extrair_enderecos_unicos'](os.path.join(data, 'tlbpy', 'tlbmints.csv'), holders)
+    runner = script('nftdropbananasbirdpy', 'codetrait.py')['main_script_runner']
+    # Point the script's configuration at the synthetic data
+    runner.__globals__.update(
+        INPUT_CSV_FILE_PATH=holders,
+        OUTPUT_CSV_FILE_PATH=os.path.join(work, 'clarCodeTrait.csv'),
+        CONTRACTS_DIR_PATH=os.path.join(work, 'contracts'),
+    )
+    return runner
+
+
+def bench_json_to_csv(data, work):
+    json_to_csv = script('nftspy', 'mergedata.py')['json_to_csv']
+    folder = os.path.join(data, 'nftspy', 'metadata')
+    index = os.path.join(folder, '.metaindex.sqlite')
+
+    def run():
+        # cold: without the incremental index every file is parsed
+        if os.path.exists(index):
+            os.unlink(index)
+        return json_to_csv(folder, os.path.join(work, 'metadata.csv'))
+    return run
+
+
+def bench_json_to_csv_warm(data, work):
+    json_to_csv = script('nftspy', 'mergedata.py')['json_to_csv']
+    folder = os.path.join(data, 'nftspy', 'metadata')
+    json_to_csv(folder, os.path.join(work, 'metadata.csv'))
+    return lambda: json_to_csv(folder, os.path.join(work, 'metadata.csv'))
+
+
+def bench_csv_to_json(data, work):
+    convert = script('apestudio', 'list', 'csv_to_json_converter.py')['convert_csv_to_json']
+    output = os.path.join(work, 'apes_metadata.json')
+
+    def run():
+        # the converter reads apestudio/list/apesnftlist.csv relative to the working folder
+        cwd = os.getcwd()
+        os.chdir(data)
+        try:
+            return convert(output_path=output)
+        finally:
+            os.chdir(cwd)
+    return run
+
+
+def bench_fan_out(data, work):
+    processar_csv = script('nftspy', 'Nfts.py')['processar_csv']
+    metadata_csv = os.path.join(data, 'nftspy', 'metadata.csv')
+    sources = os.path.join(data, 'nftspy', 'webp')
+    destination = os.path.join(work, 'nfts')
+
+    def run():
+        shutil.rmtree(destination, ignore_errors=True)
+        return processar_csv(metadata_csv, sources, destination)
+    return run
+
+
+BENCHMARKS = {
+    'dedup': bench_dedup,
+    'drop-gen': bench_drop_gen,
+    'json-to-csv': bench_json_to_csv,
+    'json-to-csv-warm': bench_json_to_csv_warm,
+    'csv-to-json': bench_csv_to_json,
+    'fan-out': bench_fan_out,
+}
+
+
+def measure(run, repeats, memory):
+    """
+    Times repeats calls of run (stdout silenced) and optionally one more
+    under tracemalloc. "ok" is false when a call returned a falsy result:
+    the script failed, and the times are not those of the full job.
+    """
+    seconds = []
+    ok = True
+    for _ in range(repeats):
+        with contextlib.redirect_stdout(io.StringIO()):
+            start = time.perf_counter()
+            ok = bool(run()) and ok
+            seconds.append(time.perf_counter() - start)
+    result = {"ok": ok, "seconds": seconds, "best": min(seconds), "median": statistics.median(seconds)}
+    if memory:
+        tracemalloc.start()
+        try:
+            with contextlib.redirect_stdout(io.StringIO()):
+                run()
+            result["peak_python_bytes"] = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+    return result
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_benchmarks(scales, names, repeats=3, memory=True, seed=0, data_dir=None):
+    results = []
+    for scale in scales:
+        data = os.path.join(data_dir, str(scale)) if data_dir else tempfile.mkdtemp(prefix=f'birdbench-{scale}-')
+        try:
+            if not os.path.exists(os.path.join(data, 'tlbpy')):
+                generated = generate_collection(data, scale, seed)
+                print(f"scale {scale}: generated in {sum(generated.values()):.1f}s")
+            for name in names:
+                with tempfile.TemporaryDirectory(prefix=f'birdbench-{name}-') as work:
+                    with contextlib.redirect_stdout(io.StringIO()):
+                        run = BENCHMARKS[name](data, work)
+                    result = {"benchmark": name, "scale": scale, **measure(run, repeats, memory)}
+                result["items_per_second"] = scale / result["best"] if result["best"] else None
+                results.append(result)
+                peak = result.get("peak_python_bytes")
+                print(f"  {name:18} best {result['best']:8.3f}s  median {result['median']:8.3f}s"
+                      + (f"  peak {peak / 2**20:8.1f} MiB" if peak is not None else "")
+                      + ("" if result["ok"] else "  FAILED"))
+        finally:
+            if not data_dir:
+                shutil.rmtree(data, ignore_errors=True)
+    return results
+
+
+def compare(baseline_path, results):
+    """Prints new/old best time per benchmark and scale present in both runs."""
+    with open(baseline_path, 'r', encoding='utf-8') as f:
+        baseline = {(r["benchmark"], r["scale"]): r for r in json.load(f)["results"]}
+    print(f"\ncompared with {baseline_path} (ratio < 1 is faster)")
+    for result in results:
+        old = baseline.get((result["benchmark"], result["scale"]))
+        if old and old["best"]:
+            print(f"  {result['benchmark']:18} {result['scale']:>9}  {result['best'] / old['best']:6.2f}x")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the collection scripts on synthetic data.")
+    parser.add_argument('--scale', dest='scales', type=int, action='append', help="tokens / rows; repeatable")
+    parser.add_argument('--only', dest='names', action='append', choices=sorted(BENCHMARKS))
+    parser.add_argument('--repeats', type=int, default=3)
+    parser.add_argument('--no-memory', dest='memory', action='store_false', help="skip the tracemalloc run")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--data-dir', help="keep the generated collections here and reuse them")
+    parser.add_argument('--output', help="results JSON (default benchmarks/results/<commit>-<time>.json)")
+    parser.add_argument('--compare', metavar='JSON', help="earlier results to compare against")
+    args = parser.parse_args(argv)
+
+    commit = git_commit()
+    started = datetime.now(timezone.utc)
+    results = run_benchmarks(args.scales or DEFAULT_SCALES, args.names or list(BENCHMARKS), args.repeats,
+                             args.memory, args.seed, args.data_dir)
+    report = {
+        "commit": commit,
+        "created": started.isoformat(timespec='seconds'),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "seed": args.seed,
+        "results": results,
+    }
+    output = args.output
+    if output is None:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        output = os.path.join(RESULTS_DIR, f"{commit or 'nocommit'}-{started:%Y%m%dT%H%M%S}.json")
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+    print(f"results: {output}")
+    if args.compare:
+        compare(args.compare, results)
+    failed = [f"{result['benchmark']} at {result['scale']}" for result in results if not result["ok"]]
+    if failed:
+        print(f"failed: {', '.join(failed)}", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,4 @@
+"""
+Shared helpers for the collection scripts (nftspy, apestudio, tlbpy, apespy
+and the nftdrop generators).
+"""
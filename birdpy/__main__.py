@@ -0,0 +1,5 @@
+import sys
+
+from birdpy.cli import main
+
+sys.exit(main())
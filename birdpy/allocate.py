@@ -0,0 +1,229 @@
+import csv
+import random
+from array import array
+from bisect import bisect_right
+
+try:
+    import numpy as np
+except ImportError:  # NumPy is optional; the pure Python path gives the same allocation
+    np = None
+
+from birdpy import fastcsv
+from birdpy.atomic import atomic_open
+from birdpy.dedup import DEFAULT_MEMORY_BUDGET, canonical_counts, count_unique, read_column
+from birdpy.dropgen import drop_line
+from birdpy.principal import InvalidPrincipal, intern_principal
+
+
+class AllocationRule:
+    """
+    How many drops a holder gets for its mints.
+
+    drops = (mints // per) * drops, for holders with at least minimum mints,
+    then capped: by cap, and by the cap of the highest tier the holder
+    reaches when tiers are given.
+
+    Args:
+        per: Mints needed for one unit of drops (the M in "N per M").
+        drops: Drops per unit (the N).
+        minimum: Holders with fewer mints get nothing.
+        cap: Maximum drops for any holder.
+        tiers: Sequence of (minimum mints, maximum drops), e.g.
+            [(1, 1), (5, 3), (20, 10)]. Holders below the first tier get nothing.
+    """
+
+    def __init__(self, per=1, drops=1, minimum=1, cap=None, tiers=()):
+        if per < 1 or drops < 0:
+            raise ValueError("per must be >= 1 and drops >= 0")
+        self.per = per
+        self.drops = drops
+        self.minimum = minimum
+        self.cap = cap
+        self.tiers = sorted(tiers)
+
+    @classmethod
+    def one_per_holder(cls):
+        """What codetrait.py always did: one drop per holder."""
+        return cls(per=1, drops=1, cap=1)
+
+    def entitlements(self, counts):
+        """Drops per holder for a sequence of mint counts (NumPy array in, NumPy array out)."""
+        thresholds = [t for t, _ in self.tiers]
+        tier_caps = [c for _, c in self.tiers]
+        if np is not None:
+            counts = np.asarray(counts, dtype=np.int64)
+            result = (counts // self.per) * self.drops
+            result[counts < self.minimum] = 0
+            if self.cap is not None:
+                np.minimum(result, self.cap, out=result)
+            if self.tiers:
+                tier = np.searchsorted(np.asarray(thresholds), counts, side='right') - 1
+                caps = np.where(tier >= 0, np.asarray(tier_caps)[np.maximum(tier, 0)], 0)
+                np.minimum(result, caps, out=result)
+            return result
+
+        result = array('q')
+        for count in counts:
+            n = (count // self.per) * self.drops if count >= self.minimum else 0
+            if self.cap is not None:
+                n = min(n, self.cap)
+            if self.tiers:
+                tier = bisect_right(thresholds, count) - 1
+                n = min(n, tier_caps[tier]) if tier >= 0 else 0
+            result.append(n)
+        return result
+
+
+def aggregate_mints(path, column=0, skip_header=False, memory_budget=DEFAULT_MEMORY_BUDGET, spill_dir=None,
+                    rejected=None):
+    """
+    Mints per holder of a mint export, in one streaming pass.
+
+    Plain exports are counted by the memory-mapped fast path
+    (birdpy.fastcsv); otherwise counting is a hash aggregation
+    (count_unique) that moves to a temporary SQLite table past
+    memory_budget distinct holders.
+
+    Args:
+        path: Mint export, e.g. tlbmints.csv (address,tokenId rows).
+        column: Address column.
+        skip_header: Ignore the first row.
+        memory_budget: See count_unique().
+        spill_dir: See count_unique().
+        rejected: Optional list receiving (row number, text, error) for
+            invalid addresses; without it they raise InvalidPrincipal.
+
+    Returns:
+        (list of holder strings in first-mint order, array of mint counts)
+    """
+    scan = fastcsv.scan_column(path, column, skip_header, max_distinct=memory_budget)
+    if scan is not None:
+        try:
+            merged = canonical_counts(scan)
+        except InvalidPrincipal:
+            if rejected is None:
+                raise
+            merged = None  # the csv path below lists every bad row
+        if merged is not None:
+            return list(merged), array('q', merged.values())
+
+    def principals():
+        for number, value in enumerate(read_column(path, column, skip_header), 1):
+            if not value:
+                continue
+            try:
+                yield str(intern_principal(value))
+            except InvalidPrincipal as e:
+                if rejected is None:
+                    raise InvalidPrincipal(f"Row {number}: {e}") from None
+                rejected.append((number, value, str(e)))
+
+    holders = []
+    counts = array('q')
+    for holder, count in count_unique(principals(), memory_budget, spill_dir):
+        holders.append(holder)
+        counts.append(count)
+    return holders, counts
+
+
+class Allocation:
+    """
+    Token ids assigned to holders: slot i of the drop gets id start_id + i
+    and goes to holders[slots[i]].
+    """
+
+    def __init__(self, holders, counts, drops, slots, start_id):
+        self.holders = holders
+        self.counts = counts
+        self.drops = drops
+        self.slots = slots
+        self.start_id = start_id
+
+    def __len__(self):
+        return len(self.slots)
+
+    @property
+    def last_id(self):
+        return self.start_id + len(self.slots) - 1
+
+    def recipients(self):
+        """Recipient of every id, in id order (input for plan_contracts())."""
+        holders = self.holders
+        return [holders[i] for i in self.slots]
+
+    def lines(self, function):
+        """Drop lines in id order: (function uID 'ADDRESS)"""
+        holders = self.holders
+        for offset, holder in enumerate(self.slots):
+            yield drop_line(function, self.start_id + offset, holders[holder])
+
+    def write_lines(self, path, function):
+        """Writes the lines as clarCodeTrait.csv, one per row."""
+        with atomic_open(path, 'w', newline='', encoding='utf-8') as f:
+            writer = csv.writer(f)
+            writer.writerows([line] for line in self.lines(function))
+
+    def write_summary(self, path):
+        """address,mints,drops per holder, in first-mint order."""
+        with atomic_open(path, 'w', newline='', encoding='utf-8') as f:
+            writer = csv.writer(f)
+            writer.writerow(["address", "mints", "drops"])
+            writer.writerows(zip(self.holders, self.counts, self.drops))
+
+
+def allocate(holders, counts, rule, start_id, seed=None):
+    """
+    Assigns consecutive token ids from start_id to the holders' entitlements.
+
+    Without a seed each holder gets a contiguous id range, holders in input
+    order. With a seed the slots are shuffled with random.Random(seed), so
+    the same seed always gives the same assignment, with or without NumPy.
+
+    Returns:
+        Allocation
+    """
+    drops = rule.entitlements(counts)
+    if np is not None:
+        slots = np.repeat(np.arange(len(holders), dtype=np.int64), drops)
+        if seed is not None:
+            order = list(range(len(slots)))
+            random.Random(seed).shuffle(order)
+            slots = slots[np.asarray(order, dtype=np.int64)]
+        slots = slots.tolist()
+        drops = array('q', drops.tolist())
+    else:
+        slots = [holder for holder, n in enumerate(drops) for _ in range(n)]
+        if seed is not None:
+            order = list(range(len(slots)))
+            random.Random(seed).shuffle(order)
+            slots = [slots[i] for i in order]
+    return Allocation(holders, counts, drops, slots, start_id)
+
+
+def allocate_csv(input_path, output_path, function, start_id, rule=None, seed=None, column=0, skip_header=False,
+                 summary_path=None, memory_budget=DEFAULT_MEMORY_BUDGET, rejected=None):
+    """
+    Mint export in, drop lines out.
+
+    Args:
+        input_path: Mint export (one row per mint).
+        output_path: clarCodeTrait.csv to write.
+        function: Drop function name, e.g. 'bananas'.
+        start_id: First token id.
+        rule: AllocationRule, one drop per holder by default.
+        seed: Shuffle seed, contiguous ranges if None.
+        column: Address column.
+        skip_header: Ignore the first row.
+        summary_path: Also write address,mints,drops here.
+        memory_budget: See count_unique().
+        rejected: See aggregate_mints().
+
+    Returns:
+        Allocation
+    """
+    holders, counts = aggregate_mints(input_path, column, skip_header, memory_budget, rejected=rejected)
+    allocation = allocate(holders, counts, rule or AllocationRule.one_per_holder(), start_id, seed)
+    allocation.write_lines(output_path, function)
+    if summary_path:
+        allocation.write_summary(summary_path)
+    return allocation
@@ -0,0 +1,186 @@
+import hashlib
+import os
+import shutil
+import threading
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+# ioctl number for FICLONE (_IOW(0x94, 9, int)) on Linux
+FICLONE = 0x40049409
+
+# Order in which materialize() tries to create a destination. A real copy is
+# always the last resort; 'symlink' can be added by callers that accept links.
+DEFAULT_STRATEGIES = ('hardlink', 'reflink', 'copy')
+
+HASH_CHUNK_SIZE = 1024 * 1024
+
+
+def file_digest(path, algorithm='sha256'):
+    """
+    Computes the hex digest of a file, reading it in chunks.
+
+    Args:
+        path: Path to the file.
+        algorithm: Any hashlib algorithm name.
+
+    Returns:
+        str: The hex digest.
+    """
+    digest = hashlib.new(algorithm)
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _stat_key(st):
+    """Identity of a file version: same key means the content is unchanged."""
+    return (st.st_dev, st.st_ino, st.st_size, st.st_mtime_ns)
+
+
+def _reflink(src, dst):
+    """Clones src into dst with FICLONE (btrfs, xfs, ...). Raises OSError if unsupported."""
+    if fcntl is None:
+        raise OSError("reflink not supported on this platform")
+    with open(src, 'rb') as fsrc, open(dst, 'wb') as fdst:
+        try:
+            fcntl.ioctl(fdst.fileno(), FICLONE, fsrc.fileno())
+        except OSError:
+            fdst.close()
+            os.unlink(dst)
+            raise
+    shutil.copystat(src, dst)
+
+
+def _place(strategy, src, tmp):
+    if strategy == 'hardlink':
+        os.link(src, tmp)
+    elif strategy == 'reflink':
+        _reflink(src, tmp)
+    elif strategy == 'symlink':
+        os.symlink(os.path.relpath(src, os.path.dirname(tmp)), tmp)
+    elif strategy == 'copy':
+        shutil.copy2(src, tmp)
+    else:
+        raise ValueError(f"Unknown strategy: {strategy}")
+
+
+class AssetStore:
+    """
+    Content-addressed view over a set of source images.
+
+    Every source is hashed once (the digest is cached by device, inode, size
+    and mtime) and identical sources collapse onto one canonical file. Each
+    destination is then materialized from that canonical file as a hardlink,
+    reflink or symlink, falling back to a real copy only when none of the
+    cheaper strategies work on the filesystem.
+
+    A store can be shared between threads.
+    """
+
+    def __init__(self, strategies=DEFAULT_STRATEGIES, algorithm='sha256'):
+        self.strategies = tuple(strategies)
+        self.algorithm = algorithm
+        self._digests = {}    # stat key -> digest
+        self._canonical = {}  # digest -> (canonical source path, its stat)
+        self._broken = set()  # (strategy, destination dir) pairs that already failed
+        self.stats = {'skipped': 0, 'hardlink': 0, 'reflink': 0, 'symlink': 0, 'copy': 0, 'hashed': 0}
+        self._lock = threading.Lock()
+
+    def digest(self, path, st=None):
+        """Returns the digest of path, hashing it only the first time it is seen."""
+        if st is None:
+            st = os.stat(path)
+        key = _stat_key(st)
+        digest = self._digests.get(key)
+        if digest is None:
+            # Two threads may hash the same new file; both get the same answer.
+            digest = file_digest(path, self.algorithm)
+            with self._lock:
+                if key not in self._digests:
+                    self._digests[key] = digest
+                    self.stats['hashed'] += 1
+        return digest
+
+    def add(self, path, st=None):
+        """
+        Registers a source file and returns its digest.
+
+        The first path seen for a digest becomes the canonical file that every
+        destination with the same content is linked to.
+        """
+        if st is None:
+            st = os.stat(path)
+        digest = self.digest(path, st)
+        with self._lock:
+            self._canonical.setdefault(digest, (path, st))
+        return digest
+
+    def is_current(self, src, dst, src_stat=None):
+        """Checks whether dst already holds the content of src (same inode or same digest)."""
+        try:
+            dst_stat = os.stat(dst)
+        except FileNotFoundError:
+            return False
+        if src_stat is None:
+            src_stat = os.stat(src)
+        if (src_stat.st_dev, src_stat.st_ino) == (dst_stat.st_dev, dst_stat.st_ino):
+            return True
+        if src_stat.st_size != dst_stat.st_size:
+            return False
+        return self.digest(src, src_stat) == self.digest(dst, dst_stat)
+
+    def materialize(self, src, dst, src_stat=None, dst_missing=False):
+        """
+        Makes dst hold the content of src.
+
+        Args:
+            src: Source image path.
+            dst: Destination path.
+            src_stat: os.stat() result of src, if the caller already has it.
+            dst_missing: True if the caller knows dst does not exist, which
+                saves the up-to-date check.
+
+        Returns:
+            str: 'skipped' if dst was already up to date, otherwise the
+            strategy that created it ('hardlink', 'reflink', 'symlink' or 'copy').
+        """
+        digest = self.add(src, src_stat)
+        canonical, src_stat = self._canonical[digest]
+
+        if not dst_missing and self.is_current(canonical, dst, src_stat):
+            self._count('skipped')
+            return 'skipped'
+
+        # Build next to the destination and rename over it, so a crash never
+        # leaves a half-written file under the final name.
+        tmp = f"{dst}.tmp-{os.getpid()}-{threading.get_ident()}"
+        if os.path.lexists(tmp):
+            os.unlink(tmp)
+        dst_dir = os.path.dirname(os.path.abspath(dst))
+        last_error = None
+        for strategy in self.strategies:
+            if (strategy, dst_dir) in self._broken:
+                continue
+            try:
+                _place(strategy, canonical, tmp)
+            except OSError as e:
+                last_error = e
+                if strategy != 'copy':
+                    with self._lock:
+                        self._broken.add((strategy, dst_dir))
+                if os.path.lexists(tmp):
+                    os.unlink(tmp)
+                continue
+            os.replace(tmp, dst)
+            self._count(strategy)
+            return strategy
+
+        raise OSError(f"Could not materialize {dst} from {src}: {last_error}")
+
+    def _count(self, name):
+        with self._lock:
+            self.stats[name] += 1
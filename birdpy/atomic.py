@@ -0,0 +1,41 @@
+"""
+Output files that are replaced only once they are complete.
+
+    with atomic_open('tlbpy/tlbhlist.csv', 'w', newline='', encoding='utf-8') as out:
+        csv.writer(out).writerows(rows)
+
+The rows go to a temporary file next to the target, which is renamed over
+it when the block finishes; if the block raises, the temporary file is
+removed and the previous file is left as it was.
+"""
+import contextlib
+import os
+import threading
+
+
+def temp_path(path):
+    """Temporary name next to path, unique per process and thread (fan-out and verify skip '.tmp-' names)."""
+    return f"{path}.tmp-{os.getpid()}-{threading.get_ident()}"
+
+
+@contextlib.contextmanager
+def atomic_open(path, mode='w', **kwargs):
+    """
+    open() for writing whose file only replaces path on success.
+
+    Args:
+        path: File to write.
+        mode: 'w' or 'wb'.
+        kwargs: Passed to open() (newline, encoding, ...).
+    """
+    tmp = temp_path(path)
+    try:
+        with open(tmp, mode, **kwargs) as f:
+            yield f
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+    except BaseException:
+        with contextlib.suppress(FileNotFoundError):
+            os.unlink(tmp)
+        raise
@@ -0,0 +1,188 @@
+import csv
+
+# cardList.csv header -> field name used in apesnftlist.csv and the metadata
+CARD_COLUMNS = {'Name': 'name', 'Bitcoin Text': 'bitcoinText', 'Sticker': 'sticker'}
+CARD_FIELDS = tuple(CARD_COLUMNS.values())
+
+# Columns the thin NFT list keeps; everything else comes from the card index.
+THIN_COLUMNS = ('nftId', 'fileName', 'cardId', 'fortune', 'power', 'rarity')
+
+EDITIONS_PER_CARD = 10
+
+
+class CardIndex:
+    """
+    cardList.csv loaded once, keyed by card id.
+
+    cardList.csv may list a card more than once (today every card is repeated
+    once per edition); repeats that disagree are kept in conflicts.
+    """
+
+    def __init__(self):
+        self.cards = {}      # card id -> {'name', 'bitcoinText', 'sticker'}
+        self.conflicts = []  # (card id, first fields, conflicting fields)
+
+    @classmethod
+    def from_csv(cls, path):
+        index = cls()
+        with open(path, 'r', newline='', encoding='utf-8') as f:
+            for row in csv.DictReader(f):
+                card_id = row.get('Card Id', '').strip()
+                if not card_id:
+                    continue
+                fields = {field: row.get(column, '').strip() for column, field in CARD_COLUMNS.items()}
+                known = index.cards.setdefault(card_id, fields)
+                if known is not fields and known != fields:
+                    index.conflicts.append((card_id, known, fields))
+        return index
+
+    def __contains__(self, card_id):
+        return card_id in self.cards
+
+    def __getitem__(self, card_id):
+        return self.cards[card_id]
+
+    def __len__(self):
+        return len(self.cards)
+
+
+class BuildReport:
+    """Data problems found while joining the NFT list against the card index."""
+
+    def __init__(self):
+        self.rows = 0
+        self.orphans = {}          # card id missing from cardList -> nft ids
+        self.edition_counts = {}   # card id -> editions, for cards with the wrong count
+        self.mismatches = []       # (nft id, field, value in NFT list, value in cardList)
+        self.card_conflicts = []   # see CardIndex.conflicts
+        self.skipped = []          # (row number, reason)
+
+    @property
+    def ok(self):
+        return not (self.orphans or self.edition_counts or self.mismatches or self.card_conflicts or self.skipped)
+
+    def to_dict(self):
+        return {
+            "ok": self.ok,
+            "rows": self.rows,
+            "orphan_card_ids": self.orphans,
+            "wrong_edition_counts": self.edition_counts,
+            "mismatched_fields": self.mismatches,
+            "card_conflicts": self.card_conflicts,
+            "skipped_rows": self.skipped,
+        }
+
+
+def sequence_numbers(card_ids, editions=EDITIONS_PER_CARD):
+    """
+    Groups NFT rows by card and numbers them within their card.
+
+    Args:
+        card_ids: Card id of every NFT row, in file order; an empty id marks
+            a row that is not emitted, which gets no number and is not counted.
+        editions: Numbers cycle 1..editions, as in csv_to_json_converter.py.
+
+    Returns:
+        (list of sequence numbers per row, dict card id -> number of rows)
+    """
+    groups = {}
+    for row, card_id in enumerate(card_ids):
+        if card_id:
+            groups.setdefault(card_id, []).append(row)
+    sequence = [0] * len(card_ids)
+    for rows in groups.values():
+        for position, row in enumerate(rows):
+            sequence[row] = position % editions + 1
+    return sequence, {card_id: len(rows) for card_id, rows in groups.items()}
+
+
+def _read_card_ids(nft_csv):
+    """cardId of every row, or '' for a row build_entries skips for a missing nftId."""
+    with open(nft_csv, 'r', newline='', encoding='utf-8') as f:
+        return [row.get('cardId', '').strip() if row.get('nftId', '').strip() else ''
+                for row in csv.DictReader(f)]
+
+
+def metadata_entry(row, card, sequence):
+    """The apes_metadata.json entry for one NFT row joined with its card."""
+    return {
+        "file": row['fileName'],
+        "meta": {
+            "name": f"{card['name']} #{sequence}",
+            "attributes": [
+                {"trait_type": "nftId", "value": row['nftId']},
+                {"trait_type": "name", "value": card['name']},
+                {"trait_type": "cardId", "value": row['cardId']},
+                {"trait_type": "bitcoinText", "value": card['bitcoinText']},
+                {"trait_type": "sticker", "value": card['sticker']},
+                {"trait_type": "fortune", "value": row.get('fortune', '')},
+                {"trait_type": "power", "value": row.get('power', '')},
+                {"trait_type": "rarity", "value": row.get('rarity', '')},
+            ],
+        },
+    }
+
+
+def build_entries(nft_csv, cards, report, editions=EDITIONS_PER_CARD):
+    """
+    Streams metadata entries for an NFT list joined with a CardIndex.
+
+    The NFT list only needs nftId, cardId, fortune, power and rarity
+    (fileName defaults to the zero-padded nftId). If it still carries the
+    denormalized name/bitcoinText/sticker columns they are compared with the
+    card index and differences go to report.mismatches; the card index wins.
+
+    A first pass reads only the cardId and nftId columns to number editions
+    per card and check edition counts (counting only the rows that are
+    emitted), the second pass does the join.
+
+    Args:
+        nft_csv: apesnftlist.csv or its thin variant.
+        cards: CardIndex.
+        report: BuildReport to fill in.
+        editions: Expected NFTs per card.
+
+    Yields:
+        dict entries in the apes_metadata.json format.
+    """
+    card_ids = _read_card_ids(nft_csv)
+    sequence, per_card = sequence_numbers(card_ids, editions)
+    report.card_conflicts = list(cards.conflicts)
+    for card_id in cards.cards:
+        if per_card.get(card_id, 0) != editions:
+            report.edition_counts[card_id] = per_card.get(card_id, 0)
+
+    with open(nft_csv, 'r', newline='', encoding='utf-8') as f:
+        for row_number, row in enumerate(csv.DictReader(f)):
+            report.rows += 1
+            card_id = row.get('cardId', '').strip()
+            nft_id = row.get('nftId', '').strip()
+            if not card_id or not nft_id:
+                report.skipped.append((row_number + 2, "missing nftId or cardId"))
+                continue
+            card = cards.cards.get(card_id)
+            if card is None:
+                report.orphans.setdefault(card_id, []).append(nft_id)
+                continue
+            for field in CARD_FIELDS:
+                value = row.get(field)
+                if value is not None and value.strip() != card[field]:
+                    report.mismatches.append((nft_id, field, value, card[field]))
+
+            row['nftId'] = nft_id
+            row['cardId'] = card_id
+            if not row.get('fileName'):
+                row['fileName'] = f"{int(nft_id):04d}.webp" if nft_id.isdigit() else f"{nft_id}.webp"
+            yield metadata_entry(row, card, sequence[row_number])
+
+
+def write_thin_list(nft_csv, thin_csv):
+    """Writes nft_csv without the columns that cardList.csv already holds."""
+    with open(nft_csv, 'r', newline='', encoding='utf-8') as src, \
+         open(thin_csv, 'w', newline='', encoding='utf-8') as dst:
+        reader = csv.DictReader(src)
+        columns = [c for c in THIN_COLUMNS if c in reader.fieldnames]
+        writer = csv.writer(dst)
+        writer.writerow(columns)
+        for row in reader:
+            writer.writerow([row[c] for c in columns])
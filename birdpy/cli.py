@@ -0,0 +1,1005 @@
+"""
+birdpy command line: one entry point for the collection tools.
+
+    birdpy dedup --input tlbpy/tlbmints.csv --output tlbpy/tlbhlist.csv
+    birdpy drop-gen --input apespy/apeslisthold.csv --contract SP...stacks-stones --function stones --start-id 174
+    birdpy drop-sim nftdropbananasapespy/contracts/nftdrop-*.clar --expected-start 174
+    birdpy allocate --input tlbpy/tlbmints.csv --output clarCodeTrait.csv --function bananas --start-id 4 --per 5
+    birdpy metadata-index --folder nftspy/metadata --metadata-csv nftspy/metadata.csv
+    birdpy traits --folder nftspy/metadata --where Rarity=Epic,Legendary --counts Rarity --rarity
+    birdpy fan-out --csv nftspy/metadata.csv --source-dir nftspy/webp --dest-dir nftspy/nfts
+    birdpy verify --csv nftspy/metadata.csv --source-dir nftspy/webp --dest-dir nftspy/nfts
+    birdpy image-index --folder apestudio/list/monkeyCards --duplicates --near-duplicates
+    birdpy json-export --format ndjson
+    birdpy snapshot --store apespy/snapshots --input apespy/apeslist.csv
+    birdpy drop-delta --store apespy/snapshots --contract SP...stacks-stones --function stones --output-dir contracts
+    birdpy store --db collection.sqlite --metadata-csv stones=nftspy/metadata.csv --cards apestudio/list/cardList.csv
+    birdpy fetch --asset SP....the-little-bird::tlb --output tlbpy/tlbmints.csv --cache tlbpy/.fetch.sqlite
+    birdpy generate --tokens 2000 --seed 7 --metadata-csv metadata.csv --metadata-folder metadata
+    birdpy pipeline --stage bananas-drop
+
+Options can also come from a TOML config file (--config, $BIRDPY_CONFIG or
+./birdpy.toml) with one table per subcommand, keyed by the long option name:
+
+    [dedup]
+    input = "tlbpy/tlbmints.csv"
+    output = "tlbpy/tlbhlist.csv"
+
+Relative paths in the config are relative to the config file. Command line
+arguments win over the config.
+
+Only argparse is imported up front; every subcommand imports what it needs
+when it runs, so --help and small jobs start quickly.
+"""
+import argparse
+import os
+import sys
+
+CONFIG_ENV = 'BIRDPY_CONFIG'
+CONFIG_NAME = 'birdpy.toml'
+
+
+class _Command:
+    def __init__(self, name, help, add_arguments, run, paths=(), required=()):
+        self.name = name
+        self.help = help
+        self.add_arguments = add_arguments
+        self.run = run
+        self.paths = paths        # options resolved against the config file folder
+        self.required = required  # options that must come from the arguments or the config
+
+
+# --- dedup -------------------------------------------------------------------
+
+def _dedup_arguments(parser):
+    parser.add_argument('--input', metavar='CSV', help="CSV with one address per row (e.g. tlbmints.csv)")
+    parser.add_argument('--output', metavar='CSV', help="unique addresses, in first-seen order")
+    parser.add_argument('--column', type=int, help="index of the address column (default 0)")
+    parser.add_argument('--counts', action='store_true', default=None, help="also write rows per address")
+    parser.add_argument('--skip-header', action='store_true', default=None)
+    parser.add_argument('--memory-budget', type=int, metavar='N',
+                        help="distinct addresses kept in memory before spilling to disk")
+    parser.add_argument('--no-validate', dest='validate', action='store_false', default=None,
+                        help="do not check the c32check addresses")
+
+
+def _run_dedup(args):
+    from birdpy.dedup import DEFAULT_MEMORY_BUDGET, dedup_csv
+    from birdpy.principal import InvalidPrincipal
+
+    try:
+        written = dedup_csv(args.input, args.output, column=args.column or 0, with_counts=bool(args.counts),
+                            skip_header=bool(args.skip_header),
+                            memory_budget=args.memory_budget or DEFAULT_MEMORY_BUDGET,
+                            validate=args.validate is not False)
+    except InvalidPrincipal as e:
+        print(f"Error: invalid address in {args.input}: {e}", file=sys.stderr)
+        return 1
+    print(f"{written} unique addresses written to {args.output}")
+    return 0
+
+
+# --- drop-gen ----------------------------------------------------------------
+
+def _drop_gen_arguments(parser):
+    parser.add_argument('--input', metavar='CSV', help="holder list, one address per row")
+    parser.add_argument('--contract', help="NFT contract principal, e.g. SP....stacks-stones")
+    parser.add_argument('--function', help="private function of the drop contract, e.g. stones")
+    parser.add_argument('--start-id', type=int, help="token id of the first recipient")
+    parser.add_argument('--output-dir', metavar='DIR', help="folder for the .clar files and the manifest")
+    parser.add_argument('--prefix', help="contract file name prefix (default nftdrop)")
+    parser.add_argument('--mode', choices=('calls', 'map'))
+    parser.add_argument('--budget-fraction', type=float, metavar='F',
+                        help="share of the block limits a contract may use (default 0.8)")
+    parser.add_argument('--trait-csv', metavar='CSV', help="also write the legacy clarCodeTrait.csv")
+    parser.add_argument('--no-simulate', dest='simulate', action='store_false', default=None,
+                        help="skip the offline replay of the generated contracts")
+
+
+def _run_drop_gen(args):
+    from birdpy.dropgen import Budget, DropSpec, generate_drop
+
+    budget = Budget(fraction=args.budget_fraction or 0.8)
+    contracts, manifest, rejected = generate_drop(
+        args.input, DropSpec(args.contract, args.function), args.start_id, args.output_dir,
+        prefix=args.prefix or 'nftdrop', mode=args.mode or 'calls', budget=budget, trait_csv_path=args.trait_csv)
+    for row_number, _, error in rejected:
+        print(f"Skipping row {row_number}: {error}", file=sys.stderr)
+    for contract in contracts:
+        print(f"Contract ids u{contract.first_id}-u{contract.last_id}: {len(contract.recipients)} recipients")
+    print(f"{len(contracts)} contract(s) written, manifest: {manifest}")
+
+    if args.simulate is False:
+        return 0
+    from birdpy.dropsim import format_report, simulate
+
+    sources = ((f"contract {number}", contract.source()) for number, contract in enumerate(contracts, 1))
+    report = simulate(sources, expected_start=args.start_id, budget=budget)
+    print(format_report(report))
+    return 0 if report.ok else 1
+
+
+# --- drop-sim ----------------------------------------------------------------
+
+def _drop_sim_arguments(parser):
+    parser.add_argument('files', nargs='*', metavar='FILE', help="drop contracts (.clar) in deploy order")
+    parser.add_argument('--expected-start', type=int, metavar='N',
+                        help="token id the first drop should get (default the lowest id in the files)")
+    parser.add_argument('--budget-fraction', type=float, metavar='F',
+                        help="share of the block limits a contract may use (default 0.8)")
+    parser.add_argument('--format', dest='output_format', choices=('text', 'json'),
+                        help="json: print the report as JSON on stdout (default text)")
+
+
+def _run_drop_sim(args):
+    import json
+
+    from birdpy.dropgen import Budget
+    from birdpy.dropsim import DropParseError, format_report, simulate_files
+
+    if not args.files:
+        args._parser.error("no drop files given")
+    try:
+        report = simulate_files(args.files, expected_start=args.expected_start,
+                                budget=Budget(fraction=args.budget_fraction or 0.8))
+    except (OSError, DropParseError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 2
+    if args.output_format == 'json':
+        print(json.dumps(report.to_dict(), indent=2))
+    else:
+        print(format_report(report))
+    return 0 if report.ok else 1
+
+
+# --- allocate ----------------------------------------------------------------
+
+def _tier(text):
+    minimum, sep, cap = text.partition(':')
+    if not sep or not minimum.isdigit() or not cap.isdigit():
+        raise argparse.ArgumentTypeError(f"expected MIN_MINTS:MAX_DROPS, got {text!r}")
+    return int(minimum), int(cap)
+
+
+def _allocate_arguments(parser):
+    parser.add_argument('--input', metavar='CSV', help="mint export, one row per mint (e.g. tlbmints.csv)")
+    parser.add_argument('--output', metavar='CSV', help="drop lines (clarCodeTrait.csv)")
+    parser.add_argument('--function', help="drop function, e.g. bananas")
+    parser.add_argument('--start-id', type=int, help="token id of the first drop")
+    parser.add_argument('--per', type=int, metavar='M', help="mints per unit of drops (default 1)")
+    parser.add_argument('--drops', type=int, metavar='N', help="drops per unit (default 1)")
+    parser.add_argument('--minimum', type=int, help="fewest mints that earn a drop (default 1)")
+    parser.add_argument('--cap', type=int, help="most drops per holder (default 1 without --per/--drops/--tier)")
+    parser.add_argument('--tier', dest='tiers', action='append', type=_tier, metavar='MIN:MAX',
+                        help="holders with at least MIN mints get at most MAX drops; repeat for several tiers")
+    parser.add_argument('--seed', type=int, help="shuffle the id assignment with this seed")
+    parser.add_argument('--column', type=int, help="index of the address column (default 0)")
+    parser.add_argument('--skip-header', action='store_true', default=None)
+    parser.add_argument('--summary', metavar='CSV', help="write address,mints,drops per holder")
+    parser.add_argument('--contract', help="also write drop contracts for this NFT contract principal")
+    parser.add_argument('--output-dir', metavar='DIR', help="folder for the contracts (with --contract)")
+
+
+def _run_allocate(args):
+    from birdpy.allocate import AllocationRule, allocate_csv
+
+    minimum = 1 if args.minimum is None else args.minimum
+    try:
+        if args.per is None and args.drops is None and not args.tiers:
+            rule = AllocationRule(cap=1 if args.cap is None else args.cap, minimum=minimum)
+        else:
+            rule = AllocationRule(per=1 if args.per is None else args.per,
+                                  drops=1 if args.drops is None else args.drops,
+                                  minimum=minimum, cap=args.cap, tiers=args.tiers or ())
+    except ValueError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 2
+    rejected = []
+    allocation = allocate_csv(args.input, args.output, args.function, args.start_id, rule, seed=args.seed,
+                              column=args.column or 0, skip_header=bool(args.skip_header),
+                              summary_path=args.summary, rejected=rejected)
+    for row_number, _, error in rejected:
+        print(f"Skipping row {row_number}: {error}", file=sys.stderr)
+    ids = f" (u{allocation.start_id}-u{allocation.last_id})" if len(allocation) else ""
+    print(f"{len(allocation.holders)} holders, {sum(allocation.counts)} mints -> {len(allocation)} drops{ids} "
+          f"written to {args.output}")
+
+    if args.contract and len(allocation):
+        from birdpy.dropgen import DropSpec, plan_contracts, write_contracts
+
+        if not args.output_dir:
+            print("Error: --contract needs --output-dir", file=sys.stderr)
+            return 2
+        contracts = plan_contracts(allocation.recipients(), allocation.start_id,
+                                   DropSpec(args.contract, args.function))
+        manifest = write_contracts(contracts, args.output_dir)
+        print(f"{len(contracts)} contract(s) written, manifest: {manifest}")
+    return 0
+
+
+# --- metadata-index ----------------------------------------------------------
+
+def _metadata_index_arguments(parser):
+    parser.add_argument('--folder', metavar='DIR', help="folder with one metadata JSON per token")
+    parser.add_argument('--metadata-csv', metavar='CSV', help="write tokenId,<trait> rows (metadata.csv)")
+    parser.add_argument('--rarity-csv', metavar='CSV', help="write the trait column only (newdata.csv)")
+    parser.add_argument('--trait-type', help="attribute to export (default Rarity)")
+    parser.add_argument('--index', metavar='PATH', help="index file (default <folder>/.metaindex.sqlite)")
+
+
+def _run_metadata_index(args):
+    from birdpy.metaindex import export_rarity
+
+    counts, warnings = export_rarity(args.folder, metadata_csv=args.metadata_csv, rarity_csv=args.rarity_csv,
+                                     trait_type=args.trait_type or 'Rarity', index_path=args.index)
+    for file_name, warning in warnings:
+        print(f"Warning: {file_name}: {warning}", file=sys.stderr)
+    print(f"JSON files parsed: {counts['parsed']}, unchanged: {counts['unchanged']}, removed: {counts['removed']}")
+    for path in (args.metadata_csv, args.rarity_csv):
+        if path:
+            print(f"Wrote {path}")
+    return 0
+
+
+# --- traits ------------------------------------------------------------------
+
+def _condition(text):
+    name, sep, values = text.partition('=')
+    if not sep or not name:
+        raise argparse.ArgumentTypeError(f"expected NAME=VALUE,..., got {text!r}")
+    return name, values.split(',')
+
+
+def _traits_arguments(parser):
+    parser.add_argument('--folder', metavar='DIR', help="folder with one metadata JSON per token")
+    parser.add_argument('--apes-json', metavar='JSON', help="apes_metadata.json instead of a folder")
+    parser.add_argument('--index', metavar='PATH', help="index file of --folder (default <folder>/.metaindex.sqlite)")
+    parser.add_argument('--where', dest='conditions', action='append', type=_condition, metavar='NAME=VALUE,...',
+                        help="keep the tokens whose trait is one of the values (an empty value: tokens "
+                             "without the trait); repeat to combine")
+    parser.add_argument('--counts', dest='count_traits', action='append', metavar='NAME',
+                        help="tokens per value of a trait; repeat for several")
+    parser.add_argument('--rarity', action='store_true', default=None,
+                        help="rank the tokens by rarity score (scored against the whole collection)")
+    parser.add_argument('--top', type=int, metavar='N', help="tokens listed by --rarity (default 10, 0 for all)")
+    parser.add_argument('--csv', metavar='CSV', help="write tokenId and the traits of the matching tokens")
+    parser.add_argument('--format', dest='output_format', choices=('text', 'json'),
+                        help="json: print the answers as JSON on stdout (default text)")
+
+
+def _run_traits(args):
+    import json
+
+    from birdpy.traits import TraitTable
+
+    if bool(args.folder) == bool(args.apes_json):
+        args._parser.error("give one of --folder and --apes-json")
+    try:
+        if args.folder:
+            table = TraitTable.from_metadata_folder(args.folder, args.index)
+        else:
+            table = TraitTable.from_apes_json(args.apes_json)
+    except (OSError, ValueError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 2
+    conditions = args.conditions or []
+    count_traits = args.count_traits or []
+    unknown = [name for name in [name for name, _ in conditions] + count_traits if name not in table.columns]
+    if unknown:
+        print(f"Error: unknown trait_type {unknown[0]!r} (known: {', '.join(map(str, table.trait_types))})",
+              file=sys.stderr)
+        return 2
+
+    selected = table
+    for name, texts in conditions:
+        # values come from the command line as text; the metadata may hold numbers
+        values = {value for value in table.columns[name].values if str(value) in texts}
+        if '' in texts:
+            values.add(None)
+        selected = selected.where(name, values)
+    counts = {name: list(selected.counts(name).items()) for name in count_traits}
+    ranking = None
+    if args.rarity:
+        matching = set(selected.token_ids)
+        ranking = [(token_id, score) for token_id, score in table.rarity_scores() if token_id in matching]
+        top = 10 if args.top is None else args.top
+        if top:
+            ranking = ranking[:top]
+    if args.csv:
+        selected.to_csv(args.csv)
+
+    if args.output_format == 'json':
+        report = {"tokens": len(table), "matching": len(selected), "counts": counts}
+        if ranking is not None:
+            report["rarity"] = ranking
+        print(json.dumps(report, indent=2))
+    else:
+        print(f"Tokens: {len(table)}" + (f", matching: {len(selected)}" if conditions else ""))
+        for name, pairs in counts.items():
+            print(f"{name}:")
+            for value, n in pairs:
+                print(f"  {'(none)' if value is None else value}: {n}")
+        if ranking is not None:
+            print("Rarest tokens:")
+            for token_id, score in ranking:
+                print(f"  {token_id}: {score:.2f}")
+        if args.csv:
+            print(f"Wrote {args.csv}")
+    return 0
+
+
+# --- fan-out -----------------------------------------------------------------
+
+def _fan_out_arguments(parser):
+    parser.add_argument('--csv', metavar='CSV', help="one row per token (e.g. nftspy/metadata.csv)")
+    parser.add_argument('--source-dir', metavar='DIR', help="folder with the source images")
+    parser.add_argument('--dest-dir', metavar='DIR', help="folder receiving one image per token")
+    parser.add_argument('--source-name', metavar='TEMPLATE',
+                        help="source file name from CSV columns (default '{Rarity}.webp')")
+    parser.add_argument('--dest-name', metavar='TEMPLATE',
+                        help="destination file name (default 'Stone {tokenId:0>4} {Rarity}.webp')")
+    parser.add_argument('--render-dir', metavar='DIR',
+                        help="also render each source once per profile into DIR/<profile>")
+    parser.add_argument('--profile', dest='profiles', action='append', metavar='NAME',
+                        help="rendition profile (web, preview, thumbnail); repeat for several, default all")
+    parser.add_argument('--workers', type=int)
+    parser.add_argument('--no-resume', dest='resume', action='store_false', default=None,
+                        help="re-check every destination instead of trusting the journal")
+
+
+def _fan_out_plan(reader, source_name, dest_name, skipped):
+    import string
+
+    fields = {field for template in (source_name, dest_name)
+              for _, field, _, _ in string.Formatter().parse(template) if field}
+    for row_number, row in enumerate(reader, 2):
+        if not all(row.get(field) for field in fields):
+            skipped.append(row_number)
+            continue
+        yield source_name.format(**row), dest_name.format(**row)
+
+
+def _run_fan_out(args):
+    import csv
+
+    from birdpy.fanout import fan_out
+
+    skipped = []
+    with open(args.csv, 'r', newline='', encoding='utf-8') as f:
+        plan = list(_fan_out_plan(csv.DictReader(f), args.source_name or '{Rarity}.webp',
+                                  args.dest_name or 'Stone {tokenId:0>4} {Rarity}.webp', skipped))
+    if skipped:
+        print(f"Warning: skipped {len(skipped)} row(s) with empty name fields, e.g. row {skipped[0]}", file=sys.stderr)
+
+    result = fan_out(plan, args.source_dir, args.dest_dir, workers=args.workers, resume=args.resume is not False)
+    for source_name, _ in result.missing_sources:
+        print(f"Error: source not found: {os.path.join(args.source_dir, source_name)}", file=sys.stderr)
+    for dest_name, error in result.errors:
+        print(f"Error: {dest_name}: {error}", file=sys.stderr)
+    print(f"Created {result.created}, already up to date {result.skipped + result.resumed}")
+    ok = result.ok
+
+    if args.render_dir:
+        from birdpy.renditions import DEFAULT_PROFILES, render_fan_out
+
+        profiles = [p for p in DEFAULT_PROFILES if not args.profiles or p.name in args.profiles]
+        unknown = set(args.profiles or ()) - {p.name for p in profiles}
+        if unknown:
+            print(f"Error: unknown profile(s): {', '.join(sorted(unknown))}", file=sys.stderr)
+            return 2
+        renders = render_fan_out(plan, args.source_dir, args.render_dir, profiles)
+        for source_name, profile_name, error in renders.errors:
+            print(f"Error rendering {source_name} ({profile_name}): {error}", file=sys.stderr)
+        print(f"Rendered {renders.rendered} ({renders.cached} cached) from {renders.sources} distinct sources")
+        ok = ok and renders.ok
+    return 0 if ok else 1
+
+
+# --- verify ------------------------------------------------------------------
+
+def _verify_arguments(parser):
+    parser.add_argument('--csv', metavar='CSV', help="metadata the folder was built from (e.g. nftspy/metadata.csv)")
+    parser.add_argument('--source-dir', metavar='DIR', help="folder with the source images")
+    parser.add_argument('--dest-dir', metavar='DIR', help="folder to verify")
+    parser.add_argument('--source-name', metavar='TEMPLATE', help="as for fan-out (default '{Rarity}.webp')")
+    parser.add_argument('--dest-name', metavar='TEMPLATE',
+                        help="as for fan-out (default 'Stone {tokenId:0>4} {Rarity}.webp')")
+    parser.add_argument('--report', metavar='JSON', help="write the machine-readable report to this file")
+    parser.add_argument('--format', dest='output_format', choices=('text', 'json'),
+                        help="json: print the report as JSON on stdout (default text)")
+    parser.add_argument('--workers', type=int, help="hashing threads")
+    parser.add_argument('--no-cache', dest='cache', action='store_false', default=None,
+                        help="hash every file again instead of trusting the digest cache")
+
+
+def _run_verify(args):
+    import csv
+    import json
+
+    from birdpy.verify import format_report, verify
+
+    skipped = []
+    with open(args.csv, 'r', newline='', encoding='utf-8') as f:
+        plan = list(_fan_out_plan(csv.DictReader(f), args.source_name or '{Rarity}.webp',
+                                  args.dest_name or 'Stone {tokenId:0>4} {Rarity}.webp', skipped))
+    if skipped:
+        print(f"Warning: skipped {len(skipped)} row(s) with empty name fields, e.g. row {skipped[0]}", file=sys.stderr)
+
+    report = verify(plan, args.source_dir, args.dest_dir, workers=args.workers,
+                    cache_path=False if args.cache is False else None)
+    if args.report:
+        with open(args.report, 'w', encoding='utf-8') as f:
+            json.dump(report.to_dict(), f, indent=2)
+    if args.output_format == 'json':
+        print(json.dumps(report.to_dict(), indent=2))
+    else:
+        print(format_report(report))
+    return 0 if report.ok else 1
+
+
+# --- image-index -------------------------------------------------------------
+
+def _image_index_arguments(parser):
+    parser.add_argument('--folder', dest='folders', action='append', metavar='DIR',
+                        help="folder of images to index and query; repeat for several")
+    parser.add_argument('--index', metavar='SQLITE', help="index file (default .imageindex.sqlite)")
+    parser.add_argument('--workers', type=int, help="hashing processes")
+    parser.add_argument('--duplicates', action='store_true', default=None, help="list byte-identical images")
+    parser.add_argument('--near-duplicates', action='store_true', default=None,
+                        help="list pairs of different images that look alike")
+    parser.add_argument('--exact', metavar='IMAGE', help="list the images byte-identical to this one")
+    parser.add_argument('--like', metavar='IMAGE', help="list the images that look like this one")
+    parser.add_argument('--max-distance', type=int, metavar='BITS',
+                        help="dHash bits two look-alike images may differ in (default 4)")
+    parser.add_argument('--format', dest='output_format', choices=('text', 'json'),
+                        help="json: print the results as JSON on stdout (default text)")
+
+
+def _run_image_index(args):
+    import json
+
+    from birdpy.imageindex import ImageIndex, content_hash, file_perceptual_hash
+
+    folders = [os.path.abspath(folder) for folder in args.folders]
+    max_distance = 4 if args.max_distance is None else args.max_distance
+    results = {}
+    with ImageIndex(args.index or '.imageindex.sqlite') as index:
+        counts = index.update(folders, workers=args.workers)
+        results["indexed"] = counts
+        if args.duplicates:
+            results["duplicates"] = list(index.duplicates(folders).values())
+        if args.near_duplicates:
+            results["near_duplicates"] = [{"distance": distance, "files": [a, b]}
+                                          for distance, a, b in index.near_duplicates(max_distance, folders)]
+        if args.exact:
+            results["exact"] = [path for path in index.exact(content_hash(args.exact), folders)
+                                if path != os.path.abspath(args.exact)]
+        if args.like:
+            phash = file_perceptual_hash(args.like)
+            if phash is None:
+                print(f"Error: cannot decode {args.like} (is Pillow installed?)", file=sys.stderr)
+                return 2
+            results["like"] = [{"distance": distance, "file": path}
+                               for distance, path in index.near(phash, max_distance, folders)
+                               if path != os.path.abspath(args.like)]
+
+    if args.output_format == 'json':
+        print(json.dumps(results, indent=2))
+    else:
+        print(f"{counts['hashed']} image(s) hashed, {counts['unchanged']} unchanged, {counts['removed']} removed")
+        for group in results.get("duplicates", ()):
+            print(f"identical: {', '.join(group)}")
+        for pair in results.get("near_duplicates", ()):
+            print(f"look alike ({pair['distance']} bits): {', '.join(pair['files'])}")
+        for path in results.get("exact", ()):
+            print(f"identical to {args.exact}: {path}")
+        for match in results.get("like", ()):
+            print(f"like {args.like} ({match['distance']} bits): {match['file']}")
+    # Duplicate queries are QA checks: finding something is a failure
+    found = results.get("duplicates") or results.get("near_duplicates")
+    return 1 if found else 0
+
+
+# --- json-export -------------------------------------------------------------
+
+def _json_export_arguments(parser):
+    parser.add_argument('--nft-list', metavar='CSV', help="apesnftlist.csv or its thin variant")
+    parser.add_argument('--cards', metavar='CSV', help="cardList.csv")
+    parser.add_argument('--output', metavar='PATH', help="output file, or folder for --format sharded")
+    parser.add_argument('--format', dest='output_format', choices=('json', 'ndjson', 'sharded'))
+    parser.add_argument('--compact', action='store_true', default=None, help="no indentation or spaces")
+    parser.add_argument('--report', metavar='JSON', help="write the data problems found to this file")
+
+
+def _shard_name(entry):
+    nft_id = str(entry['meta']['attributes'][0]['value']).strip()
+    return f"{nft_id}.json" if nft_id else None
+
+
+def _run_json_export(args):
+    import json
+
+    from birdpy.cards import BuildReport, CardIndex, build_entries
+    from birdpy.jsonout import write_shards, write_stream
+
+    cards = CardIndex.from_csv(args.cards)
+    report = BuildReport()
+    entries = build_entries(args.nft_list, cards, report)
+    output_format = args.output_format or 'json'
+    if output_format == 'sharded':
+        written = write_shards(entries, args.output, _shard_name, compact=bool(args.compact))
+    else:
+        written = write_stream(entries, args.output, output_format, compact=bool(args.compact))
+
+    if args.report:
+        with open(args.report, 'w', encoding='utf-8') as f:
+            json.dump(report.to_dict(), f, indent=2)
+    print(f"Loaded {len(cards)} cards. Wrote {written} entries to {args.output}")
+    if not report.ok:
+        print(f"Data problems: {len(report.orphans)} orphan card id(s), "
+              f"{len(report.edition_counts)} wrong edition count(s), {len(report.mismatches)} mismatched field(s)",
+              file=sys.stderr)
+    return 0 if report.ok else 1
+
+
+# --- snapshot / drop-delta ---------------------------------------------------
+
+def _snapshot_arguments(parser):
+    parser.add_argument('--store', metavar='DIR', help="holder snapshot store of the collection")
+    parser.add_argument('--input', metavar='CSV', help="holder or mint export, one address per row")
+    parser.add_argument('--column', type=int, help="index of the address column (default 0)")
+    parser.add_argument('--diff', metavar='JSON', help="write the holders added/removed/changed to this file")
+
+
+def _run_snapshot(args):
+    import json
+
+    from birdpy.snapshots import HolderStore
+
+    rejected = []
+    store = HolderStore(args.store)
+    previous = store.snapshots[-1]["number"] if store.snapshots else None
+    number, diff = store.add_snapshot(args.input, column=args.column or 0, rejected=rejected)
+    for row_number, text, error in rejected:
+        print(f"Skipping row {row_number}: {error}", file=sys.stderr)
+    if number == previous:
+        print(f"Unchanged since snapshot {number}")
+    else:
+        print(f"Snapshot {number}: {len(diff.added)} new holder(s), {len(diff.removed)} gone, "
+              f"{len(diff.changed)} changed")
+    if args.diff:
+        with open(args.diff, 'w', encoding='utf-8') as f:
+            json.dump(diff.to_dict(), f, indent=2)
+    return 0
+
+
+def _drop_delta_arguments(parser):
+    parser.add_argument('--store', metavar='DIR', help="holder snapshot store of the collection")
+    parser.add_argument('--contract', help="NFT contract principal, e.g. SP....stacks-stones")
+    parser.add_argument('--function', help="private function of the drop contract, e.g. stones")
+    parser.add_argument('--output-dir', metavar='DIR', help="folder for the .clar files and the manifest")
+    parser.add_argument('--entitlement', choices=('holder', 'units'),
+                        help="one drop per holder (default) or one per row of the export")
+    parser.add_argument('--start-id', type=int, help="first token id; only needed for a store's first drop")
+    parser.add_argument('--import-issued', metavar='FILE',
+                        help="seed an empty ledger from an already issued clarCodeTrait.csv or .clar")
+    parser.add_argument('--prefix', help="contract file name prefix (default nftdrop)")
+    parser.add_argument('--mode', choices=('calls', 'map'))
+    parser.add_argument('--budget-fraction', type=float, metavar='F')
+    parser.add_argument('--trait-csv', metavar='CSV', help="also write the drop lines as clarCodeTrait.csv")
+    parser.add_argument('--include-contracts', action='store_true', default=None,
+                        help="also drop to contract principals (marketplace escrows)")
+    parser.add_argument('--dry-run', action='store_true', default=None, help="plan only, record nothing")
+
+
+def _run_drop_delta(args):
+    from birdpy.dropgen import Budget, DropSpec
+    from birdpy.snapshots import HolderStore
+
+    store = HolderStore(args.store)
+    if args.import_issued:
+        if store.drops:
+            print(f"Ledger already has {len(store.drops)} drop(s); not importing {args.import_issued}")
+        else:
+            imported = store.import_drop_lines(args.import_issued)
+            print(f"Imported {imported} issued drop(s), next id u{store.next_id}")
+    try:
+        contracts, recipients = store.drop(
+            DropSpec(args.contract, args.function), args.output_dir, mode=args.entitlement or 'holder',
+            start_id=args.start_id, prefix=args.prefix or 'nftdrop', contract_mode=args.mode or 'calls',
+            budget=Budget(fraction=args.budget_fraction or 0.8), trait_csv_path=args.trait_csv,
+            include_contracts=bool(args.include_contracts), dry_run=bool(args.dry_run))
+    except ValueError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+    if not recipients:
+        print("Nothing owed: every holder of the latest snapshot already received the drop")
+        return 0
+    for contract in contracts:
+        print(f"Contract ids u{contract.first_id}-u{contract.last_id}: {len(contract.recipients)} recipients")
+    print(f"{len(recipients)} drop(s) " + ("planned (dry run)" if args.dry_run else f"written to {args.output_dir}"))
+    return 0
+
+
+# --- store -------------------------------------------------------------------
+
+def _named(text):
+    name, sep, path = text.partition('=')
+    if not sep or not name or not path:
+        raise argparse.ArgumentTypeError(f"expected NAME=PATH, got {text!r}")
+    return name, path
+
+
+def _store_arguments(parser):
+    parser.add_argument('--db', metavar='SQLITE', help="collection store file (default collection.sqlite)")
+    parser.add_argument('--metadata-csv', dest='metadata_csvs', action='append', type=_named,
+                        metavar='COLLECTION=CSV', help="tokenId,<trait>... rows, e.g. stones=nftspy/metadata.csv")
+    parser.add_argument('--metadata-folder', dest='metadata_folders', action='append', type=_named,
+                        metavar='COLLECTION=DIR', help="folder with one metadata JSON per token")
+    parser.add_argument('--cards', metavar='CSV', help="cardList.csv")
+    parser.add_argument('--nft-list', dest='nft_lists', action='append', type=_named, metavar='COLLECTION=CSV',
+                        help="apesnftlist.csv or its thin variant")
+    parser.add_argument('--apes-json', dest='apes_jsons', action='append', type=_named, metavar='COLLECTION=JSON')
+    parser.add_argument('--holders', dest='holder_lists', action='append', type=_named, metavar='COLLECTION=CSV',
+                        help="holder list or mint export, address in the first column")
+    parser.add_argument('--drop-lines', dest='drop_lines', action='append', type=_named, metavar='DROP=FILE',
+                        help="issued clarCodeTrait.csv or .clar")
+    parser.add_argument('--assets', dest='asset_folders', action='append', type=_named, metavar='COLLECTION=DIR',
+                        help="fan-out folder, token id from the file names")
+
+
+def _run_store(args):
+    from birdpy.principal import InvalidPrincipal
+    from birdpy.store import CollectionStore
+
+    imports = (
+        ('metadata_csvs', 'import_metadata_csv', "tokens"),
+        ('metadata_folders', 'import_metadata_folder', "tokens"),
+        ('nft_lists', 'import_nft_list', "tokens"),
+        ('apes_jsons', 'import_apes_json', "tokens"),
+        ('holder_lists', 'import_holders', "holders"),
+        ('drop_lines', 'import_drop_lines', "drops"),
+        ('asset_folders', 'import_assets', "files"),
+    )
+    db = args.db or 'collection.sqlite'
+    with CollectionStore(db) as store:
+        if args.cards:
+            print(f"{store.import_cards(args.cards)} cards from {args.cards}")
+        for option, method, what in imports:
+            for name, path in getattr(args, option) or ():
+                try:
+                    count = getattr(store, method)(name, path)
+                except InvalidPrincipal as e:
+                    print(f"Error: invalid address in {path}: {e}", file=sys.stderr)
+                    return 1
+                print(f"{name}: {count} {what} from {path}")
+    print(f"Store: {db}")
+    return 0
+
+
+# --- fetch -------------------------------------------------------------------
+
+def _fetch_arguments(parser):
+    parser.add_argument('--asset', help="NFT asset identifier, e.g. SP....the-little-bird::tlb")
+    parser.add_argument('--kind', choices=('mints', 'holders'),
+                        help="mints: address,tokenId per mint (default); holders: one address per token held")
+    parser.add_argument('--output', metavar='CSV', help="export in the hand-exported format (e.g. tlbmints.csv)")
+    parser.add_argument('--unique', metavar='CSV', help="also write the unique addresses, in first-seen order")
+    parser.add_argument('--store', metavar='DIR', help="also add the export to this holder snapshot store")
+    parser.add_argument('--api', metavar='URL', help="Stacks API base URL (default https://api.hiro.so)")
+    parser.add_argument('--api-key', help="sent as x-api-key (default $STACKS_API_KEY)")
+    parser.add_argument('--cache', metavar='PATH', help="response cache, so re-snapshots only fetch new blocks")
+    parser.add_argument('--concurrency', type=int, help="requests in flight (default 8)")
+    parser.add_argument('--retries', type=int, help="retries of a failed request (default 5)")
+    parser.add_argument('--backoff', type=float, metavar='SECONDS', help="delay before the first retry (default 0.5)")
+
+
+def _run_fetch(args):
+    import contextlib
+    import csv
+
+    from birdpy.atomic import atomic_open
+    from birdpy.dedup import count_unique
+    from birdpy.fetch import DEFAULT_BACKOFF, DEFAULT_CONCURRENCY, DEFAULT_RETRIES, Fetcher, FetchError
+
+    fetcher = Fetcher(args.api or 'https://api.hiro.so', cache_path=args.cache,
+                      concurrency=args.concurrency or DEFAULT_CONCURRENCY,
+                      retries=DEFAULT_RETRIES if args.retries is None else args.retries,
+                      backoff=DEFAULT_BACKOFF if args.backoff is None else args.backoff,
+                      api_key=args.api_key or os.environ.get('STACKS_API_KEY'))
+    kind = args.kind or 'mints'
+    rows = fetcher.iter_mints(args.asset) if kind == 'mints' else fetcher.iter_holders(args.asset)
+
+    written = 0
+
+    def exported(writer):
+        # Writes each row as it arrives and passes its address on to the dedup
+        nonlocal written
+        for address, token_id in rows:
+            writer.writerow([address, token_id] if kind == 'mints' else [address])
+            written += 1
+            yield address
+
+    # Both files are replaced only once the whole export arrived, so a failed fetch keeps the previous ones
+    try:
+        with contextlib.ExitStack() as files:
+            out = files.enter_context(atomic_open(args.output, 'w', newline='', encoding='utf-8'))
+            addresses = exported(csv.writer(out))
+            if args.unique:
+                unique_writer = csv.writer(files.enter_context(
+                    atomic_open(args.unique, 'w', newline='', encoding='utf-8')))
+                holders = 0
+                for address, _ in count_unique(addresses):
+                    unique_writer.writerow([address])
+                    holders += 1
+            else:
+                holders = len(set(addresses))
+    except FetchError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+    print(f"{written} {kind} rows, {holders} unique addresses written to {args.output}")
+
+    if args.store:
+        from birdpy.snapshots import HolderStore
+
+        store = HolderStore(args.store)
+        previous = store.snapshots[-1]["number"] if store.snapshots else None
+        number, diff = store.add_snapshot(args.output)
+        if number == previous:
+            print(f"Unchanged since snapshot {number}")
+        else:
+            print(f"Snapshot {number}: {len(diff.added)} new holder(s), {len(diff.removed)} gone, "
+                  f"{len(diff.changed)} changed")
+    return 0
+
+
+# --- generate ----------------------------------------------------------------
+
+def _trait_spec(text):
+    from birdpy.generate import TraitSpec
+
+    name, sep, values = text.partition('=')
+    if not sep or not name or not values:
+        raise argparse.ArgumentTypeError(f"expected NAME=VALUE[:WEIGHT],..., got {text!r}")
+    pairs = []
+    for item in values.split(','):
+        value, sep, weight = item.rpartition(':')
+        if not sep:
+            value, weight = item, '1'
+        try:
+            weight = float(weight)
+        except ValueError:
+            raise argparse.ArgumentTypeError(f"bad weight in {item!r}") from None
+        pairs.append((value, weight))
+    return TraitSpec(name, pairs)
+
+
+def _generate_arguments(parser):
+    parser.add_argument('--tokens', type=int, help="tokens to generate (default: every edition of --cards)")
+    parser.add_argument('--seed', help="the same seed gives the same collection (default 0)")
+    parser.add_argument('--trait', dest='traits', action='append', type=_trait_spec, metavar='NAME=VALUE:WEIGHT,...',
+                        help="target distribution of a trait; repeat for several (default: the nftspy Rarity "
+                             "tiers, or fortune, power and rarity with --cards)")
+    parser.add_argument('--rebalance', action='append', type=_trait_spec, metavar='NAME=VALUE:WEIGHT,...',
+                        help="then move a trait to new targets, changing as few tokens as possible")
+    parser.add_argument('--cards', metavar='CSV', help="cardList.csv: deal every card --editions times")
+    parser.add_argument('--editions', type=int, help="tokens per card (default 10)")
+    parser.add_argument('--first-token-id', type=int, help="id of the first token (default 1)")
+    parser.add_argument('--metadata-csv', metavar='CSV', help="tokenId,<trait>... rows")
+    parser.add_argument('--metadata-folder', metavar='DIR', help="one <tokenId>.json per token")
+    parser.add_argument('--name', metavar='TEMPLATE', help="name in the metadata JSON (default '#{tokenId}')")
+    parser.add_argument('--nft-list', metavar='CSV', help="apesnftlist.csv-style list (needs --cards)")
+
+
+def _run_generate(args):
+    from birdpy.cards import EDITIONS_PER_CARD, CardIndex
+    from birdpy.generate import (
+        APE_RARITIES,
+        FORTUNES,
+        RARITY_TIERS,
+        TraitSpec,
+        generate,
+        rebalance,
+        write_metadata_csv,
+        write_metadata_folder,
+        write_nft_list,
+    )
+
+    if not (args.metadata_csv or args.metadata_folder or args.nft_list):
+        print("Error: give --metadata-csv, --metadata-folder or --nft-list", file=sys.stderr)
+        return 2
+    if args.nft_list and not args.cards:
+        print("Error: --nft-list needs --cards", file=sys.stderr)
+        return 2
+    card_ids = list(CardIndex.from_csv(args.cards).cards) if args.cards else None
+    traits = args.traits
+    if not traits:
+        traits = ([TraitSpec('fortune', FORTUNES), TraitSpec('power', range(1, 11)),
+                   TraitSpec('rarity', APE_RARITIES)] if card_ids else [TraitSpec('Rarity', RARITY_TIERS)])
+    try:
+        collection = generate(args.tokens, traits, seed=args.seed or 0, card_ids=card_ids,
+                              editions=args.editions or EDITIONS_PER_CARD, first_token_id=args.first_token_id or 1)
+        for spec in args.rebalance or ():
+            if spec.name not in collection.traits:
+                raise ValueError(f"Cannot rebalance {spec.name}: not a generated trait")
+            print(f"{spec.name}: {rebalance(collection, spec)} token(s) moved")
+    except ValueError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 2
+    for name in collection.traits:
+        if name != 'cardId':
+            print(f"{name}: " + ", ".join(f"{value} {count}" for value, count in collection.counts(name).items()))
+    if args.metadata_csv:
+        print(f"{write_metadata_csv(collection, args.metadata_csv)} rows written to {args.metadata_csv}")
+    if args.metadata_folder:
+        written = write_metadata_folder(collection, args.metadata_folder, args.name or '#{tokenId}')
+        print(f"{written} metadata files written to {args.metadata_folder}")
+    if args.nft_list:
+        print(f"{write_nft_list(collection, args.nft_list)} NFTs written to {args.nft_list}")
+    return 0
+
+
+# --- pipeline ----------------------------------------------------------------
+
+def _pipeline_arguments(parser):
+    parser.add_argument('--definition', metavar='PY',
+                        help="file defining build_pipeline() (default ./build_pipeline.py)")
+    parser.add_argument('--stage', dest='stages', action='append', metavar='NAME',
+                        help="build only this stage and what it depends on; repeat for several")
+    parser.add_argument('--force', action='store_true', default=None, help="run stages even if up to date")
+    parser.add_argument('--dry-run', action='store_true', default=None, help="only list the stale stages")
+    parser.add_argument('--workers', type=int, help="stages run at the same time")
+
+
+def _run_pipeline(args):
+    import runpy
+
+    definition = os.path.abspath(args.definition or 'build_pipeline.py')
+    pipeline = runpy.run_path(definition)['build_pipeline']()
+    if args.workers:
+        pipeline.workers = args.workers
+    try:
+        result = pipeline.run(args.stages, force=bool(args.force), dry_run=bool(args.dry_run))
+    except ValueError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 2
+    for name, status in result.status.items():
+        error = result.errors.get(name)
+        print(f"{name}: {status}" + (f" ({error})" if error else ""))
+    return 0 if result.ok else 1
+
+
+COMMANDS = (
+    _Command('dedup', "unique addresses of a holder/mint CSV", _dedup_arguments, _run_dedup,
+             paths=('input', 'output'), required=('input', 'output')),
+    _Command('drop-gen', "Clarity drop contracts for a holder list", _drop_gen_arguments, _run_drop_gen,
+             paths=('input', 'output_dir', 'trait_csv'),
+             required=('input', 'contract', 'function', 'start_id', 'output_dir')),
+    _Command('drop-sim', "replay drop contracts offline and check their ids and recipients", _drop_sim_arguments,
+             _run_drop_sim),
+    _Command('allocate', "drop lines weighted by mint counts", _allocate_arguments, _run_allocate,
+             paths=('input', 'output', 'summary', 'output_dir'),
+             required=('input', 'output', 'function', 'start_id')),
+    _Command('metadata-index', "index a metadata folder and export a trait", _metadata_index_arguments,
+             _run_metadata_index, paths=('folder', 'metadata_csv', 'rarity_csv', 'index'), required=('folder',)),
+    _Command('traits', "filter, count and rank the traits of a metadata folder or apes JSON", _traits_arguments,
+             _run_traits, paths=('folder', 'apes_json', 'index', 'csv')),
+    _Command('fan-out', "one image per token from a few sources", _fan_out_arguments, _run_fan_out,
+             paths=('csv', 'source_dir', 'dest_dir', 'render_dir'), required=('csv', 'source_dir', 'dest_dir')),
+    _Command('verify', "check a fan-out folder against its metadata", _verify_arguments, _run_verify,
+             paths=('csv', 'source_dir', 'dest_dir', 'report'), required=('csv', 'source_dir', 'dest_dir')),
+    _Command('image-index', "content and look-alike index of image folders", _image_index_arguments,
+             _run_image_index, paths=('folders', 'index', 'exact', 'like'), required=('folders',)),
+    _Command('json-export', "apes metadata JSON from the NFT list and cardList.csv", _json_export_arguments,
+             _run_json_export, paths=('nft_list', 'cards', 'output', 'report'),
+             required=('nft_list', 'cards', 'output')),
+    _Command('snapshot', "store a holder export and show what changed", _snapshot_arguments, _run_snapshot,
+             paths=('store', 'input', 'diff'), required=('store', 'input')),
+    _Command('drop-delta', "drop contracts for holders not dropped to yet", _drop_delta_arguments,
+             _run_drop_delta, paths=('store', 'output_dir', 'import_issued', 'trait_csv'),
+             required=('store', 'contract', 'function', 'output_dir')),
+    _Command('store', "import the CSV/JSON exports into the SQLite collection store", _store_arguments,
+             _run_store, paths=('db', 'cards')),
+    _Command('fetch', "holder or mint export of an NFT asset from a Stacks API", _fetch_arguments, _run_fetch,
+             paths=('output', 'unique', 'store', 'cache'), required=('asset', 'output')),
+    _Command('generate', "seeded trait assignment for a new collection", _generate_arguments, _run_generate,
+             paths=('cards', 'metadata_csv', 'metadata_folder', 'nft_list')),
+    _Command('pipeline', "run the out-of-date stages of the collection build", _pipeline_arguments,
+             _run_pipeline, paths=('definition',)),
+)
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog='birdpy', description="Collection tools for the bird NFT projects.")
+    parser.add_argument('--config', metavar='TOML',
+                        help=f"config file (default ${CONFIG_ENV} or ./{CONFIG_NAME} if present)")
+    parser.add_argument('--log-format', choices=('text', 'json'),
+                        help="json: one event per line on stderr (default text, or $BIRDPY_LOG_FORMAT)")
+    parser.add_argument('--profile', dest='profilers', action='append', choices=('cpu', 'memory'),
+                        help="profile the command: cProfile (cpu) or tracemalloc (memory); repeatable")
+    parser.add_argument('--profile-dir', metavar='DIR', help="where cpu profiles are written (default .)")
+    parser.add_argument('--metrics', metavar='JSON', help="write counters, histograms and stage timings here")
+    subparsers = parser.add_subparsers(dest='command', metavar='command', required=True)
+    for command in COMMANDS:
+        subparser = subparsers.add_parser(command.name, help=command.help, description=command.help)
+        command.add_arguments(subparser)
+        subparser.set_defaults(_command=command, _parser=subparser)
+    return parser
+
+
+def load_config(path):
+    """Parses a TOML config file: {subcommand: {option: value}}."""
+    import tomllib
+
+    with open(path, 'rb') as f:
+        return tomllib.load(f)
+
+
+def _config_path(args):
+    if args.config:
+        return args.config
+    if os.environ.get(CONFIG_ENV):
+        return os.environ[CONFIG_ENV]
+    return CONFIG_NAME if os.path.exists(CONFIG_NAME) else None
+
+
+def apply_config(args, command, section, base_dir):
+    """Fills options not given on the command line from a config table."""
+    for key, value in section.items():
+        dest = key.replace('-', '_')
+        if not hasattr(args, dest) or dest.startswith('_'):
+            args._parser.error(f"unknown option in config [{command.name}]: {key}")
+        if getattr(args, dest) is not None:
+            continue
+        if dest in command.paths:
+            value = _config_paths(value, base_dir)
+        setattr(args, dest, value)
+
+
+def _config_paths(value, base_dir):
+    # a path option, or a list of them for the repeatable ones (e.g. image-index folders)
+    if isinstance(value, list):
+        return [_config_paths(item, base_dir) for item in value]
+    if isinstance(value, str) and not os.path.isabs(value):
+        return os.path.join(base_dir, value)
+    return value
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    command = args._command
+
+    config_path = _config_path(args)
+    if config_path:
+        try:
+            config = load_config(config_path)
+        except (OSError, ValueError) as e:
+            print(f"Error: cannot read config {config_path}: {e}", file=sys.stderr)
+            return 2
+        apply_config(args, command, config.get(command.name, {}),
+                     os.path.dirname(os.path.abspath(config_path)))
+
+    missing = [name for name in command.required if getattr(args, name) is None]
+    if missing:
+        args._parser.error("missing " + ", ".join('--' + name.replace('_', '-') for name in missing)
+                           + " (on the command line or in the config)")
+
+    from birdpy import instrument
+
+    instrumentation = instrument.get()
+    if args.log_format or args.profilers or args.profile_dir:
+        instrumentation = instrument.configure(
+            log_format=args.log_format or instrumentation.log_format,
+            profile=args.profilers or instrumentation.profile,
+            profile_dir=args.profile_dir or instrumentation.profile_dir,
+        )
+    try:
+        with instrumentation.stage(command.name):
+            return command.run(args)
+    except FileNotFoundError as e:
+        print(f"Error: file not found: {e.filename}", file=sys.stderr)
+        return 1
+    except KeyboardInterrupt:
+        return 130
+    finally:
+        instrumentation.report(args.metrics)
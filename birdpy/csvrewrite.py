@@ -0,0 +1,211 @@
+import csv
+import json
+import os
+import tempfile
+
+
+class KeepValue(Exception):
+    """Raised by a transform to leave a value unchanged; the message becomes a warning."""
+
+
+def _fsync_dir(folder):
+    if os.name != 'posix':
+        return
+    fd = os.open(folder or '.', os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def _line_terminator(path):
+    with open(path, 'rb') as f:
+        head = f.readline()
+    return '\r\n' if head.endswith(b'\r\n') else '\n'
+
+
+class RewriteResult:
+    def __init__(self):
+        self.rows = 0
+        self.changed_rows = 0
+        self.warnings = []  # (row number, message)
+        self.renamed = 0
+        self.written = False
+
+
+class CsvRewriter:
+    """
+    Streaming, atomic in-place rewrite of a CSV file through per-column transforms.
+
+    Rows are read one at a time and written to a temp file in the same
+    folder, which is fsynced and renamed over the original only if some value
+    changed. A crash at any point leaves either the old or the new file, never
+    a truncated one.
+
+    Files named by a column (e.g. fileName -> monkeyNfts/<fileName>) can be
+    renamed in the same transaction with rename_files_in(). The renames are
+    journaled next to the CSV; recover() undoes them if the process died
+    before the CSV was replaced.
+
+    Args:
+        path: CSV file with a header row.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.transforms = {}  # column -> list of functions
+        self.rename_column = None
+        self.rename_folder = None
+
+    @property
+    def journal_path(self):
+        return f"{self.path}.rename-journal"
+
+    def register(self, column, transform):
+        """
+        Adds a transform for a column. transform(value) returns the new value
+        or raises KeepValue. Several transforms on a column run in order.
+        """
+        self.transforms.setdefault(column, []).append(transform)
+        return self
+
+    def rename_files_in(self, column, folder):
+        """Renames folder/<old value> to folder/<new value> whenever column changes."""
+        self.rename_column = column
+        self.rename_folder = folder
+        return self
+
+    def recover(self):
+        """
+        Finishes or rolls back an interrupted run, using the rename journal.
+
+        Returns:
+            bool: True if there was something to recover.
+        """
+        if not os.path.exists(self.journal_path):
+            return False
+        with open(self.journal_path, 'r', encoding='utf-8') as f:
+            journal = json.load(f)
+        if os.path.exists(journal['tmp']):
+            # The CSV was never replaced: put the files back under their old names.
+            for old, new in reversed(journal['renames']):
+                if os.path.exists(new) and not os.path.exists(old):
+                    os.rename(new, old)
+            os.unlink(journal['tmp'])
+        os.unlink(self.journal_path)
+        return True
+
+    def _transform(self, row_number, header, row, result, renames):
+        changed = False
+        for column, transforms in self.transforms.items():
+            index = header.index(column)
+            if index >= len(row):
+                result.warnings.append((row_number, f"row has no '{column}' column"))
+                continue
+            old = value = row[index]
+            for transform in transforms:
+                try:
+                    value = transform(value)
+                except KeepValue as e:
+                    result.warnings.append((row_number, str(e)))
+            if value != old:
+                row[index] = value
+                changed = True
+                if column == self.rename_column:
+                    renames.append((os.path.join(self.rename_folder, old), os.path.join(self.rename_folder, value)))
+        return changed
+
+    def run(self):
+        """
+        Streams the file through the transforms.
+
+        Returns:
+            RewriteResult
+
+        Raises:
+            ValueError: A registered column is not in the header.
+            OSError: A rename failed; the CSV and the files are left as they were.
+        """
+        self.recover()
+        result = RewriteResult()
+        renames = []
+        folder = os.path.dirname(self.path) or '.'
+        fd, tmp = tempfile.mkstemp(prefix='.' + os.path.basename(self.path) + '.', suffix='.tmp', dir=folder)
+        try:
+            with open(self.path, 'r', newline='', encoding='utf-8') as src, \
+                 os.fdopen(fd, 'w', newline='', encoding='utf-8') as dst:
+                reader = csv.reader(src)
+                writer = csv.writer(dst, lineterminator=_line_terminator(self.path))
+                header = next(reader, None)
+                if header is None:
+                    raise ValueError(f"{self.path} is empty")
+                missing = [column for column in self.transforms if column not in header]
+                if missing:
+                    raise ValueError(f"Column(s) not found in {self.path}: {', '.join(missing)}")
+                writer.writerow(header)
+
+                for row_number, row in enumerate(reader, 2):
+                    result.rows += 1
+                    if row and self._transform(row_number, header, row, result, renames):
+                        result.changed_rows += 1
+                    writer.writerow(row)
+
+                if not result.changed_rows:
+                    return result
+                dst.flush()
+                os.fsync(dst.fileno())
+
+            if renames:
+                self._rename(renames, tmp)
+                result.renamed = len(renames)
+
+            # mkstemp creates 0600 files; keep the permissions of the original
+            os.chmod(tmp, os.stat(self.path).st_mode & 0o7777)
+            os.replace(tmp, self.path)
+            _fsync_dir(folder)
+            if renames:
+                os.unlink(self.journal_path)
+            result.written = True
+            return result
+        finally:
+            if os.path.exists(tmp) and not os.path.exists(self.journal_path):
+                os.unlink(tmp)
+
+    def _rename(self, renames, tmp):
+        pending = []
+        for old, new in renames:
+            if not os.path.exists(old) and os.path.exists(new):
+                continue  # already renamed by an earlier run
+            if os.path.exists(new):
+                raise OSError(f"Cannot rename {old}: {new} already exists")
+            if not os.path.exists(old):
+                raise OSError(f"Cannot rename {old}: file not found")
+            pending.append((old, new))
+
+        with open(self.journal_path, 'w', encoding='utf-8') as f:
+            json.dump({'tmp': tmp, 'renames': pending}, f)
+            f.flush()
+            os.fsync(f.fileno())
+
+        done = []
+        try:
+            for old, new in pending:
+                os.rename(old, new)
+                done.append((old, new))
+        except OSError:
+            for old, new in reversed(done):
+                os.rename(new, old)
+            os.unlink(self.journal_path)
+            raise
+
+
+def zero_pad_filename(width=4, extension='.webp'):
+    """Transform for fileName columns: '1.webp' -> '0001.webp'."""
+    def transform(value):
+        if '.' not in value or not value.endswith(extension):
+            raise KeepValue(f"unexpected fileName format: {value}")
+        base_name, ext = value.rsplit('.', 1)
+        if not base_name.isdigit():
+            raise KeepValue(f"numeric part of fileName is not a digit: {value}")
+        return f"{int(base_name):0{width}d}.{ext}"
+    return transform
@@ -0,0 +1,210 @@
+import csv
+import os
+import sqlite3
+import tempfile
+import time
+
+from birdpy import fastcsv, instrument
+from birdpy.atomic import atomic_open
+from birdpy.principal import InvalidPrincipal, intern_principal
+
+# Unique addresses kept in a dict before the dedup moves to an on-disk table.
+# 1M entries of ~41 char strings is in the order of 150 MB of Python objects.
+DEFAULT_MEMORY_BUDGET = 1_000_000
+
+# Rows buffered between two upserts once the dedup runs on disk.
+SPILL_BATCH_SIZE = 50_000
+
+
+class _SqliteSeen:
+    """
+    On-disk (address -> count) table that keeps first-seen order.
+
+    The rowid is the position of the address in the input, so reading the
+    table back in rowid order gives first-seen order without a sort.
+    """
+
+    def __init__(self, spill_dir=None):
+        fd, self.path = tempfile.mkstemp(prefix='dedup-', suffix='.sqlite', dir=spill_dir)
+        os.close(fd)
+        self.db = sqlite3.connect(self.path)
+        self.db.execute("PRAGMA journal_mode = OFF")
+        self.db.execute("PRAGMA synchronous = OFF")
+        self.db.execute("CREATE TABLE seen (first INTEGER PRIMARY KEY, address TEXT NOT NULL UNIQUE, n INTEGER NOT NULL)")
+
+    def add(self, batch):
+        """batch: dict address -> (first position, count)"""
+        self.db.executemany(
+            "INSERT INTO seen (first, address, n) VALUES (?, ?, ?) "
+            "ON CONFLICT(address) DO UPDATE SET n = n + excluded.n",
+            ((first, address, n) for address, (first, n) in batch.items()),
+        )
+
+    def __iter__(self):
+        for address, n in self.db.execute("SELECT address, n FROM seen ORDER BY first"):
+            yield address, n
+
+    def close(self):
+        self.db.close()
+        os.unlink(self.path)
+
+
+def count_unique(values, memory_budget=DEFAULT_MEMORY_BUDGET, spill_dir=None):
+    """
+    Counts the distinct values of a stream, keeping first-seen order.
+
+    Up to memory_budget distinct values are counted in a dict. Past that the
+    counts move to a temporary SQLite table in spill_dir, so memory stays
+    bounded no matter how many holders the export has. The output is the same
+    in both modes.
+
+    Args:
+        values: Iterable of strings (e.g. addresses); empty values are ignored.
+        memory_budget: Distinct values kept in memory before spilling to disk.
+        spill_dir: Folder for the temporary table (system temp folder by default).
+
+    Yields:
+        (value, count) tuples in the order each value was first seen.
+    """
+    counts = {}
+    values = iter(values)
+    for value in values:
+        if not value:
+            continue
+        counts[value] = counts.get(value, 0) + 1
+        if len(counts) > memory_budget:
+            break
+    else:
+        yield from counts.items()
+        return
+
+    seen = _SqliteSeen(spill_dir)
+    try:
+        position = 0
+        batch = {}
+        for value, n in counts.items():
+            batch[value] = (position, n)
+            position += 1
+        seen.add(batch)
+        counts = None
+
+        batch = {}
+        for value in values:
+            if not value:
+                continue
+            entry = batch.get(value)
+            if entry is None:
+                batch[value] = (position, 1)
+                position += 1
+            else:
+                batch[value] = (entry[0], entry[1] + 1)
+            if len(batch) >= SPILL_BATCH_SIZE:
+                seen.add(batch)
+                batch = {}
+        seen.add(batch)
+        yield from seen
+    finally:
+        seen.close()
+
+
+def read_column(path, column=0, skip_header=False):
+    """Streams one column of a CSV file, stripped of surrounding whitespace."""
+    with open(path, 'r', newline='', encoding='utf-8') as f:
+        reader = csv.reader(f)
+        if skip_header:
+            next(reader, None)
+        for row in reader:
+            if len(row) > column:
+                yield row[column].strip()
+
+
+def validated_principals(values):
+    """
+    Passes each value through the principal interning table, so equal
+    addresses share one object and invalid ones stop the ingest.
+
+    Raises:
+        InvalidPrincipal: With the 1-based position of the bad value.
+    """
+    for position, value in enumerate(values, 1):
+        if not value:
+            continue
+        try:
+            yield str(intern_principal(value))
+        except InvalidPrincipal as e:
+            raise InvalidPrincipal(f"Row {position}: {e}") from None
+
+
+def canonical_counts(scan):
+    """
+    Validates the distinct values of a fastcsv.ColumnScan as principals and
+    merges different spellings of the same principal.
+
+    Raises:
+        InvalidPrincipal: With the line of the first bad value.
+
+    Returns:
+        dict: principal string -> rows, in first-seen order.
+    """
+    counts = {}
+    for value, n, line in scan:
+        try:
+            principal = str(intern_principal(value))
+        except InvalidPrincipal as e:
+            raise InvalidPrincipal(f"Row {line}: {e}") from None
+        counts[principal] = counts.get(principal, 0) + n
+    return counts
+
+
+def dedup_csv(input_path, output_path, column=0, with_counts=False, skip_header=False,
+              memory_budget=DEFAULT_MEMORY_BUDGET, spill_dir=None, validate=False):
+    """
+    Writes the unique values of a CSV column to a new CSV, in first-seen order.
+
+    Args:
+        input_path: CSV to read (e.g. tlbmints.csv with address,tokenId rows).
+        output_path: CSV to write.
+        column: Index of the address column.
+        with_counts: Also write how many rows each address had (e.g. mints per holder).
+        skip_header: Ignore the first row of the input.
+        memory_budget: See count_unique().
+        spill_dir: See count_unique().
+        validate: Check every value as a Stacks principal (c32check) and
+            raise InvalidPrincipal on the first bad one.
+
+    Plain exports are read through the memory-mapped fast path
+    (birdpy.fastcsv), which only validates each distinct value once; other
+    files, and files past memory_budget distinct values, go through the
+    csv module.
+
+    output_path is only replaced once every row has been read, so a bad
+    row leaves the previous output untouched.
+
+    Returns:
+        int: Number of unique values written.
+    """
+    start = time.perf_counter()
+    scan = fastcsv.scan_column(input_path, column, skip_header, max_distinct=memory_budget)
+    if scan is not None:
+        counted = canonical_counts(scan).items() if validate else ((value, n) for value, n, _ in scan)
+    else:
+        values = read_column(input_path, column, skip_header)
+        if validate:
+            values = validated_principals(values)
+        counted = count_unique(values, memory_budget, spill_dir)
+
+    written = rows = 0
+    with atomic_open(output_path, 'w', newline='', encoding='utf-8') as out:
+        writer = csv.writer(out)
+        for value, n in counted:
+            writer.writerow([value, n] if with_counts else [value])
+            written += 1
+            rows += n
+
+    metrics = instrument.get()
+    metrics.count('dedup.rows', rows)
+    metrics.count('dedup.unique', written)
+    elapsed = time.perf_counter() - start
+    if elapsed > 0:
+        metrics.observe('dedup.rows_per_second', rows / elapsed)
+    return written
@@ -0,0 +1,335 @@
+import csv
+import json
+import os
+import re
+
+from birdpy import fastcsv
+from birdpy.atomic import atomic_open
+from birdpy.principal import InvalidPrincipal, intern_principal
+
+DROP_FUNCTION_TEMPLATE = """(define-private ({function} (id uint) (recipient principal))
+    (begin
+        (try! (contract-call? '{contract} claim))
+        (try! (contract-call? '{contract} transfer id tx-sender recipient))
+        (ok true)
+    )
+)
+"""
+
+
+class ExecutionCost:
+    """The five Stacks execution cost dimensions."""
+
+    FIELDS = ('runtime', 'read_count', 'read_length', 'write_count', 'write_length')
+
+    def __init__(self, runtime=0, read_count=0, read_length=0, write_count=0, write_length=0):
+        self.runtime = runtime
+        self.read_count = read_count
+        self.read_length = read_length
+        self.write_count = write_count
+        self.write_length = write_length
+
+    def __add__(self, other):
+        return ExecutionCost(*(getattr(self, f) + getattr(other, f) for f in self.FIELDS))
+
+    def __mul__(self, factor):
+        return ExecutionCost(*(getattr(self, f) * factor for f in self.FIELDS))
+
+    def __eq__(self, other):
+        return isinstance(other, ExecutionCost) and self.as_dict() == other.as_dict()
+
+    def fits(self, limit):
+        """True if no dimension exceeds the same dimension of limit."""
+        return all(getattr(self, f) <= getattr(limit, f) for f in self.FIELDS)
+
+    def as_dict(self):
+        return {f: getattr(self, f) for f in self.FIELDS}
+
+    def __repr__(self):
+        return "ExecutionCost(" + ", ".join(f"{f}={getattr(self, f)}" for f in self.FIELDS) + ")"
+
+
+# Stacks block limits (epoch 2.1+). A single deploy transaction has to fit in them.
+BLOCK_LIMIT = ExecutionCost(
+    runtime=5_000_000_000,
+    read_count=15_000,
+    read_length=100_000_000,
+    write_count=15_000,
+    write_length=15_000_000,
+)
+
+# Rough cost of one claim + transfer against a SIP-009 contract: both
+# contract-calls load the NFT contract (read_length), claim bumps the last id
+# and mints, transfer checks the owner and moves the token.
+DEFAULT_RECIPIENT_COST = ExecutionCost(
+    runtime=1_500_000,
+    read_count=8,
+    read_length=25_000,
+    write_count=4,
+    write_length=300,
+)
+
+# Deploying a contract: the analysis passes and storing the source. The
+# length dependent part is added per byte with SOURCE_BYTE_COST.
+DEFAULT_CONTRACT_COST = ExecutionCost(runtime=2_000_000, read_count=10, read_length=5_000, write_count=6, write_length=1_000)
+SOURCE_BYTE_COST = ExecutionCost(runtime=1_000, write_length=2)
+
+# Largest contract source we are willing to deploy in one transaction.
+MAX_SOURCE_LENGTH = 1_000_000
+
+
+class DropSpec:
+    """
+    What a drop calls: the NFT contract and the private function wrapping
+    its claim + transfer.
+
+    Args:
+        contract: Contract identifier, e.g. 'SP3J9...TQAT7.stacks-stones'.
+        function: Name of the private function, e.g. 'stones'.
+        recipient_cost: Estimated ExecutionCost of one call.
+    """
+
+    def __init__(self, contract, function, recipient_cost=DEFAULT_RECIPIENT_COST):
+        self.contract = contract
+        self.function = function
+        self.recipient_cost = recipient_cost
+
+    def header(self):
+        return DROP_FUNCTION_TEMPLATE.format(function=self.function, contract=self.contract)
+
+
+class Budget:
+    """
+    Limits a generated contract has to stay under.
+
+    Args:
+        limit: ExecutionCost ceiling, BLOCK_LIMIT by default.
+        fraction: Share of limit to use, leaving room for estimate errors
+            and other transactions in the block.
+        max_source_length: Maximum contract source size in bytes.
+    """
+
+    def __init__(self, limit=BLOCK_LIMIT, fraction=0.8, max_source_length=MAX_SOURCE_LENGTH):
+        self.limit = limit
+        self.fraction = fraction
+        self.max_source_length = max_source_length
+
+    @property
+    def effective_limit(self):
+        return ExecutionCost(*(int(getattr(self.limit, f) * self.fraction) for f in ExecutionCost.FIELDS))
+
+
+def drop_line(function, token_id, recipient):
+    """One top-level call, e.g. (stones u585 'SP1F4...)"""
+    return f"({function} u{token_id} '{recipient})"
+
+
+class DropContract:
+    """One generated contract: a contiguous slice of the recipients."""
+
+    def __init__(self, spec, mode, first_id, recipients):
+        self.spec = spec
+        self.mode = mode
+        self.first_id = first_id
+        self.recipients = recipients
+
+    @property
+    def last_id(self):
+        return self.first_id + len(self.recipients) - 1
+
+    def source(self):
+        ids = range(self.first_id, self.first_id + len(self.recipients))
+        if self.mode == 'calls':
+            body = "\n".join(drop_line(self.spec.function, i, r) for i, r in zip(ids, self.recipients))
+        else:
+            body = (f"(map {self.spec.function}\n"
+                    f"    (list {' '.join(f'u{i}' for i in ids)})\n"
+                    "    (list\n"
+                    + "\n".join(f"        '{r}" for r in self.recipients)
+                    + "\n    )\n)")
+        return f"{self.spec.header()}\n{body}\n"
+
+    def estimated_cost(self):
+        length = len(self.source())
+        return DEFAULT_CONTRACT_COST + SOURCE_BYTE_COST * length + self.spec.recipient_cost * len(self.recipients)
+
+
+def _entry_length(mode, function, token_id, recipient):
+    """Bytes one recipient adds to the contract source."""
+    if mode == 'calls':
+        return len(drop_line(function, token_id, recipient)) + 1
+    return len(f" u{token_id}") + len(f"        '{recipient}\n")
+
+
+def plan_contracts(recipients, start_id, spec, budget=None, mode='calls'):
+    """
+    Splits recipients into as few contracts as fit the budget.
+
+    Recipients keep their order and ids are consecutive from start_id, so
+    every contract covers a contiguous id range. Since all the costs grow
+    with each added recipient, filling each contract greedily gives the
+    fewest contracts.
+
+    Args:
+        recipients: Sequence of principal strings.
+        start_id: Token id of the first recipient.
+        spec: DropSpec.
+        budget: Budget, Budget() by default.
+        mode: 'calls' for one top-level call per recipient (the format of
+            the existing nftdrop.clar files) or 'map' for a single
+            (map <function> (list ids) (list recipients)) expression.
+
+    Returns:
+        list[DropContract]
+    """
+    if mode not in ('calls', 'map'):
+        raise ValueError(f"Unknown mode: {mode}")
+    if budget is None:
+        budget = Budget()
+    limit = budget.effective_limit
+
+    base_length = len(DropContract(spec, mode, start_id, []).source())
+    base_cost = DEFAULT_CONTRACT_COST + SOURCE_BYTE_COST * base_length
+    if not (base_cost + spec.recipient_cost).fits(limit):
+        raise ValueError("A single recipient does not fit in the budget")
+
+    contracts = []
+    current = []
+    first_id = start_id
+    cost = base_cost
+    length = base_length
+    for offset, recipient in enumerate(recipients):
+        token_id = start_id + offset
+        entry_length = _entry_length(mode, spec.function, token_id, recipient)
+        entry_cost = spec.recipient_cost + SOURCE_BYTE_COST * entry_length
+        if current and (not (cost + entry_cost).fits(limit) or length + entry_length > budget.max_source_length):
+            contracts.append(DropContract(spec, mode, first_id, current))
+            current = []
+            first_id = token_id
+            cost = base_cost
+            length = base_length
+        current.append(recipient)
+        cost = cost + entry_cost
+        length += entry_length
+    if current:
+        contracts.append(DropContract(spec, mode, first_id, current))
+    return contracts
+
+
+def write_contracts(contracts, output_dir, prefix='nftdrop'):
+    """
+    Writes <prefix>-NNN.clar files and a <prefix>-manifest.json that maps
+    each file to its id range, recipient count and estimated cost.
+
+    Every file is replaced only once it is complete, and <prefix>-NNN.clar
+    files of an earlier, larger drop that are not in the new manifest are
+    removed, so no stale contract is left to deploy by mistake.
+
+    Returns:
+        str: Path of the manifest.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    manifest = []
+    for number, contract in enumerate(contracts, 1):
+        file_name = f"{prefix}-{number:03d}.clar"
+        with atomic_open(os.path.join(output_dir, file_name), 'w', encoding='utf-8') as f:
+            f.write(contract.source())
+        manifest.append({
+            "file": file_name,
+            "contract": contract.spec.contract,
+            "function": contract.spec.function,
+            "mode": contract.mode,
+            "first_id": contract.first_id,
+            "last_id": contract.last_id,
+            "recipients": len(contract.recipients),
+            "estimated_cost": contract.estimated_cost().as_dict(),
+        })
+
+    manifest_path = os.path.join(output_dir, f"{prefix}-manifest.json")
+    with atomic_open(manifest_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2)
+
+    written = {entry["file"] for entry in manifest}
+    contract_file = re.compile(re.escape(prefix) + r'-\d+\.clar')
+    for name in os.listdir(output_dir):
+        if contract_file.fullmatch(name) and name not in written:
+            os.unlink(os.path.join(output_dir, name))
+    return manifest_path
+
+
+def read_recipients(path, rejected=None):
+    """
+    Reads drop recipients from a holder CSV (address in the first column).
+
+    Each address is validated and returned in its canonical spelling. Bad
+    rows are appended to rejected as (row number, text, error) when a list
+    is given, otherwise they raise InvalidPrincipal.
+
+    Plain files go through the memory-mapped fast path (birdpy.fastcsv),
+    which validates each distinct address once.
+    """
+    scan = fastcsv.scan_column(path, column=None, codes=True)
+    if scan is not None:
+        canonical = []
+        try:
+            for text, _, line in scan:
+                text = text.rstrip(";")
+                try:
+                    canonical.append(str(intern_principal(text)))
+                except InvalidPrincipal as e:
+                    raise InvalidPrincipal(f"Row {line}: {e}") from None
+        except InvalidPrincipal:
+            if rejected is None:
+                raise
+        else:
+            scan.values = canonical
+            return scan.rows()
+
+    recipients = []
+    with open(path, 'r', newline='', encoding='utf-8') as f:
+        for number, row in enumerate(csv.reader(f), 1):
+            if not row:
+                continue
+            text = ",".join(row).rstrip(";")
+            try:
+                recipients.append(str(intern_principal(text)))
+            except InvalidPrincipal as e:
+                if rejected is None:
+                    raise InvalidPrincipal(f"Row {number}: {e}") from None
+                rejected.append((number, text, str(e)))
+    return recipients
+
+
+def write_drop_lines(path, function, start_id, recipients):
+    """Writes the one-call-per-line clarCodeTrait.csv the drop scripts always produced."""
+    with atomic_open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        for offset, recipient in enumerate(recipients):
+            writer.writerow([drop_line(function, start_id + offset, recipient)])
+
+
+def generate_drop(input_path, spec, start_id, output_dir, prefix='nftdrop', mode='calls', budget=None,
+                  trait_csv_path=None):
+    """
+    Reads a holder list and writes the drop contracts for it.
+
+    Args:
+        input_path: Holder CSV, one address per row.
+        spec: DropSpec.
+        start_id: Token id of the first recipient.
+        output_dir: Folder for the .clar files and the manifest.
+        prefix: File name prefix of the contracts.
+        mode: 'calls' or 'map', see plan_contracts().
+        budget: Budget, Budget() by default.
+        trait_csv_path: Also write the legacy clarCodeTrait.csv here.
+
+    Returns:
+        (contracts, manifest path, rejected rows)
+    """
+    rejected = []
+    recipients = read_recipients(input_path, rejected)
+    if trait_csv_path:
+        write_drop_lines(trait_csv_path, spec.function, start_id, recipients)
+    contracts = plan_contracts(recipients, start_id, spec, budget, mode)
+    manifest_path = write_contracts(contracts, output_dir, prefix)
+    return contracts, manifest_path, rejected
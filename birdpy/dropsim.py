@@ -0,0 +1,297 @@
+import re
+
+from birdpy.dropgen import DEFAULT_CONTRACT_COST, DEFAULT_RECIPIENT_COST, SOURCE_BYTE_COST, Budget, ExecutionCost
+from birdpy.principal import InvalidPrincipal, intern_principal
+
+_TOKEN_RE = re.compile(r";;[^\n]*|\(|\)|[^\s()]+")
+
+# Stands in for tx-sender, the deployer of the drop contract.
+SENDER = 'tx-sender'
+
+
+class DropParseError(ValueError):
+    pass
+
+
+def parse_forms(source):
+    """Reads Clarity source into nested lists of atom strings (comments dropped)."""
+    forms = []
+    stack = [forms]
+    for token in _TOKEN_RE.findall(source):
+        if token == '(':
+            stack.append([])
+        elif token == ')':
+            if len(stack) == 1:
+                raise DropParseError("Unbalanced ')'")
+            form = stack.pop()
+            stack[-1].append(form)
+        elif not token.startswith(';;'):
+            stack[-1].append(token)
+    if len(stack) != 1:
+        raise DropParseError("Unbalanced '('")
+    return forms
+
+
+class DropFunction:
+    """The define-private header of a drop: its name and the NFT contract it calls."""
+
+    def __init__(self, name, contract, calls):
+        self.name = name
+        self.contract = contract
+        self.calls = calls  # contract functions called, in order (e.g. ['claim', 'transfer'])
+
+
+def _find_contract_calls(form, found):
+    if isinstance(form, list):
+        if len(form) >= 3 and form[0] == 'contract-call?':
+            found.append((form[1].lstrip("'"), form[2]))
+        for item in form:
+            _find_contract_calls(item, found)
+
+
+def _parse_define(form):
+    # (define-private (name (id uint) (recipient principal)) body)
+    signature = form[1]
+    if not isinstance(signature, list) or not signature or not isinstance(signature[0], str):
+        raise DropParseError("Malformed define-private")
+    found = []
+    _find_contract_calls(form[2:], found)
+    contracts = {contract for contract, _ in found}
+    if len(contracts) > 1:
+        raise DropParseError(f"{signature[0]} calls more than one contract: {sorted(contracts)}")
+    return DropFunction(signature[0], contracts.pop() if contracts else None, [name for _, name in found])
+
+
+def _uint(atom):
+    if not isinstance(atom, str) or not atom.startswith('u') or not atom[1:].isdigit():
+        raise DropParseError(f"Expected a uint literal, got {atom!r}")
+    return int(atom[1:])
+
+
+def _principal(atom):
+    if not isinstance(atom, str) or not atom.startswith("'"):
+        raise DropParseError(f"Expected a principal literal, got {atom!r}")
+    return atom[1:]
+
+
+class DropCall:
+    """One (function uN 'principal) transfer, with where it came from."""
+
+    __slots__ = ('file', 'index', 'token_id', 'recipient', 'length')
+
+    def __init__(self, file, index, token_id, recipient, length):
+        self.file = file
+        self.index = index
+        self.token_id = token_id
+        self.recipient = recipient
+        self.length = length  # source bytes of this call, for the cost estimate
+
+
+def parse_drop(source, file='<string>'):
+    """
+    Parses a generated drop contract.
+
+    Both layouts written by birdpy.dropgen are understood: one top-level
+    (fn uN 'SP...) call per recipient and (map fn (list u...) (list 'SP...)).
+
+    Returns:
+        (DropFunction or None, list[DropCall])
+    """
+    functions = {}
+    calls = []
+    for form in parse_forms(source):
+        if not isinstance(form, list) or not form:
+            continue
+        head = form[0]
+        if head == 'define-private':
+            function = _parse_define(form)
+            functions[function.name] = function
+        elif head in functions:
+            if len(form) != 3:
+                raise DropParseError(f"{head} expects 2 arguments, got {len(form) - 1}")
+            recipient = _principal(form[2])
+            length = len(f"({head} {form[1]} {form[2]})") + 1
+            calls.append(DropCall(file, len(calls), _uint(form[1]), recipient, length))
+        elif head == 'map' and len(form) == 4 and form[1] in functions:
+            ids, recipients = form[2], form[3]
+            if not (isinstance(ids, list) and isinstance(recipients, list) and ids[:1] == ['list'] and recipients[:1] == ['list']):
+                raise DropParseError("map over something other than list literals")
+            if len(ids) != len(recipients):
+                raise DropParseError(f"map lists differ in length: {len(ids) - 1} ids, {len(recipients) - 1} recipients")
+            for id_atom, recipient_atom in zip(ids[1:], recipients[1:]):
+                length = len(id_atom) + len(recipient_atom) + 10
+                calls.append(DropCall(file, len(calls), _uint(id_atom), _principal(recipient_atom), length))
+    function = next(iter(functions.values()), None)
+    return function, calls
+
+
+class DropReport:
+    """Result of simulate(); see to_dict() for the machine-readable form."""
+
+    def __init__(self):
+        self.files = []
+        self.calls = 0
+        self.first_id = None
+        self.last_id = None
+        self.expected_start = None
+        self.duplicates = {}        # token id -> list of (file, call index)
+        self.gaps = []              # (first missing id, last missing id)
+        self.before_start = []      # ids lower than expected_start
+        self.invalid_recipients = []  # (file, call index, principal, error)
+        self.failed_transfers = []    # (file, call index, token id, reason)
+        self.per_recipient = {}     # principal -> number of tokens received
+        self.call_cost = ExecutionCost()
+        self.file_costs = {}        # file -> ExecutionCost
+        self.over_budget = []       # files whose estimate does not fit the budget
+
+    @property
+    def ok(self):
+        return not (self.duplicates or self.gaps or self.before_start or self.invalid_recipients
+                    or self.failed_transfers or self.over_budget)
+
+    @property
+    def total_cost(self):
+        total = ExecutionCost()
+        for cost in self.file_costs.values():
+            total = total + cost
+        return total
+
+    def to_dict(self):
+        return {
+            "ok": self.ok,
+            "files": self.files,
+            "calls": self.calls,
+            "first_id": self.first_id,
+            "last_id": self.last_id,
+            "expected_start": self.expected_start,
+            "duplicates": {str(k): v for k, v in self.duplicates.items()},
+            "gaps": self.gaps,
+            "before_start": self.before_start,
+            "invalid_recipients": self.invalid_recipients,
+            "failed_transfers": self.failed_transfers,
+            "recipients": len(self.per_recipient),
+            "per_recipient": self.per_recipient,
+            "cost_per_call": self.call_cost.as_dict(),
+            "file_costs": {f: c.as_dict() for f, c in self.file_costs.items()},
+            "total_cost": self.total_cost.as_dict(),
+            "over_budget": self.over_budget,
+        }
+
+
+def simulate(sources, expected_start=None, recipient_cost=DEFAULT_RECIPIENT_COST, budget=None):
+    """
+    Replays drop contracts against an in-memory token ledger.
+
+    Each call claims the next token to the deployer and then transfers the
+    given id to the recipient, as the generated define-private does. A
+    transfer fails when the deployer does not own that id at that point
+    (already sent, or not minted yet). Files are replayed in order, sharing
+    one ledger, so a drop split over several contracts is checked as a whole.
+
+    Args:
+        sources: Iterable of (file name, contract source) pairs.
+        expected_start: First id the drop should use (the next unminted
+            id of the collection). Defaults to the lowest id in the drop.
+        recipient_cost: Estimated ExecutionCost of one call.
+        budget: dropgen.Budget the estimate of each file must fit in.
+
+    Returns:
+        DropReport
+    """
+    if budget is None:
+        budget = Budget()
+    limit = budget.effective_limit
+    report = DropReport()
+    report.call_cost = recipient_cost
+
+    parsed = []
+    for file, source in sources:
+        function, calls = parse_drop(source, file)
+        parsed.append((file, len(source), calls))
+        report.files.append(file)
+        report.calls += len(calls)
+
+    all_ids = [call.token_id for _, _, calls in parsed for call in calls]
+    if not all_ids:
+        return report
+    report.first_id = min(all_ids)
+    report.last_id = max(all_ids)
+    if expected_start is None:
+        expected_start = report.first_id
+    report.expected_start = expected_start
+
+    owners = {}  # token id -> owner
+    next_mint = expected_start
+    seen = {}
+    for file, source_length, calls in parsed:
+        cost = DEFAULT_CONTRACT_COST + SOURCE_BYTE_COST * source_length + recipient_cost * len(calls)
+        report.file_costs[file] = cost
+        if not cost.fits(limit) or source_length > budget.max_source_length:
+            report.over_budget.append(file)
+
+        for call in calls:
+            try:
+                recipient = str(intern_principal(call.recipient))
+            except InvalidPrincipal as e:
+                report.invalid_recipients.append((call.file, call.index, call.recipient, str(e)))
+                recipient = call.recipient
+
+            seen.setdefault(call.token_id, []).append((call.file, call.index))
+            if call.token_id < expected_start:
+                report.before_start.append(call.token_id)
+
+            owners[next_mint] = SENDER
+            next_mint += 1
+
+            owner = owners.get(call.token_id)
+            if owner != SENDER:
+                reason = "not minted yet" if owner is None else f"owned by {owner}"
+                report.failed_transfers.append((call.file, call.index, call.token_id, reason))
+                continue
+            owners[call.token_id] = recipient
+            report.per_recipient[recipient] = report.per_recipient.get(recipient, 0) + 1
+
+    report.duplicates = {token_id: where for token_id, where in seen.items() if len(where) > 1}
+
+    missing_from = None
+    for token_id in range(expected_start, report.last_id + 2):
+        if token_id not in seen and token_id <= report.last_id:
+            if missing_from is None:
+                missing_from = token_id
+        elif missing_from is not None:
+            report.gaps.append((missing_from, token_id - 1))
+            missing_from = None
+    return report
+
+
+def simulate_files(paths, expected_start=None, recipient_cost=DEFAULT_RECIPIENT_COST, budget=None):
+    """simulate() over .clar files on disk, in the given order."""
+    def sources():
+        for path in paths:
+            with open(path, 'r', encoding='utf-8') as f:
+                yield path, f.read()
+    return simulate(sources(), expected_start, recipient_cost, budget)
+
+
+def format_report(report):
+    """Short human readable summary of a DropReport."""
+    lines = [
+        f"Files: {len(report.files)}, calls: {report.calls}, ids u{report.first_id}-u{report.last_id}"
+        f" (expected start u{report.expected_start})",
+        f"Recipients: {len(report.per_recipient)}",
+        f"Estimated cost: {report.total_cost.as_dict()}",
+    ]
+    if report.duplicates:
+        lines.append(f"Duplicate ids: {sorted(report.duplicates)[:20]}")
+    if report.gaps:
+        lines.append(f"Gaps: {report.gaps[:20]}")
+    if report.before_start:
+        lines.append(f"Ids before expected start: {report.before_start[:20]}")
+    for file, index, principal, error in report.invalid_recipients[:20]:
+        lines.append(f"Invalid recipient in {file} call {index}: {error}")
+    for file, index, token_id, reason in report.failed_transfers[:20]:
+        lines.append(f"Transfer of u{token_id} fails in {file} call {index}: {reason}")
+    for file in report.over_budget:
+        lines.append(f"Over budget: {file}")
+    lines.append("OK" if report.ok else "FAILED")
+    return "\n".join(lines)
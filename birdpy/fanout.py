@@ -0,0 +1,183 @@
+import os
+import threading
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from birdpy import instrument
+from birdpy.assets import AssetStore
+
+# Append-only journal kept inside the destination folder. One line per
+# finished destination: "<source digest>\t<destination name>".
+JOURNAL_NAME = '.fanout-journal'
+
+# Journal lines are flushed every JOURNAL_FLUSH_EVERY entries. After a crash at
+# most that many destinations are redone, and those are cheap to re-check.
+JOURNAL_FLUSH_EVERY = 256
+
+
+def default_workers():
+    """I/O bound work: a few threads per core, capped like ThreadPoolExecutor."""
+    return min(32, (os.cpu_count() or 1) + 4)
+
+
+class FanOutResult:
+    """Summary of a fan_out() run."""
+
+    def __init__(self):
+        self.created = 0
+        self.skipped = 0
+        self.resumed = 0
+        self.missing_sources = []  # (source name, destination name)
+        self.errors = []           # (destination name, error message)
+
+    @property
+    def ok(self):
+        return not self.missing_sources and not self.errors
+
+    def __repr__(self):
+        return (f"FanOutResult(created={self.created}, skipped={self.skipped}, resumed={self.resumed}, "
+                f"missing_sources={len(self.missing_sources)}, errors={len(self.errors)})")
+
+
+def _scan(folder):
+    """One os.scandir pass: file name -> DirEntry."""
+    try:
+        with os.scandir(folder) as entries:
+            return {entry.name: entry for entry in entries if entry.is_file()}
+    except FileNotFoundError:
+        return {}
+
+
+def read_journal(path):
+    """
+    Loads a fan-out journal.
+
+    Returns:
+        dict: destination name -> source digest of the last finished write.
+    """
+    done = {}
+    try:
+        with open(path, 'r', encoding='utf-8') as journal:
+            for line in journal:
+                digest, sep, name = line.rstrip('\n').partition('\t')
+                if sep and name:  # a torn last line is simply ignored
+                    done[name] = digest
+    except FileNotFoundError:
+        pass
+    return done
+
+
+class _Journal:
+    def __init__(self, path, truncate):
+        self._file = open(path, 'w' if truncate else 'a', encoding='utf-8')
+        self._lock = threading.Lock()
+        self._pending = 0
+
+    def record(self, digest, name):
+        with self._lock:
+            self._file.write(f"{digest}\t{name}\n")
+            self._pending += 1
+            if self._pending >= JOURNAL_FLUSH_EVERY:
+                self._file.flush()
+                self._pending = 0
+
+    def close(self):
+        with self._lock:
+            self._file.close()
+
+
+def fan_out(plan, src_dir, dst_dir, store=None, workers=None, resume=True):
+    """
+    Materializes many destination files from a small set of sources.
+
+    Source and destination folders are listed once with os.scandir instead of
+    one os.path.exists per file, the work runs on a bounded thread pool and
+    every finished destination is appended to a journal in dst_dir, so an
+    interrupted run picks up where it stopped.
+
+    Args:
+        plan: Iterable of (source file name, destination file name) pairs.
+        src_dir: Folder holding the source files.
+        dst_dir: Folder receiving the destinations (created if missing).
+        store: AssetStore to use; a new one is created if omitted.
+        workers: Thread pool size, default_workers() if omitted.
+        resume: Trust the journal of a previous run. With False every
+            destination is checked again and the journal is rewritten.
+
+    Returns:
+        FanOutResult
+    """
+    if store is None:
+        store = AssetStore()
+    if workers is None:
+        workers = default_workers()
+
+    os.makedirs(dst_dir, exist_ok=True)
+    sources = _scan(src_dir)
+    existing = _scan(dst_dir)
+    journal_path = os.path.join(dst_dir, JOURNAL_NAME)
+    done = read_journal(journal_path) if resume else {}
+
+    result = FanOutResult()
+    metrics = instrument.get()
+    progress = metrics.progress('fan-out')
+    journal = _Journal(journal_path, truncate=not resume)
+    digests = {}  # source name -> digest, filled lazily
+
+    def source_digest(name):
+        digest = digests.get(name)
+        if digest is None:
+            digest = digests[name] = store.add(sources[name].path, sources[name].stat())
+        return digest
+
+    def work(src_name, dst_name, digest):
+        entry = sources[src_name]
+        method = store.materialize(entry.path, os.path.join(dst_dir, dst_name),
+                                   src_stat=entry.stat(), dst_missing=dst_name not in existing)
+        metrics.count('fanout.' + method)
+        if method == 'copy':
+            metrics.count('fanout.bytes_copied', entry.stat().st_size)
+        return digest, dst_name, method
+
+    def collect(finished):
+        for future in finished:
+            try:
+                digest, dst_name, method = future.result()
+            except OSError as e:
+                result.errors.append((in_flight[future], str(e)))
+                metrics.count('fanout.errors')
+            else:
+                journal.record(digest, dst_name)
+                if method == 'skipped':
+                    result.skipped += 1
+                else:
+                    result.created += 1
+            del in_flight[future]
+            progress.update()
+
+    in_flight = {}
+    limit = workers * 4
+    try:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            for src_name, dst_name in plan:
+                if src_name not in sources:
+                    result.missing_sources.append((src_name, dst_name))
+                    metrics.count('fanout.missing_sources')
+                    continue
+                digest = source_digest(src_name)
+                if dst_name in existing and done.get(dst_name) == digest:
+                    result.resumed += 1
+                    progress.update()
+                    continue
+
+                in_flight[pool.submit(work, src_name, dst_name, digest)] = dst_name
+                if len(in_flight) >= limit:
+                    finished, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                    collect(finished)
+
+            finished, _ = wait(in_flight)
+            collect(finished)
+    finally:
+        journal.close()
+        progress.close()
+
+    return result
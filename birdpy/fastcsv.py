@@ -0,0 +1,314 @@
+"""
+Memory-mapped fast path for the plain CSV exports (holder and mint lists).
+
+Holder and mint exports are one address per row, optionally followed by a
+token id: no quotes, no padding. For files like that a column can be read
+with a few vectorized passes over the mapped bytes instead of one
+csv.reader row (a list of new str objects) per line:
+
+    newline and comma offsets   -> start and width of the field on every line
+    8-byte words of the field   -> a 64-bit hash per row
+    np.unique on the hash       -> distinct values, counts, first line
+
+Only the distinct values ever become Python strings. Every row is then
+compared, word by word, with the first row of its hash group; on any
+difference (a hash collision) the file goes to the csv module, so two
+different values are never merged.
+
+Anything the fast path cannot read exactly like csv.reader (quotes,
+spaces, control characters or non-ASCII bytes, a CR that does not end a
+line, fields wider than MAX_FIELD_WIDTH, or NumPy not installed) makes it
+return None, and the caller falls back to the csv module. Plain exports
+are ASCII, and without whitespace the fields are also what the callers'
+strip() would leave.
+"""
+import contextlib
+import mmap
+import os
+import traceback
+
+from birdpy import instrument
+
+try:
+    import numpy as np
+except ImportError:  # NumPy is optional; without it the callers use the csv module
+    np = None
+
+# Bytes scanned per chunk; a chunk always ends on a newline. The per-row
+# arrays of a chunk take a few dozen bytes per line.
+CHUNK_BYTES = 16 * 2**20
+
+# Widest field the fast path handles. A contract principal is at most
+# 41 + 1 + 128 characters; anything wider is not a holder export.
+MAX_FIELD_WIDTH = 192
+
+_NEWLINE, _CR, _COMMA = ord('\n'), ord('\r'), ord(',')
+_IRREGULAR = (b'"', b' ')
+
+
+class _Irregular(Exception):
+    pass
+
+
+class ColumnScan:
+    """
+    Distinct non-empty values of one CSV column, in first-seen order.
+
+    Attributes:
+        values: list of str.
+        counts: list of int, rows per value.
+        first_lines: list of int, 1-based line of the first row with the value.
+        codes: With codes=True, a NumPy int64 array with the index into
+            values of every non-empty row, in file order; otherwise None.
+    """
+
+    def __init__(self, values, counts, first_lines, codes=None):
+        self.values = values
+        self.counts = counts
+        self.first_lines = first_lines
+        self.codes = codes
+
+    def __len__(self):
+        return len(self.values)
+
+    def __iter__(self):
+        """(value, count, first line) tuples."""
+        return zip(self.values, self.counts, self.first_lines)
+
+    def rows(self):
+        """Every non-empty row's value, in file order (needs codes=True)."""
+        values = self.values
+        return [values[code] for code in self.codes.tolist()]
+
+
+def _chunks(mm):
+    """(offset, length) of newline-aligned chunks of a mapped file."""
+    size = len(mm)
+    offset = 0
+    while offset < size:
+        end = min(offset + CHUNK_BYTES, size)
+        if end < size:
+            newline = mm.rfind(b'\n', offset, end)
+            end = newline + 1 if newline >= offset else size
+        yield offset, end - offset
+        offset = end
+
+
+def _check_bytes(chunk):
+    """Control characters (other than CR and LF) and non-ASCII bytes are left to the csv module."""
+    if np.any((chunk >= 0x80) | ((chunk < 0x20) & (chunk != _NEWLINE) & (chunk != _CR))):
+        raise _Irregular('control or non-ASCII byte')
+
+
+def _line_bounds(chunk):
+    """Start and end (without the newline and a trailing CR) of every line of a chunk."""
+    newlines = np.flatnonzero(chunk == _NEWLINE)
+    starts = np.concatenate(([0], newlines + 1))
+    ends = np.concatenate((newlines, [len(chunk)]))
+    if starts[-1] == len(chunk):  # the chunk ends with a newline: no partial last line
+        starts, ends = starts[:-1], ends[:-1]
+    cr = ends > starts
+    cr[cr] = chunk[ends[cr] - 1] == _CR
+    # csv.reader ends a line at any other CR as well
+    if np.count_nonzero(chunk == _CR) != np.count_nonzero(cr):
+        raise _Irregular('lone CR')
+    return starts, ends - cr
+
+
+def _field_bounds(chunk, starts, ends, column):
+    """
+    Start and width of field column of every line; width 0 where the line
+    is shorter. column None is the whole line.
+    """
+    if column is None:
+        return starts, ends - starts
+    commas = np.flatnonzero(chunk == _COMMA)
+    sentinel = np.concatenate((commas, [len(chunk)]))
+    first = np.searchsorted(commas, starts)
+    if column == 0:
+        return starts, np.minimum(sentinel[first], ends) - starts
+    index = first + (column - 1)
+    present = index < len(commas)
+    present[present] = commas[index[present]] < ends[present]
+    field_starts = np.where(present, sentinel[np.minimum(index, len(commas))] + 1, ends)
+    field_ends = np.minimum(sentinel[np.minimum(index + 1, len(commas))], ends)
+    return field_starts, np.where(present, field_ends - field_starts, 0)
+
+
+def _fields(mm, whole, column, skip_header):
+    """
+    Yields (index of the chunk's first line, field starts, field widths) per
+    chunk, the starts as offsets into the whole file.
+    """
+    line = 0
+    for offset, length in _chunks(mm):
+        for token in _IRREGULAR:
+            if mm.find(token, offset, offset + length) != -1:
+                raise _Irregular(token)
+        chunk = whole[offset:offset + length]
+        _check_bytes(chunk)
+        starts, ends = _line_bounds(chunk)
+        field_starts, widths = _field_bounds(chunk, starts, ends, column)
+        if len(widths) and widths.max() > MAX_FIELD_WIDTH:
+            raise _Irregular('wide field')
+        if skip_header and line == 0 and len(widths):
+            widths[0] = 0
+        yield line, field_starts + offset, widths
+        line += len(starts)
+
+
+# _MASKS[n]: the low n bytes of a word
+_MASKS = np.array([(1 << (8 * n)) - 1 for n in range(9)], dtype=np.uint64) if np is not None else None
+
+
+class _Words:
+    """
+    The little-endian 8-byte word at every byte offset of a buffer, so a
+    41 character field is read in 6 vectorized passes instead of 41.
+    """
+
+    def __init__(self, whole):
+        self.whole = whole
+        self.last = len(whole) - 8  # last offset with a full word behind it
+        self.view = np.ndarray((max(self.last + 1, 0),), dtype='<u8', buffer=whole, strides=(1,))
+
+    def field_words(self, starts, widths):
+        """Yields (rows, word k of those rows' fields, zeroed past the field end) for k = 0, 8, 16, ..."""
+        if not len(widths):
+            return
+        shortest, widest = int(widths.min()), int(widths.max())
+        everyone = np.arange(len(widths))
+        for k in range(0, widest, 8):
+            rows = everyone if k < shortest else np.flatnonzero(widths > k)
+            offsets = starts[rows] + k
+            if len(offsets) and offsets.max() > self.last:
+                # files shorter than a word have no full word at all
+                near_end = offsets > self.last
+                words = np.zeros(len(offsets), dtype=np.uint64)
+                words[~near_end] = self.view[offsets[~near_end]]
+                words[near_end] = self._bytewise(offsets[near_end], widths[rows][near_end] - k)
+            else:
+                words = self.view[offsets]
+            if k + 8 > shortest:  # some fields end inside this word
+                words &= _MASKS[np.minimum(widths[rows] - k, 8)]
+            yield rows, words
+
+    def _bytewise(self, offsets, remaining):
+        # the last words of the file, without reading past its end
+        words = np.zeros(len(offsets), dtype=np.uint64)
+        for b in range(8):
+            rows = np.flatnonzero(remaining > b)
+            words[rows] |= self.whole[offsets[rows] + b].astype(np.uint64) << np.uint64(8 * b)
+        return words
+
+
+def _hashes(words, starts, widths):
+    """64-bit hash of every field, from one pass over its words."""
+    hashes = widths.astype(np.uint64)
+    for rows, word in words.field_words(starts, widths):
+        hashes[rows] = (hashes[rows] ^ word) * np.uint64(0x9E3779B97F4A7C15)
+    return hashes
+
+
+def _check_same(words, starts, widths, representative):
+    """
+    The hash groups the rows; every row must also hold exactly the bytes of
+    its group's representative row, compared word by word.
+    """
+    if not np.array_equal(widths, widths[representative]):
+        raise _Irregular('hash collision')
+    # same widths, so both passes yield the same rows for every word
+    theirs = words.field_words(starts[representative], widths)
+    for (_, word), (_, expected) in zip(words.field_words(starts, widths), theirs):
+        if not np.array_equal(word, expected):
+            raise _Irregular('hash collision')
+
+
+@contextlib.contextmanager
+def _mapped(f):
+    """Read-only map of an open file that also closes when an error escapes the scan."""
+    mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    try:
+        yield mm
+    except BaseException as e:
+        # The frames of the error still hold NumPy views of the map, which keep it from closing
+        traceback.clear_frames(e.__traceback__)
+        raise
+    finally:
+        mm.close()
+
+
+def scan_column(path, column=0, skip_header=False, codes=False, max_distinct=None):
+    """
+    Counts the distinct values of a CSV column through the fast path.
+
+    Args:
+        path: CSV file (UTF-8, no quoting).
+        column: Field index, or None for the whole line.
+        skip_header: Ignore the first line.
+        codes: Also keep the value index of every row (ColumnScan.codes).
+        max_distinct: Give up (return None) past this many distinct values,
+            so callers with a memory budget can switch to their on-disk path.
+
+    Returns:
+        ColumnScan, or None when the file has to go through the csv module.
+    """
+    if np is None:
+        return None
+    with open(path, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return ColumnScan([], [], [], np.zeros(0, dtype=np.int64) if codes else None)
+        with _mapped(f) as mm:
+            try:
+                result = _scan(mm, column, skip_header, codes, max_distinct)
+            except (_Irregular, UnicodeDecodeError):
+                result = None
+    instrument.get().count('fastcsv.scanned' if result is not None else 'fastcsv.fallback')
+    return result
+
+
+def _scan(mm, column, skip_header, codes, max_distinct):
+    whole = np.frombuffer(mm, dtype=np.uint8)
+    words = _Words(whole)
+
+    # Distinct values per chunk: hash, first line, rows, start and width
+    # of the first row, and the row -> distinct index map for the codes.
+    parts = []
+    for line, starts, widths in _fields(mm, whole, column, skip_header):
+        unique, first, inverse, counts = np.unique(_hashes(words, starts, widths), return_index=True,
+                                                   return_inverse=True, return_counts=True)
+        inverse = inverse.ravel()
+        _check_same(words, starts, widths, first[inverse])
+        parts.append((unique, first + line, counts, starts[first], widths[first], inverse if codes else None))
+    if not parts:
+        return ColumnScan([], [], [], np.zeros(0, dtype=np.int64) if codes else None)
+
+    # Merge the chunks: the same hash in two chunks must be the same value too
+    hashes, first_lines, counts, value_starts, value_widths = (
+        np.concatenate([part[i] for part in parts]) for i in range(5))
+    unique, first, inverse = np.unique(hashes, return_index=True, return_inverse=True)
+    inverse = inverse.ravel()
+    _check_same(words, value_starts, value_widths, first[inverse])
+    totals = np.bincount(inverse, weights=counts, minlength=len(unique)).astype(np.int64)
+
+    first_lines, value_starts, value_widths = first_lines[first], value_starts[first], value_widths[first]
+    non_empty = np.flatnonzero(value_widths > 0)
+    order = non_empty[np.argsort(first_lines[non_empty], kind='stable')]
+    if max_distinct is not None and len(order) > max_distinct:
+        return None
+
+    values = [mm[start:start + width].decode('utf-8')
+              for start, width in zip(value_starts[order].tolist(), value_widths[order].tolist())]
+    row_codes = None
+    if codes:
+        position = np.full(len(unique), -1, dtype=np.int64)
+        position[order] = np.arange(len(order))
+        chunk_codes = []
+        offset = 0
+        for part in parts:
+            part_codes = position[inverse[offset:offset + len(part[0])]][part[5]]
+            chunk_codes.append(part_codes[part_codes >= 0])
+            offset += len(part[0])
+        row_codes = np.concatenate(chunk_codes)
+    return ColumnScan(values, totals[order].tolist(), (first_lines[order] + 1).tolist(), row_codes)
+
@@ -0,0 +1,505 @@
+"""
+Holder and mint exports fetched from a Stacks API (api.hiro.so or any
+indexer with the same /extended/v1 endpoints) instead of exported by hand
+from an explorer.
+
+    fetcher = Fetcher('https://api.hiro.so', cache_path='tlbpy/.fetch.sqlite')
+    fetcher.write_mints(asset, 'tlbpy/tlbmints.csv')      # address,tokenId, newest first
+    fetcher.write_holders(asset, 'apespy/apeslist.csv')   # one address per token held
+    unique = count_unique(address for address, _ in fetcher.iter_mints(asset))
+
+asset is the NFT asset identifier, e.g. 'SP....the-little-bird::tlb'.
+
+Requests run on asyncio, at most `concurrency` at a time, over a pool of
+keep-alive connections; a failed request is retried with exponential
+backoff (honouring Retry-After) before the fetch gives up with FetchError.
+
+The cache (SQLite) keeps what earlier fetches returned:
+    mint events   append-only, so a re-snapshot pages only through the
+                  blocks past the highest cached block height and takes
+                  the rest from the cache.
+    owners        the current owner of a token can change in any block;
+                  owners are cached with the chain tip height they were
+                  read at. A re-snapshot pages through the holdings of
+                  the cached holders and applies only the tokens they
+                  received above that height. Only tokens that are new,
+                  were minted again, or left for a holder the cache does
+                  not know are asked one by one.
+"""
+import asyncio
+import csv
+import http.client
+import json
+import queue
+import random
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlencode, urlsplit
+
+from birdpy import instrument
+from birdpy.atomic import atomic_open
+
+MINTS_PATH = '/extended/v1/tokens/nft/mints'
+HISTORY_PATH = '/extended/v1/tokens/nft/history'
+HOLDINGS_PATH = '/extended/v1/tokens/nft/holdings'
+BLOCKS_PATH = '/extended/v1/block'
+
+DEFAULT_CONCURRENCY = 8
+DEFAULT_RETRIES = 5
+DEFAULT_BACKOFF = 0.5   # seconds before the first retry, doubled for each further one
+MAX_BACKOFF = 30.0
+DEFAULT_TIMEOUT = 30.0
+PAGE_SIZE = 50          # the largest limit the Stacks API accepts on the NFT endpoints
+
+# Statuses worth retrying: rate limited or a server/gateway problem.
+RETRY_STATUSES = frozenset((408, 425, 429, 500, 502, 503, 504))
+
+# Pages of rows buffered between the fetching thread and a slow consumer.
+STREAM_BUFFER = 64
+
+
+class FetchError(Exception):
+    pass
+
+
+class _Stopped(Exception):
+    pass
+
+
+def clarity_uint(value):
+    """Hex of a serialized Clarity uint, the form the history endpoint takes token ids in."""
+    return '0x01' + value.to_bytes(16, 'big').hex()
+
+
+def _token_id(value):
+    # Events carry the token id as a Clarity value: {"hex": "0x01...", "repr": "u123"}
+    text = value.get('repr', '') if isinstance(value, dict) else ''
+    if not text.startswith('u') or not text[1:].isdigit():
+        raise FetchError(f"Not a uint token id: {value!r}")
+    return int(text[1:])
+
+
+class _ConnectionPool:
+    """Keep-alive HTTP(S) connections to one host, each used by one thread at a time."""
+
+    def __init__(self, base_url, timeout, headers):
+        parts = urlsplit(base_url)
+        if parts.scheme not in ('http', 'https'):
+            raise ValueError(f"Not an http(s) URL: {base_url}")
+        self._factory = http.client.HTTPSConnection if parts.scheme == 'https' else http.client.HTTPConnection
+        self._host = parts.netloc
+        self.prefix = parts.path.rstrip('/')
+        self._timeout = timeout
+        self._headers = headers
+        self._idle = queue.LifoQueue()
+
+    def get(self, path):
+        """(status, Retry-After header, body) of a GET. Raises OSError/HTTPException."""
+        try:
+            connection = self._idle.get_nowait()
+        except queue.Empty:
+            connection = self._factory(self._host, timeout=self._timeout)
+        try:
+            connection.request('GET', self.prefix + path, headers=self._headers)
+            response = connection.getresponse()
+            body = response.read()
+        except BaseException:
+            connection.close()
+            raise
+        if response.will_close:
+            connection.close()
+        else:
+            self._idle.put(connection)
+        return response.status, response.getheader('Retry-After'), body
+
+    def close(self):
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                return
+
+
+class _Client:
+    """Bounded, retrying JSON GETs for one asyncio run."""
+
+    def __init__(self, pool, concurrency, retries, backoff):
+        self._pool = pool
+        self._slots = asyncio.Semaphore(concurrency)
+        self._executor = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix='birdpy-fetch')
+        self._retries = retries
+        self._backoff = backoff
+
+    def close(self):
+        self._executor.shutdown(wait=True)
+        self._pool.close()
+
+    def _delay(self, attempt, retry_after):
+        if retry_after and retry_after.strip().isdigit():
+            return min(float(retry_after), MAX_BACKOFF)
+        # full jitter keeps retrying workers from hitting the server in step
+        return random.uniform(0.5, 1.0) * min(MAX_BACKOFF, self._backoff * 2 ** attempt)
+
+    async def get_json(self, path, **params):
+        url = f"{path}?{urlencode(params)}" if params else path
+        metrics = instrument.get()
+        loop = asyncio.get_running_loop()
+        for attempt in range(self._retries + 1):
+            error = retry_after = None
+            async with self._slots:
+                start = time.perf_counter()
+                try:
+                    status, retry_after, body = await loop.run_in_executor(self._executor, self._pool.get, url)
+                except (OSError, http.client.HTTPException) as e:
+                    status, error = None, f"{type(e).__name__}: {e}"
+                metrics.observe('fetch.request_seconds', time.perf_counter() - start)
+            metrics.count('fetch.requests')
+            if status == 200:
+                try:
+                    return json.loads(body)
+                except ValueError:
+                    error = "invalid JSON in the response"
+            elif status is not None:
+                if status not in RETRY_STATUSES:
+                    raise FetchError(f"GET {url}: HTTP {status}")
+                error = f"HTTP {status}"
+            if attempt == self._retries:
+                raise FetchError(f"GET {url}: {error} (gave up after {attempt + 1} attempts)")
+            metrics.count('fetch.retries')
+            await asyncio.sleep(self._delay(attempt, retry_after))
+
+
+class FetchCache:
+    """
+    SQLite cache of mint events and token owners, per asset.
+
+    Mint events are stored under their position counted from the oldest
+    event (seq): new mints are added at the newest end of the list, so the
+    position of an event does not move between two fetches.
+    """
+
+    def __init__(self, path=':memory:'):
+        self.db = sqlite3.connect(path)
+        self.db.execute("PRAGMA journal_mode = WAL")
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS mints ("
+            " asset TEXT NOT NULL,"
+            " seq INTEGER NOT NULL,"
+            " block_height INTEGER NOT NULL,"
+            " tx_id TEXT NOT NULL,"
+            " recipient TEXT NOT NULL,"
+            " token_id INTEGER NOT NULL,"
+            " PRIMARY KEY (asset, seq))"
+        )
+        self.db.execute("CREATE TABLE IF NOT EXISTS mint_heights (asset TEXT PRIMARY KEY, height INTEGER NOT NULL)")
+        self.db.execute("DROP TABLE IF EXISTS owners")  # keyed on the tip alone, before token_owners
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS token_owners ("
+            " asset TEXT NOT NULL,"
+            " token_id INTEGER NOT NULL,"
+            " height INTEGER NOT NULL,"
+            " owner TEXT,"
+            " PRIMARY KEY (asset, token_id))"
+        )
+
+    def close(self):
+        self.db.close()
+
+    def mint_height(self, asset):
+        """Highest block height of the cached mint events, or None."""
+        row = self.db.execute("SELECT height FROM mint_heights WHERE asset = ?", (asset,)).fetchone()
+        return row[0] if row else None
+
+    def mints_below(self, asset, height):
+        """Cached events below height: they are the oldest ones, seq 0 to the count - 1."""
+        return self.db.execute("SELECT count(*) FROM mints WHERE asset = ? AND block_height < ?",
+                               (asset, height)).fetchone()[0]
+
+    def mint_tx(self, asset, seq):
+        row = self.db.execute("SELECT tx_id FROM mints WHERE asset = ? AND seq = ?", (asset, seq)).fetchone()
+        return row[0] if row else None
+
+    def store_mints(self, asset, events, keep_below):
+        """Replaces the events from seq keep_below on with events {seq: (height, tx_id, recipient, token_id)}."""
+        with self.db:
+            self.db.execute("DELETE FROM mints WHERE asset = ? AND seq >= ?", (asset, keep_below))
+            self.db.executemany("INSERT INTO mints (asset, seq, block_height, tx_id, recipient, token_id) "
+                                "VALUES (?, ?, ?, ?, ?, ?)",
+                                ((asset, seq, *event) for seq, event in events.items() if seq >= keep_below))
+            height = self.db.execute("SELECT max(block_height) FROM mints WHERE asset = ?", (asset,)).fetchone()[0]
+            if height is not None:
+                self.db.execute("INSERT OR REPLACE INTO mint_heights (asset, height) VALUES (?, ?)", (asset, height))
+
+    def mints(self, asset, batch=10_000):
+        """Yields lists of (recipient, token id) mint rows, newest first."""
+        cursor = self.db.execute("SELECT recipient, token_id FROM mints WHERE asset = ? ORDER BY seq DESC", (asset,))
+        while True:
+            rows = cursor.fetchmany(batch)
+            if not rows:
+                return
+            yield rows
+
+    def minted_at(self, asset):
+        """{token id: block height of its newest cached mint event}"""
+        return dict(self.db.execute("SELECT token_id, max(block_height) FROM mints WHERE asset = ? GROUP BY token_id",
+                                    (asset,)))
+
+    def owners(self, asset):
+        """{token id: (owner or None if burned, chain tip height it was read at)}"""
+        return {token_id: (owner, height) for token_id, owner, height in self.db.execute(
+            "SELECT token_id, owner, height FROM token_owners WHERE asset = ?", (asset,))}
+
+    def store_owners(self, asset, height, owners):
+        """Stores [(token id, owner or None), ...] read at chain tip height height."""
+        with self.db:
+            self.db.executemany("INSERT OR REPLACE INTO token_owners (asset, token_id, height, owner) "
+                                "VALUES (?, ?, ?, ?)", ((asset, token_id, height, owner) for token_id, owner in owners))
+
+
+class Fetcher:
+    """
+    Pooled, retrying fetcher of the mint events and current holders of an
+    NFT asset.
+
+    Args:
+        api_url: Base URL of the Stacks API, e.g. https://api.hiro.so; a
+            local stub server works the same way.
+        cache_path: SQLite cache file (see the module docstring); None
+            keeps nothing between two runs.
+        concurrency: Requests in flight at the same time (and connections).
+        retries: Retries of a failed request before FetchError.
+        backoff: Seconds before the first retry, doubled for each further one.
+        timeout: Socket timeout of one request, in seconds.
+        page_size: Rows asked per page.
+        api_key: Sent as x-api-key (higher rate limits on api.hiro.so).
+    """
+
+    def __init__(self, api_url, cache_path=None, concurrency=DEFAULT_CONCURRENCY, retries=DEFAULT_RETRIES,
+                 backoff=DEFAULT_BACKOFF, timeout=DEFAULT_TIMEOUT, page_size=PAGE_SIZE, api_key=None):
+        self.api_url = api_url
+        self.cache_path = cache_path
+        self.concurrency = concurrency
+        self.retries = retries
+        self.backoff = backoff
+        self.timeout = timeout
+        self.page_size = page_size
+        self.headers = {'Accept': 'application/json', 'User-Agent': 'birdpy'}
+        if api_key:
+            self.headers['x-api-key'] = api_key
+
+    # --- mint events ---------------------------------------------------------
+
+    async def _mint_page(self, client, asset, offset, events):
+        # Stores the page's events under their seq; returns the page's total
+        page = await client.get_json(MINTS_PATH, asset_identifier=asset, limit=self.page_size, offset=offset)
+        total = page['total']
+        for i, event in enumerate(page['results']):
+            events[total - 1 - (offset + i)] = (event['block_height'], event['tx_id'], event['recipient'],
+                                                _token_id(event['value']))
+        return total
+
+    async def _sync_mints(self, client, cache, asset):
+        """Fetches the mint events the cache does not have yet."""
+        height = cache.mint_height(asset)
+        keep = cache.mints_below(asset, height) if height is not None else 0
+        events = {}
+        total = await self._mint_page(client, asset, 0, events)
+        # Newest first: the events at height and above are the first total - keep ones,
+        # plus one more to check that the newest kept event is still where the cache has it
+        needed = total - keep + (1 if keep else 0)
+        totals = await asyncio.gather(*(self._mint_page(client, asset, offset, events)
+                                        for offset in range(self.page_size, needed, self.page_size)))
+        total = max([total, *totals])
+
+        # Mints made while paging shift the later pages; fill the gaps they left
+        for _ in range(self.retries + 1):
+            missing = [total - 1 - seq for seq in range(keep, total) if seq not in events]
+            if not missing:
+                break
+            offsets = sorted({offset - offset % self.page_size for offset in missing})
+            totals = await asyncio.gather(*(self._mint_page(client, asset, offset, events) for offset in offsets))
+            total = max([total, *totals])
+        else:
+            raise FetchError(f"Mint events of {asset} keep moving while paging; try again later")
+
+        if keep and keep - 1 in events and events[keep - 1][1] != cache.mint_tx(asset, keep - 1):
+            # The chain no longer matches the cache (reorg or a different API): start over
+            instrument.get().count('fetch.cache_reset')
+            cache.store_mints(asset, {}, 0)
+            return await self._sync_mints(client, cache, asset)
+        cache.store_mints(asset, events, keep)
+        instrument.get().count('fetch.mints_cached', keep)
+        instrument.get().count('fetch.mints_fetched', total - keep)
+        return total
+
+    # --- owners --------------------------------------------------------------
+
+    async def _owner(self, client, asset, token_id):
+        page = await client.get_json(HISTORY_PATH, asset_identifier=asset, value=clarity_uint(token_id), limit=1)
+        results = page['results']
+        # newest event first; a burn leaves the token without owner
+        return token_id, results[0].get('recipient') if results else None
+
+    async def _holdings(self, client, asset, principal):
+        # (token id, height it was received at) of every token of asset principal holds
+        held = []
+        offset = 0
+        while True:
+            page = await client.get_json(HOLDINGS_PATH, principal=principal, asset_identifiers=asset,
+                                         limit=self.page_size, offset=offset)
+            held.extend((_token_id(item['value']), item['block_height']) for item in page['results'])
+            total = page['total']
+            offset += self.page_size
+            if offset >= total or not page['results']:
+                return principal, held
+
+    async def _updated_owners(self, client, asset, cached):
+        """
+        Brings cached {token id: (owner, height read at)} up to the tip from
+        the holdings of the cached holders, and returns {token id: owner}
+        for the tokens that settles.
+
+        A token a holder received above its read height moved to that
+        holder; one received at or below it must be the cached owner's.
+        Burned tokens stay burned. The rest (moved to a holder the cache
+        does not know, burned since, or claimed twice while paging) are
+        left for their history.
+        """
+        holders = sorted({owner for owner, _ in cached.values() if owner is not None})
+        claims = {}
+        for holder, held in await asyncio.gather(*(self._holdings(client, asset, holder) for holder in holders)):
+            for token_id, height in held:
+                entry = cached.get(token_id)
+                if entry is not None and (height > entry[1] or entry[0] == holder):
+                    claims.setdefault(token_id, []).append(holder)
+        owners = {token_id: None for token_id, (owner, _) in cached.items() if owner is None}
+        for token_id, claimed in claims.items():
+            if len(claimed) == 1:
+                owners[token_id] = claimed[0]
+            else:
+                owners.pop(token_id, None)
+        return owners
+
+    async def _owners(self, client, cache, asset, token_ids):
+        """Yields [(token id, owner or None), ...] pages in token id order."""
+        tip = (await client.get_json(BLOCKS_PATH, limit=1))['results'][0]['height']
+        minted_at = cache.minted_at(asset)
+        known = {}
+        stale = {}
+        for token_id, (owner, height) in cache.owners(asset).items():
+            if minted_at.get(token_id, height) > height:
+                continue  # minted again since: only its history knows
+            if height == tip:
+                known[token_id] = owner  # an interrupted fetch at the same tip
+            else:
+                stale[token_id] = (owner, height)
+        if stale:
+            updated = await self._updated_owners(client, asset, stale)
+            cache.store_owners(asset, tip, updated.items())
+            known.update(updated)
+        instrument.get().count('fetch.owners_cached', sum(1 for token_id in token_ids if token_id in known))
+        progress = instrument.get().progress('fetch owners', total=len(token_ids))
+        for start in range(0, len(token_ids), self.page_size * self.concurrency):
+            batch = token_ids[start:start + self.page_size * self.concurrency]
+            fetched = await asyncio.gather(*(self._owner(client, asset, token_id)
+                                             for token_id in batch if token_id not in known))
+            cache.store_owners(asset, tip, fetched)
+            known.update(fetched)
+            progress.update(len(batch))
+            yield [(token_id, known[token_id]) for token_id in batch]
+        progress.close()
+
+    # --- running -------------------------------------------------------------
+
+    async def _produce(self, what, asset, emit):
+        cache = FetchCache(self.cache_path or ':memory:')
+        pool = _ConnectionPool(self.api_url, self.timeout, self.headers)
+        client = _Client(pool, self.concurrency, self.retries, self.backoff)
+        try:
+            await self._sync_mints(client, cache, asset)
+            if what == 'mints':
+                for rows in cache.mints(asset):
+                    await emit(rows)
+                return
+            token_ids = sorted({token_id for rows in cache.mints(asset) for _, token_id in rows})
+            async for owners in self._owners(client, cache, asset, token_ids):
+                await emit([(owner, token_id) for token_id, owner in owners if owner is not None])
+        finally:
+            client.close()
+            cache.close()
+
+    def _stream(self, what, asset):
+        # The event loop runs in its own thread and hands over pages of rows
+        # through a bounded queue, so the caller can consume them as a plain
+        # iterator while the next pages are being fetched.
+        pages = queue.Queue(maxsize=STREAM_BUFFER)
+        stop = threading.Event()
+        done = object()
+
+        def hand_over(item):
+            # False once the caller stopped reading
+            while not stop.is_set():
+                try:
+                    pages.put(item, timeout=0.05)
+                    return True
+                except queue.Full:
+                    pass
+            return False
+
+        async def emit(rows):
+            if not await asyncio.to_thread(hand_over, rows):
+                raise _Stopped
+
+        def run():
+            try:
+                asyncio.run(self._produce(what, asset, emit))
+            except _Stopped:
+                return
+            except BaseException as e:
+                hand_over(e)
+            else:
+                hand_over(done)
+
+        thread = threading.Thread(target=run, name='birdpy-fetch-loop', daemon=True)
+        thread.start()
+        try:
+            while True:
+                rows = pages.get()
+                if rows is done:
+                    return
+                if isinstance(rows, BaseException):
+                    raise rows
+                yield from rows
+        finally:
+            stop.set()
+            thread.join()
+
+    def iter_mints(self, asset):
+        """Yields (recipient, token id) for every mint of asset, newest first (like tlbmints.csv)."""
+        return self._stream('mints', asset)
+
+    def iter_holders(self, asset):
+        """Yields (owner, token id) for every token of asset that is not burned, in token id order."""
+        return self._stream('holders', asset)
+
+    def write_mints(self, asset, path):
+        """Writes the mint export (address,tokenId rows). Returns the rows written."""
+        return _write_csv(path, ([recipient, token_id] for recipient, token_id in self.iter_mints(asset)))
+
+    def write_holders(self, asset, path, with_token_ids=False):
+        """Writes the holder export: one address per token held (like apeslist.csv). Returns the rows written."""
+        return _write_csv(path, ([owner, token_id] if with_token_ids else [owner]
+                                 for owner, token_id in self.iter_holders(asset)))
+
+
+def _write_csv(path, rows):
+    # path is only replaced once the fetch completed: a FetchError keeps the previous export
+    written = 0
+    with atomic_open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        for row in rows:
+            writer.writerow(row)
+            written += 1
+    return written
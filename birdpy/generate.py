@@ -0,0 +1,367 @@
+"""
+Seeded trait assignment for new collections: the metadata the nftspy and
+apestudio scripts start from, generated instead of written by hand.
+
+    collection = generate(2000, [TraitSpec('Rarity', RARITY_TIERS)], seed=7)
+    write_metadata_folder(collection, 'nftspy/metadata')   # <tokenId>.json
+    write_metadata_csv(collection, 'nftspy/metadata.csv')  # tokenId,Rarity
+
+    apes = generate(traits=[TraitSpec('fortune', FORTUNES), TraitSpec('power', range(1, 11)),
+                            TraitSpec('rarity', APE_RARITIES)],
+                    card_ids=CardIndex.from_csv('apestudio/list/cardList.csv').cards, seed=7)
+    write_nft_list(apes, 'apestudio/list/apesnftlist.csv')
+
+Every value gets exactly its quota: the weights are turned into counts
+that add up to the number of tokens (largest remainder), and the tokens
+are dealt out in a seeded shuffled order. With card_ids every card gets
+`editions` tokens, shuffled the same way, and each token's edition number
+is its position among its card's tokens, as in csv_to_json_converter.py.
+
+The shuffle sorts the tokens by a splitmix64 hash of (seed, trait, token
+position), so the result is the same bit for bit for a seed on any
+machine, with or without NumPy (which only makes it faster), and one
+trait's assignment does not change when another trait is added.
+"""
+import csv
+import hashlib
+from array import array
+
+try:
+    import numpy as np
+except ImportError:  # NumPy is optional; the pure Python path gives the same answers
+    np = None
+
+from birdpy.cards import EDITIONS_PER_CARD
+
+# The 7 tiers of nftspy/webp, with the share of tokens each one gets.
+RARITY_TIERS = (('Common', 40), ('Uncommon', 25), ('Rare', 15), ('Epic', 10), ('Super Rare', 6),
+                ('Legendary', 3), ('Ultimate', 1))
+
+# apesnftlist.csv tiers and fortunes, weighted like the current list.
+APE_RARITIES = (('Common', 40), ('Uncommon', 30), ('Rare', 15), ('Super Rare', 10), ('Ultra Rare', 4),
+                ('Legendary', 1))
+FORTUNES = (('1B in Bitcoin', 40), ('5B in Bitcoin', 31), ('10B in Bitcoin', 14), ('2B in Bitcoin', 10),
+            ('50B in Bitcoin', 4), ('100B in Bitcoin', 1))
+
+_MASK64 = (1 << 64) - 1
+
+# Tokens per chunk when streaming rows to the exports.
+WRITE_CHUNK = 65_536
+
+
+def quotas(weights, total):
+    """
+    Exact counts for total tokens from relative weights (largest remainder
+    method; ties go to the earlier value).
+
+    Returns:
+        list of int, summing to total.
+    """
+    weight_sum = sum(weights)
+    if total and weight_sum <= 0:
+        raise ValueError("Weights must add up to more than 0")
+    exact = [total * weight / weight_sum for weight in weights]
+    counts = [int(share) for share in exact]
+    by_remainder = sorted(range(len(weights)), key=lambda i: (-(exact[i] - counts[i]), i))
+    for i in by_remainder[:total - sum(counts)]:
+        counts[i] += 1
+    return counts
+
+
+def _stream_key(seed, name):
+    # 64-bit key per (seed, trait): independent shuffles for every trait
+    return int.from_bytes(hashlib.sha256(f"{seed}\0{name}".encode('utf-8')).digest()[:8], 'little')
+
+
+def _splitmix_python(key, count):
+    keys = []
+    for i in range(count):
+        z = (key + (i + 1) * 0x9E3779B97F4A7C15) & _MASK64
+        z = ((z ^ (z >> 30)) * 0xBF58476D1CE4E5B9) & _MASK64
+        z = ((z ^ (z >> 27)) * 0x94D049BB133111EB) & _MASK64
+        keys.append(z ^ (z >> 31))
+    return keys
+
+
+def _splitmix_numpy(key, count):
+    with np.errstate(over='ignore'):
+        z = np.uint64(key) + (np.arange(1, count + 1, dtype=np.uint64) * np.uint64(0x9E3779B97F4A7C15))
+        z = (z ^ (z >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+        z = (z ^ (z >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+        return z ^ (z >> np.uint64(31))
+
+
+def shuffled_order(seed, name, count):
+    """Token positions sorted by their hash: the seeded order quotas are dealt in."""
+    key = _stream_key(seed, name)
+    if np is not None:
+        return np.argsort(_splitmix_numpy(key, count), kind='stable')
+    keys = _splitmix_python(key, count)
+    return sorted(range(count), key=keys.__getitem__)
+
+
+def _deal(counts, order):
+    """Codes per token: value i for counts[i] tokens, in the given token order."""
+    if np is not None:
+        codes = np.empty(len(order), dtype=np.int32)
+        codes[order] = np.repeat(np.arange(len(counts), dtype=np.int32), counts)
+        return codes
+    codes = array('i', bytes(4 * len(order)))
+    position = 0
+    for value, n in enumerate(counts):
+        for token in order[position:position + n]:
+            codes[token] = value
+        position += n
+    return codes
+
+
+class TraitSpec:
+    """
+    Target distribution of one trait.
+
+    Args:
+        name: trait_type, e.g. 'Rarity'.
+        values: Values, or (value, weight) pairs; plain values are equally likely.
+    """
+
+    def __init__(self, name, values):
+        values = list(values)
+        if not values:
+            raise ValueError(f"Trait {name} has no values")
+        if all(isinstance(v, tuple) and len(v) == 2 for v in values):
+            self.values = [str(value) for value, _ in values]
+            self.weights = [weight for _, weight in values]
+        else:
+            self.values = [str(value) for value in values]
+            self.weights = [1] * len(values)
+        self.name = name
+
+    def __repr__(self):
+        return f"TraitSpec({self.name!r}, {list(zip(self.values, self.weights))!r})"
+
+
+class GeneratedCollection:
+    """
+    Token -> trait assignments of generate(): one code array per trait,
+    indexes into that trait's values.
+
+    Attributes:
+        token_ids: Token id of every position.
+        traits: {name: (values, codes)}.
+        card_ids: The card ids dealt out (the values of the 'cardId' trait), or None.
+        editions: Edition number of every token within its card, or None.
+    """
+
+    def __init__(self, token_ids, seed):
+        self.token_ids = token_ids
+        self.seed = seed
+        self.traits = {}
+        self.card_ids = None
+        self.editions = None
+
+    def __len__(self):
+        return len(self.token_ids)
+
+    def values(self, name):
+        """Value of trait name for every token, in token order."""
+        values, codes = self.traits[name]
+        return [values[code] for code in (codes.tolist() if np is not None else codes)]
+
+    def counts(self, name):
+        """{value: tokens}, in the order of the trait's values."""
+        values, codes = self.traits[name]
+        if np is not None:
+            totals = np.bincount(codes, minlength=len(values)).tolist()
+        else:
+            totals = [0] * len(values)
+            for code in codes:
+                totals[code] += 1
+        return dict(zip(values, totals))
+
+    def rows(self, names=None, chunk=WRITE_CHUNK):
+        """Yields (token id, value, ...) for the given traits (all by default), chunk tokens at a time."""
+        names = list(self.traits) if names is None else names
+        for start in range(0, len(self), chunk):
+            token_ids = self.token_ids[start:start + chunk]
+            columns = []
+            for name in names:
+                values, codes = self.traits[name]
+                codes = codes[start:start + chunk]
+                columns.append([values[code] for code in (codes.tolist() if np is not None else codes)])
+            yield from zip(token_ids.tolist() if np is not None else token_ids, *columns)
+
+    def to_trait_table(self):
+        """The assignments as a traits.TraitTable, for rarity scores and filters."""
+        from birdpy.traits import TraitColumn, TraitTable
+
+        table = TraitTable()
+        table.token_ids = array('q', self.token_ids.tolist() if np is not None else self.token_ids)
+        for name, (values, codes) in self.traits.items():
+            column = TraitColumn(name)
+            for value in values:
+                column.code_of(value)
+            column.codes = array('i', codes.astype(np.int32).tobytes() if np is not None else codes)
+            table.columns[name] = column
+        return table
+
+
+def generate(count=None, traits=(), seed=0, card_ids=None, editions=EDITIONS_PER_CARD, first_token_id=1):
+    """
+    Assigns traits to a new collection with exact quotas.
+
+    Args:
+        count: Number of tokens; with card_ids it defaults to
+            len(card_ids) * editions and must not exceed it.
+        traits: TraitSpec per trait.
+        seed: Anything with a stable str(); the same seed gives the same
+            collection.
+        card_ids: Card ids to deal out, each `editions` times.
+        editions: Tokens per card.
+        first_token_id: Id of the first token.
+
+    Returns:
+        GeneratedCollection
+    """
+    if card_ids is not None:
+        card_ids = [str(card_id) for card_id in card_ids]
+        available = len(card_ids) * editions
+        count = available if count is None else count
+        if count > available:
+            raise ValueError(f"{count} tokens need more than {len(card_ids)} cards x {editions} editions")
+    if count is None:
+        raise ValueError("Give count or card_ids")
+
+    if np is not None:
+        token_ids = np.arange(first_token_id, first_token_id + count, dtype=np.int64)
+    else:
+        token_ids = array('q', range(first_token_id, first_token_id + count))
+    collection = GeneratedCollection(token_ids, seed)
+
+    if card_ids is not None:
+        # Every card gets its editions, the first count of the shuffled deck are used
+        cards = _deal([editions] * len(card_ids), shuffled_order(seed, '\0cards', available))[:count]
+        collection.card_ids = card_ids
+        collection.traits['cardId'] = (card_ids, cards)
+        collection.editions = _edition_numbers(cards, editions)
+
+    for spec in traits:
+        if spec.name in collection.traits:
+            raise ValueError(f"Duplicate trait: {spec.name}")
+        counts = quotas(spec.weights, count)
+        collection.traits[spec.name] = (spec.values, _deal(counts, shuffled_order(seed, spec.name, count)))
+    return collection
+
+
+def _edition_numbers(cards, editions):
+    """1-based position of every token among the tokens of its card, cycling every editions."""
+    if np is not None:
+        order = np.argsort(cards, kind='stable')
+        sorted_cards = cards[order]
+        starts = np.flatnonzero(np.r_[True, sorted_cards[1:] != sorted_cards[:-1]])
+        group_start = np.repeat(starts, np.diff(np.r_[starts, len(cards)]))
+        numbers = np.empty(len(cards), dtype=np.int32)
+        numbers[order] = (np.arange(len(cards)) - group_start) % editions + 1
+        return numbers
+    seen = {}
+    numbers = array('i')
+    for card in cards:
+        seen[card] = seen.get(card, 0) + 1
+        numbers.append((seen[card] - 1) % editions + 1)
+    return numbers
+
+
+def rebalance(collection, spec):
+    """
+    Moves a generated trait to a new target distribution, changing as few
+    tokens as possible: only the surplus tokens of values above their new
+    quota (chosen in the seeded order) are dealt to the values below it.
+    Values that are new in spec are added; a value left out of spec gets
+    quota 0.
+
+    Returns:
+        int: Tokens whose value changed.
+    """
+    old_values, codes = collection.traits[spec.name]
+    values = list(spec.values) + [value for value in old_values if value not in spec.values]
+    weights = list(spec.weights) + [0] * (len(values) - len(spec.values))
+    remap = [values.index(value) for value in old_values]
+    targets = quotas(weights, len(codes))
+    order = shuffled_order(collection.seed, '\0rebalance ' + spec.name, len(codes))
+
+    if np is not None:
+        codes = np.asarray(remap, dtype=np.int32)[codes]
+        current = np.bincount(codes, minlength=len(values))
+        ranked = codes[order]
+        # rank of each token among the tokens with its value, in the seeded order
+        by_value = np.argsort(ranked, kind='stable')
+        starts = np.searchsorted(ranked[by_value], np.arange(len(values)))
+        rank = np.empty(len(codes), dtype=np.int64)
+        rank[by_value] = np.arange(len(codes)) - starts[ranked[by_value]]
+        surplus = np.maximum(current - np.asarray(targets), 0)
+        moving = order[rank < surplus[ranked]]  # token positions, in the seeded order
+        deficit = np.maximum(np.asarray(targets) - current, 0)
+        codes[moving] = np.repeat(np.arange(len(values), dtype=np.int32), deficit)
+        moved = len(moving)
+    else:
+        codes = array('i', (remap[code] for code in codes))
+        current = [0] * len(values)
+        for code in codes:
+            current[code] += 1
+        surplus = [max(c - t, 0) for c, t in zip(current, targets)]
+        moving = []
+        for token in order:
+            if surplus[codes[token]]:
+                surplus[codes[token]] -= 1
+                moving.append(token)
+        fill = [value for value, (c, t) in enumerate(zip(current, targets)) for _ in range(max(t - c, 0))]
+        for token, value in zip(moving, fill):
+            codes[token] = value
+        moved = len(moving)
+
+    collection.traits[spec.name] = (values, codes)
+    return moved
+
+
+# --- output ------------------------------------------------------------------
+
+def write_metadata_csv(collection, path, names=None):
+    """tokenId,<trait>,... rows (nftspy/metadata.csv), written in chunks."""
+    names = [name for name in collection.traits if name != 'cardId'] if names is None else names
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(["tokenId", *names])
+        writer.writerows(collection.rows(names))
+    return len(collection)
+
+
+def metadata_entries(collection, name_template='#{tokenId}'):
+    """Yields the nftspy metadata JSON of every token: {"tokenId", "name", "attributes"}."""
+    names = [name for name in collection.traits if name != 'cardId']
+    for token_id, *values in collection.rows(names):
+        fields = dict(zip(names, values), tokenId=token_id)
+        yield {"tokenId": token_id, "name": name_template.format(**fields),
+               "attributes": [{"trait_type": name, "value": value} for name, value in zip(names, values)]}
+
+
+def write_metadata_folder(collection, folder, name_template='#{tokenId}', workers=8):
+    """One <tokenId>.json per token, the layout nftspy/mergedata.py and MetadataIndex read."""
+    from birdpy.jsonout import write_shards
+
+    return write_shards(metadata_entries(collection, name_template), folder,
+                        lambda entry: f"{entry['tokenId']}.json", compact=True, workers=workers)
+
+
+def write_nft_list(collection, path, file_template='{nftId:0>4}.webp'):
+    """
+    The thin apesnftlist.csv (nftId,fileName,cardId and the traits); the
+    card columns come from cardList.csv when json-export joins them.
+    """
+    if collection.card_ids is None:
+        raise ValueError("write_nft_list() needs a collection generated with card_ids")
+    names = [name for name in collection.traits if name != 'cardId']
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(["nftId", "fileName", "cardId", *names])
+        for nft_id, card_id, *values in collection.rows(['cardId', *names]):
+            writer.writerow([nft_id, file_template.format(nftId=nft_id), card_id, *values])
+    return len(collection)
@@ -0,0 +1,261 @@
+import hashlib
+import io
+import mmap
+import os
+import sqlite3
+from concurrent.futures import ProcessPoolExecutor
+
+try:
+    from PIL import Image
+except ImportError:  # without Pillow only content hashes are indexed
+    Image = None
+
+IMAGE_EXTENSIONS = ('.webp', '.png', '.jpg', '.jpeg', '.gif')
+
+# dHash: compare neighbouring pixels of a HASH_SIZE+1 x HASH_SIZE grayscale thumbnail.
+HASH_SIZE = 8
+
+POOL_THRESHOLD = 64
+POOL_CHUNK_SIZE = 32
+
+
+def _to_signed(value):
+    """SQLite integers are signed 64 bit."""
+    return value - (1 << 64) if value >= 1 << 63 else value
+
+
+def _to_unsigned(value):
+    return value + (1 << 64) if value < 0 else value
+
+
+def hamming(a, b):
+    return (a ^ b).bit_count()
+
+
+def perceptual_hash(data):
+    """
+    64 bit difference hash of an encoded image, or None without Pillow or
+    for data Pillow cannot decode.
+
+    The decoder is asked for a reduced size first (draft/reduce), so large
+    WebP files are not decoded at full resolution just to be shrunk to 9x8.
+    """
+    if Image is None:
+        return None
+    try:
+        with Image.open(io.BytesIO(data)) as img:
+            img.draft('L', (HASH_SIZE * 8, HASH_SIZE * 8))
+            factor = min(img.width, img.height) // (HASH_SIZE * 8)
+            if factor > 1:
+                img = img.reduce(factor)
+            small = img.convert('L').resize((HASH_SIZE + 1, HASH_SIZE), Image.BILINEAR)
+    except Exception:
+        return None
+    pixels = small.tobytes()
+    value = 0
+    for row in range(HASH_SIZE):
+        offset = row * (HASH_SIZE + 1)
+        for col in range(HASH_SIZE):
+            value = (value << 1) | (pixels[offset + col] > pixels[offset + col + 1])
+    return value
+
+
+def content_hash(path):
+    """sha256 hex digest of a file, read through mmap."""
+    with open(path, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return hashlib.sha256().hexdigest()
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            return hashlib.sha256(data).hexdigest()
+
+
+def file_perceptual_hash(path):
+    """perceptual_hash() of a file, read through mmap."""
+    with open(path, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return None
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            return perceptual_hash(data)
+
+
+def _content_hashes(paths):
+    return [content_hash(path) for path in paths]
+
+
+def _perceptual_hashes(paths):
+    return [file_perceptual_hash(path) for path in paths]
+
+
+def _in_folders(folders):
+    """SQL condition (and its parameters) for paths directly inside any of folders; None is every path."""
+    if folders is None:
+        return "1", ()
+    prefixes = [os.path.join(folder, '') for folder in folders]
+    condition = " OR ".join("(substr(path, 1, ?) = ? AND instr(substr(path, ?), ?) = 0)" for _ in prefixes)
+    params = [value for prefix in prefixes for value in (len(prefix), prefix, len(prefix) + 1, os.sep)]
+    return f"({condition or '0'})", params
+
+
+def _run(function, paths, workers):
+    """function over chunks of paths, on a process pool when there is enough work."""
+    if len(paths) < POOL_THRESHOLD or workers == 1:
+        return function(paths)
+    chunks = [paths[i:i + POOL_CHUNK_SIZE] for i in range(0, len(paths), POOL_CHUNK_SIZE)]
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return [result for chunk in pool.map(function, chunks) for result in chunk]
+
+
+class ImageIndex:
+    """
+    Persistent content + perceptual hash index over image folders.
+
+    update() re-hashes only files whose mtime or size changed, on a process
+    pool. Decoding for the perceptual hash is the expensive part, so it runs
+    once per distinct content: the 1110 monkeyNfts copies of 111 cards cost
+    111 decodes. exact() and duplicates() answer "which files are byte-identical",
+    near() and near_duplicates() find images within a Hamming distance of
+    each other's dHash.
+
+    Args:
+        index_path: SQLite file holding the index.
+    """
+
+    def __init__(self, index_path):
+        self.index_path = index_path
+        self.db = sqlite3.connect(index_path)
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS images ("
+            " path TEXT PRIMARY KEY,"
+            " mtime_ns INTEGER NOT NULL,"
+            " size INTEGER NOT NULL,"
+            " sha256 TEXT NOT NULL,"
+            " phash INTEGER)"
+        )
+        self.db.execute("CREATE INDEX IF NOT EXISTS images_sha256 ON images (sha256)")
+
+    def close(self):
+        self.db.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def update(self, folders, workers=None):
+        """
+        Indexes the images directly inside each folder.
+
+        Returns:
+            dict: Counts of 'hashed', 'unchanged' and 'removed' files.
+        """
+        changed = []
+        present = set()
+        cached = {}
+        for folder in folders:
+            # only the folder's own images: a subfolder indexed on its own is not "removed"
+            where, params = _in_folders([folder])
+            cached.update((path, (mtime_ns, size)) for path, mtime_ns, size in self.db.execute(
+                f"SELECT path, mtime_ns, size FROM images WHERE {where}", params))
+            with os.scandir(folder) as entries:
+                for entry in entries:
+                    if not entry.name.lower().endswith(IMAGE_EXTENSIONS) or not entry.is_file():
+                        continue
+                    present.add(entry.path)
+                    st = entry.stat()
+                    if cached.get(entry.path) != (st.st_mtime_ns, st.st_size):
+                        changed.append((entry.path, st.st_mtime_ns, st.st_size))
+
+        removed = [path for path in cached if path not in present]
+
+        paths = [path for path, _, _ in changed]
+        digests = _run(_content_hashes, paths, workers)
+
+        # Perceptual hashes already known for a content are reused.
+        known = dict(self.db.execute("SELECT sha256, phash FROM images WHERE phash IS NOT NULL"))
+        to_decode = {}
+        for path, digest in zip(paths, digests):
+            if digest not in known and digest not in to_decode:
+                to_decode[digest] = path
+        for digest, phash in zip(to_decode, _run(_perceptual_hashes, list(to_decode.values()), workers)):
+            known[digest] = None if phash is None else _to_signed(phash)
+
+        with self.db:
+            self.db.executemany("DELETE FROM images WHERE path = ?", ((path,) for path in removed))
+            self.db.executemany(
+                "INSERT OR REPLACE INTO images (path, mtime_ns, size, sha256, phash) VALUES (?, ?, ?, ?, ?)",
+                ((path, mtime_ns, size, digest, known.get(digest))
+                 for (path, mtime_ns, size), digest in zip(changed, digests)),
+            )
+        return {'hashed': len(changed), 'unchanged': len(present) - len(changed), 'removed': len(removed)}
+
+    def digest_of(self, path):
+        row = self.db.execute("SELECT sha256 FROM images WHERE path = ?", (path,)).fetchone()
+        return row[0] if row else None
+
+    def phash_of(self, path):
+        row = self.db.execute("SELECT phash FROM images WHERE path = ?", (path,)).fetchone()
+        return _to_unsigned(row[0]) if row and row[0] is not None else None
+
+    def exact(self, digest, folders=None):
+        """Paths whose content has this sha256."""
+        where, params = _in_folders(folders)
+        return [path for (path,) in self.db.execute(
+            f"SELECT path FROM images WHERE sha256 = ? AND {where} ORDER BY path", (digest, *params))]
+
+    def duplicates(self, folders=None):
+        """{sha256: [paths]} for every content stored more than once (within folders, if given)."""
+        where, params = _in_folders(folders)
+        groups = {}
+        for digest, path in self.db.execute(
+                f"SELECT sha256, path FROM images WHERE {where} AND sha256 IN "
+                f"(SELECT sha256 FROM images WHERE {where} GROUP BY sha256 HAVING COUNT(*) > 1) "
+                "ORDER BY sha256, path", (*params, *params)):
+            groups.setdefault(digest, []).append(path)
+        return groups
+
+    def _unique_hashes(self, folders=None):
+        """One (sha256, phash, example path) per distinct content that has a phash."""
+        where, params = _in_folders(folders)
+        return [(digest, _to_unsigned(phash), path) for digest, phash, path in self.db.execute(
+            f"SELECT sha256, phash, MIN(path) FROM images WHERE phash IS NOT NULL AND {where} GROUP BY sha256",
+            params)]
+
+    def near(self, phash, max_distance=6, folders=None):
+        """(distance, path) of distinct images within max_distance of phash, closest first."""
+        matches = [(hamming(phash, other), path) for _, other, path in self._unique_hashes(folders)]
+        return sorted(match for match in matches if match[0] <= max_distance)
+
+    def near_duplicates(self, max_distance=4, folders=None):
+        """
+        Pairs of distinct contents whose dHashes differ in at most max_distance bits
+        (within folders, if given).
+
+        Uses multi-index hashing: the 64 bits are split into max_distance + 1
+        bands, and two hashes within the distance must agree on at least one
+        band, so only hashes sharing a band bucket are compared.
+
+        Returns:
+            list of (distance, path a, path b)
+        """
+        entries = self._unique_hashes(folders)
+        bands = max_distance + 1
+        width = -(-64 // bands)
+        mask = (1 << width) - 1
+        buckets = {}
+        for position, (_, phash, _) in enumerate(entries):
+            for band in range(bands):
+                buckets.setdefault((band, (phash >> (band * width)) & mask), []).append(position)
+
+        pairs = set()
+        for members in buckets.values():
+            for i, a in enumerate(members):
+                for b in members[i + 1:]:
+                    pairs.add((a, b) if a < b else (b, a))
+
+        result = []
+        for a, b in pairs:
+            distance = hamming(entries[a][1], entries[b][1])
+            if distance <= max_distance:
+                result.append((distance, entries[a][2], entries[b][2]))
+        return sorted(result)
@@ -0,0 +1,371 @@
+"""
+Counters, histograms, progress and structured events for the collection tools.
+
+Hot loops count and warn through the process-wide Instrumentation from
+get() instead of printing once per row:
+
+    instrumentation = get()
+    with instrumentation.stage('fan-out'):
+        progress = instrumentation.progress('fan-out', total=len(plan))
+        for item in plan:
+            ...
+            instrumentation.count('fanout.bytes_copied', size)
+            progress.update()
+        progress.close()
+    instrumentation.report()
+
+Warnings are counted by category; in text mode only the first few of each
+category are printed, the rest show up in the summary. In JSON mode every
+event is one JSON object per line on stderr, for log shippers and alerts.
+
+Environment (or configure()):
+    BIRDPY_LOG_FORMAT   text (default) or json
+    BIRDPY_PROFILE      cpu, memory or cpu,memory: profile every stage
+    BIRDPY_PROFILE_DIR  where cpu profiles are written (<stage>.prof)
+"""
+import json
+import math
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+LOG_FORMAT_ENV = 'BIRDPY_LOG_FORMAT'
+PROFILE_ENV = 'BIRDPY_PROFILE'
+PROFILE_DIR_ENV = 'BIRDPY_PROFILE_DIR'
+
+# Warnings of one category printed in text mode before only counting them.
+WARNING_SAMPLES = 5
+# Seconds between two progress lines.
+PROGRESS_INTERVAL = 2.0
+
+
+class Histogram:
+    """
+    Count, sum, min, max and power-of-two buckets of observed values, enough
+    for a mean and approximate percentiles without keeping every value.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+        self.buckets = {}  # exponent -> values in (2**(e-1), 2**e]
+
+    def add(self, value):
+        self.count += 1
+        self.total += value
+        if value < self.min:
+            self.min = value
+        if value > self.max:
+            self.max = value
+        exponent = math.frexp(value)[1] if value > 0 else None
+        self.buckets[exponent] = self.buckets.get(exponent, 0) + 1
+
+    def percentile(self, fraction):
+        """Upper bound of the bucket holding the given fraction of the values."""
+        if not self.count:
+            return None
+        rank = fraction * self.count
+        seen = 0
+        for exponent in sorted(self.buckets, key=lambda e: -math.inf if e is None else e):
+            seen += self.buckets[exponent]
+            if seen >= rank:
+                return 0.0 if exponent is None else min(math.ldexp(1.0, exponent), self.max)
+        return self.max
+
+    def summary(self):
+        if not self.count:
+            return {"count": 0}
+        return {"count": self.count, "sum": self.total, "mean": self.total / self.count, "min": self.min,
+                "max": self.max, "p50": self.percentile(0.5), "p95": self.percentile(0.95)}
+
+
+class Progress:
+    """
+    Progress of a loop, reported at most every interval seconds.
+
+    update() is cheap enough to call once per row: it only looks at the
+    clock every check_every calls.
+    """
+
+    def __init__(self, emit, label, total=None, interval=PROGRESS_INTERVAL, check_every=64):
+        self._emit = emit
+        self.label = label
+        self.total = total
+        self.interval = interval
+        self.check_every = check_every
+        self.done = 0
+        self._unchecked = 0
+        self.started = time.monotonic()
+        self._last = self.started
+
+    def update(self, n=1):
+        self.done += n
+        self._unchecked += n
+        if self._unchecked < self.check_every:
+            return
+        self._unchecked = 0
+        now = time.monotonic()
+        if now - self._last >= self.interval:
+            self._last = now
+            self._report(now, final=False)
+
+    def close(self):
+        self._report(time.monotonic(), final=True)
+
+    def _report(self, now, final):
+        elapsed = now - self.started
+        self._emit(self.label, self.done, self.total, elapsed, final)
+
+
+class Instrumentation:
+    """
+    Metrics and events of one run.
+
+    Args:
+        log_format: 'text' for human readable output, 'json' for one JSON
+            event per line.
+        stream: Where JSON events, progress and the report go (stderr).
+        profile: Stage profilers to enable: 'cpu' (cProfile) and/or
+            'memory' (tracemalloc peak and top allocations).
+        profile_dir: Folder for the cpu profiles, the working folder if None.
+        warning_samples: Warnings of each category printed in text mode.
+        progress_interval: Seconds between progress reports.
+    """
+
+    def __init__(self, log_format='text', stream=None, profile=(), profile_dir=None,
+                 warning_samples=WARNING_SAMPLES, progress_interval=PROGRESS_INTERVAL):
+        if log_format not in ('text', 'json'):
+            raise ValueError(f"unknown log format: {log_format}")
+        unknown = set(profile) - {'cpu', 'memory'}
+        if unknown:
+            raise ValueError(f"unknown profiler: {', '.join(sorted(unknown))}")
+        self.log_format = log_format
+        self.stream = stream
+        self.profile = frozenset(profile)
+        self.profile_dir = profile_dir
+        self.warning_samples = warning_samples
+        self.progress_interval = progress_interval
+        self.counters = {}
+        self.histograms = {}
+        self.warnings = {}  # category -> count
+        self.stages = {}    # name -> {"seconds", "status", ...}
+        self._lock = threading.Lock()
+        self._cpu_profiling = False
+        self._tracing_stages = 0
+        self._started_tracing = False
+
+    def _write(self, text):
+        stream = self.stream or sys.stderr
+        stream.write(text + '\n')
+        stream.flush()
+
+    # --- metrics -------------------------------------------------------------
+
+    def count(self, name, n=1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    def observe(self, name, value):
+        with self._lock:
+            histogram = self.histograms.get(name)
+            if histogram is None:
+                histogram = self.histograms[name] = Histogram()
+            histogram.add(value)
+
+    @contextmanager
+    def timer(self, name):
+        """Observes the seconds spent in the block in histogram name."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start)
+
+    # --- events --------------------------------------------------------------
+
+    def event(self, name, level='info', **fields):
+        """Structured event; written only in JSON mode."""
+        if self.log_format == 'json':
+            record = {"ts": round(time.time(), 3), "level": level, "event": name, **fields}
+            self._write(json.dumps(record, ensure_ascii=False, default=str))
+
+    def warn(self, category, message, level='warning', **fields):
+        """
+        Counts a problem under errors.<category>. The text mode prints the
+        message for the first warning_samples of each category.
+        """
+        with self._lock:
+            seen = self.warnings[category] = self.warnings.get(category, 0) + 1
+            self.counters['errors.' + category] = seen
+        if self.log_format == 'json':
+            self.event(category, level=level, message=message, **fields)
+        elif seen <= self.warning_samples:
+            self._write(message)
+        elif seen == self.warning_samples + 1:
+            self._write(f"(further '{category}' warnings are only counted)")
+
+    def progress(self, label, total=None):
+        return Progress(self._progress, label, total, self.progress_interval)
+
+    def _progress(self, label, done, total, elapsed, final):
+        rate = done / elapsed if elapsed > 0 else None
+        if self.log_format == 'json':
+            self.event('progress', label=label, done=done, total=total, seconds=round(elapsed, 3),
+                       rate=rate and round(rate, 1), final=final)
+        elif not final or elapsed >= self.progress_interval:
+            of_total = f"/{total}" if total is not None else ""
+            per_second = f", {rate:,.0f}/s" if rate else ""
+            self._write(f"{label}: {done}{of_total} ({elapsed:.1f}s{per_second})")
+
+    # --- stages --------------------------------------------------------------
+
+    @contextmanager
+    def stage(self, name):
+        """
+        Times a stage and runs the configured profilers around it.
+
+        Only one cProfile profiler can be active at a time (on Python 3.12+
+        for the whole process), so the outermost running stage owns it and
+        the stages nested in it or overlapping it show up inside its
+        profile instead of getting their own.
+
+        tracemalloc is process-wide: it runs while any stage is open, and
+        the memory figures of stages running at the same time in threads
+        include each other's allocations.
+        """
+        profiler = self._start_cpu_profile()
+        tracing = self._start_tracing() if 'memory' in self.profile else False
+
+        self.event('stage_start', stage=name)
+        status = 'ok'
+        start = time.perf_counter()
+        try:
+            yield self
+        except BaseException:
+            status = 'failed'
+            raise
+        finally:
+            if profiler:
+                profiler.disable()
+            seconds = time.perf_counter() - start
+            info = {"seconds": seconds, "status": status}
+            if profiler:
+                info["cpu_profile"] = self._dump_profile(name, profiler)
+                with self._lock:
+                    self._cpu_profiling = False
+            if tracing:
+                import tracemalloc
+                info["peak_bytes"] = tracemalloc.get_traced_memory()[1]
+                info["top_allocations"] = [
+                    f"{stat.traceback[0].filename}:{stat.traceback[0].lineno} {stat.size} bytes"
+                    for stat in tracemalloc.take_snapshot().statistics('lineno')[:5]
+                ]
+                self._stop_tracing()
+            with self._lock:
+                self.stages[name] = info
+            self.event('stage_end', level='info' if status == 'ok' else 'error', stage=name, **info)
+
+    def _start_cpu_profile(self):
+        # An enabled profiler, or None if cpu profiling is off or another stage owns it
+        if 'cpu' not in self.profile:
+            return None
+        import cProfile
+
+        with self._lock:
+            if self._cpu_profiling:
+                return None
+            profiler = cProfile.Profile()
+            try:
+                profiler.enable()
+            except ValueError:  # a profiler outside birdpy (python -m cProfile) is active
+                return None
+            self._cpu_profiling = True
+        return profiler
+
+    def _start_tracing(self):
+        # Counts the open stages; the first one starts tracemalloc unless something else already did
+        import tracemalloc
+
+        with self._lock:
+            if not self._tracing_stages:
+                self._started_tracing = not tracemalloc.is_tracing()
+                if self._started_tracing:
+                    tracemalloc.start()
+            if tracemalloc.is_tracing():
+                tracemalloc.reset_peak()
+            self._tracing_stages += 1
+            return tracemalloc.is_tracing()
+
+    def _stop_tracing(self):
+        import tracemalloc
+
+        with self._lock:
+            self._tracing_stages -= 1
+            if not self._tracing_stages and self._started_tracing:
+                tracemalloc.stop()
+
+    def _dump_profile(self, name, profiler):
+        folder = self.profile_dir or os.getcwd()
+        os.makedirs(folder, exist_ok=True)
+        path = os.path.join(folder, f"{name.replace(os.sep, '_')}.prof")
+        profiler.dump_stats(path)
+        return path
+
+    # --- summary -------------------------------------------------------------
+
+    def summary(self):
+        """Everything collected so far, as a JSON-serializable dict."""
+        with self._lock:
+            return {
+                "counters": dict(sorted(self.counters.items())),
+                "histograms": {name: h.summary() for name, h in sorted(self.histograms.items())},
+                "warnings": dict(sorted(self.warnings.items())),
+                "stages": dict(self.stages),
+            }
+
+    def report(self, path=None):
+        """
+        Writes the summary: an event (JSON mode) or a few lines (text mode),
+        plus a JSON file at path if given.
+        """
+        summary = self.summary()
+        if path:
+            with open(path, 'w', encoding='utf-8') as f:
+                json.dump(summary, f, indent=2, default=str)
+        if self.log_format == 'json':
+            self.event('summary', **summary)
+            return summary
+        for name, info in summary["stages"].items():
+            if info["seconds"] < self.progress_interval and not self.profile and info["status"] == 'ok':
+                continue  # quick runs stay quiet
+            extra = f", peak {info['peak_bytes'] / 2**20:.1f} MiB" if "peak_bytes" in info else ""
+            extra += f", profile {info['cpu_profile']}" if "cpu_profile" in info else ""
+            self._write(f"stage {name}: {info['status']} in {info['seconds']:.2f}s{extra}")
+        for category, count in summary["warnings"].items():
+            if count > self.warning_samples:
+                self._write(f"{category}: {count} warnings")
+        return summary
+
+
+_current = None
+
+
+def configure(**options):
+    """Replaces the process-wide Instrumentation (see Instrumentation for the options)."""
+    global _current
+    _current = Instrumentation(**options)
+    return _current
+
+
+def get():
+    """The process-wide Instrumentation, configured from the environment on first use."""
+    global _current
+    if _current is None:
+        profile = [p.strip() for p in os.environ.get(PROFILE_ENV, '').split(',') if p.strip()]
+        _current = Instrumentation(log_format=os.environ.get(LOG_FORMAT_ENV, 'text'), profile=profile,
+                                   profile_dir=os.environ.get(PROFILE_DIR_ENV))
+    return _current
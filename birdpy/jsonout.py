@@ -0,0 +1,179 @@
+import json
+import os
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from birdpy.atomic import atomic_open, temp_path
+
+COMPACT_SEPARATORS = (',', ':')
+
+
+class JsonArrayWriter:
+    """
+    Writes a JSON array one entry at a time, so the whole list never has to
+    be in memory.
+
+    With indent set, the output is byte-for-byte what json.dump(entries, f,
+    indent=indent) would write. With compact=True no whitespace is written.
+
+    Used as a context manager, the array is only closed when the block
+    succeeds, so an error cannot leave a shorter array that is still valid
+    JSON.
+    """
+
+    def __init__(self, f, indent=2, compact=False):
+        self.f = f
+        self.indent = None if compact else indent
+        self.separators = COMPACT_SEPARATORS if compact else None
+        self.count = 0
+
+    def write(self, entry):
+        text = json.dumps(entry, indent=self.indent, separators=self.separators)
+        if self.indent is None:
+            self.f.write(('[' if self.count == 0 else ',' if self.separators else ', ') + text)
+        else:
+            pad = ' ' * self.indent
+            self.f.write(('[\n' if self.count == 0 else ',\n') + pad + text.replace('\n', '\n' + pad))
+        self.count += 1
+
+    def close(self):
+        if self.count == 0:
+            self.f.write('[]')
+        else:
+            self.f.write('\n]' if self.indent is not None else ']')
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+
+
+class NdjsonWriter:
+    """Newline-delimited JSON: one compact entry per line."""
+
+    def __init__(self, f):
+        self.f = f
+        self.count = 0
+
+    def write(self, entry):
+        self.f.write(json.dumps(entry, separators=COMPACT_SEPARATORS) + '\n')
+        self.count += 1
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+def write_stream(entries, path, output_format='json', compact=False, indent=2):
+    """
+    Streams entries to path as a JSON array ('json') or NDJSON ('ndjson').
+
+    Nothing is written (and the file is not created) when entries is empty.
+    path is only replaced once every entry was written, so an error while
+    building the entries keeps the previous file.
+
+    Returns:
+        int: Number of entries written.
+    """
+    entries = iter(entries)
+    first = next(entries, None)
+    if first is None:
+        return 0
+
+    if output_format not in ('json', 'ndjson'):
+        raise ValueError(f"Unknown output format: {output_format}")
+    with atomic_open(path, 'w', encoding='utf-8') as f:
+        if output_format == 'json':
+            writer = JsonArrayWriter(f, indent=indent, compact=compact)
+        else:
+            writer = NdjsonWriter(f)
+        with writer:
+            writer.write(first)
+            for entry in entries:
+                writer.write(entry)
+        return writer.count
+
+
+def _write_shard(path, entry, indent, separators):
+    tmp = temp_path(path)
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(entry, f, indent=indent, separators=separators)
+    os.replace(tmp, path)
+
+
+def _check_shard_name(folder, name):
+    if not name.split('.')[0].strip() or os.path.basename(name) != name or (os.altsep and os.altsep in name):
+        raise ValueError(f"Not a shard file name: {name!r} (in {folder})")
+
+
+def _remove_stale_shards(folder, names):
+    """Removes the files of folder with a shard extension that this run did not write."""
+    extensions = {os.path.splitext(name)[1] for name in names}
+    removed = 0
+    for name in os.listdir(folder):
+        if name not in names and os.path.splitext(name)[1] in extensions:
+            path = os.path.join(folder, name)
+            if os.path.isfile(path):
+                os.unlink(path)
+                removed += 1
+    return removed
+
+
+def write_shards(entries, folder, name_of, compact=False, indent=2, workers=8):
+    """
+    Writes each entry to its own file in folder (e.g. <nftId>.json), on a
+    bounded thread pool.
+
+    Once every entry is written, the files of folder with the same
+    extension that were not written (shards of tokens no longer in the
+    collection) are removed, so the folder holds exactly this run's shards.
+
+    Args:
+        entries: Iterable of JSON-serializable entries.
+        folder: Output folder (created if missing).
+        name_of: Function entry -> file name, or None to skip the entry
+            (e.g. one without an nftId).
+        compact: No whitespace in the files.
+        indent: Indent when not compact.
+        workers: Writer threads.
+
+    Returns:
+        int: Number of files written.
+
+    Raises:
+        ValueError: Two entries map to the same file name (e.g. a repeated
+            nftId), or a name is empty or not a plain file name (".json");
+            the entries before it are written and nothing is removed.
+    """
+    os.makedirs(folder, exist_ok=True)
+    indent = None if compact else indent
+    separators = COMPACT_SEPARATORS if compact else None
+    written = 0
+    in_flight = set()
+    names = set()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for entry in entries:
+            name = name_of(entry)
+            if name is None:
+                continue
+            _check_shard_name(folder, name)
+            if name in names:
+                raise ValueError(f"Two entries would be written to {os.path.join(folder, name)}")
+            names.add(name)
+            in_flight.add(pool.submit(_write_shard, os.path.join(folder, name), entry, indent, separators))
+            if len(in_flight) >= workers * 4:
+                done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    future.result()
+                    written += 1
+        for future in in_flight:
+            future.result()
+            written += 1
+    _remove_stale_shards(folder, names)
+    return written
@@ -0,0 +1,193 @@
+import csv
+import json
+import os
+import sqlite3
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from birdpy import instrument
+from birdpy.atomic import atomic_open
+
+# Sidecar cache kept inside the metadata folder.
+INDEX_NAME = '.metaindex.sqlite'
+
+# Below this many changed files parsing inline beats starting a process pool.
+POOL_THRESHOLD = 512
+POOL_CHUNK_SIZE = 64
+
+
+def parse_metadata_file(path):
+    """
+    Extracts what the exports need from one metadata JSON file.
+
+    Returns:
+        (token id or None, [[trait_type, value], ...], warning or None)
+    """
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+    except json.JSONDecodeError:
+        return None, [], "invalid JSON"
+    except (OSError, UnicodeDecodeError) as e:
+        return None, [], f"could not read file: {e}"
+
+    if not isinstance(data, dict) or "tokenId" not in data:
+        return None, [], "'tokenId' not found"
+
+    attributes = []
+    for attribute in data.get("attributes", []):
+        if isinstance(attribute, dict) and "trait_type" in attribute and "value" in attribute:
+            attributes.append([attribute["trait_type"], attribute["value"]])
+
+    try:
+        token_id = int(data["tokenId"])
+    except (TypeError, ValueError):
+        return None, attributes, f"non-numeric 'tokenId': {data['tokenId']}"
+    return token_id, attributes, None
+
+
+def _parse_many(paths):
+    # (result, seconds) per file; the timings go to the parent's metrics
+    timed = []
+    for path in paths:
+        start = time.perf_counter()
+        result = parse_metadata_file(path)
+        timed.append((result, time.perf_counter() - start))
+    return timed
+
+
+class MetadataIndex:
+    """
+    Persistent index of a folder of per-token metadata JSON files.
+
+    Each file is stored with its mtime and size next to the extracted
+    tokenId and attributes, so refresh() only re-parses files that changed
+    since the previous run. A cold run parses on a process pool.
+
+    Args:
+        folder: Metadata folder (one <something>.json per token).
+        index_path: SQLite cache file, INDEX_NAME inside folder by default.
+    """
+
+    def __init__(self, folder, index_path=None):
+        self.folder = folder
+        self.index_path = index_path or os.path.join(folder, INDEX_NAME)
+        self.db = sqlite3.connect(self.index_path)
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS files ("
+            " name TEXT PRIMARY KEY,"
+            " mtime_ns INTEGER NOT NULL,"
+            " size INTEGER NOT NULL,"
+            " token_id INTEGER,"
+            " attributes TEXT NOT NULL,"
+            " warning TEXT)"
+        )
+        self.db.execute("CREATE INDEX IF NOT EXISTS files_token_id ON files (token_id)")
+
+    def close(self):
+        self.db.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def refresh(self, workers=None):
+        """
+        Brings the index up to date with the folder.
+
+        Returns:
+            dict: Counts of 'parsed', 'unchanged' and 'removed' files.
+        """
+        cached = {name: (mtime_ns, size) for name, mtime_ns, size in self.db.execute("SELECT name, mtime_ns, size FROM files")}
+
+        changed = []
+        present = set()
+        with os.scandir(self.folder) as entries:
+            for entry in entries:
+                if not entry.name.endswith('.json') or not entry.is_file():
+                    continue
+                present.add(entry.name)
+                st = entry.stat()
+                if cached.get(entry.name) != (st.st_mtime_ns, st.st_size):
+                    changed.append((entry.name, entry.path, st.st_mtime_ns, st.st_size))
+
+        removed = [name for name in cached if name not in present]
+
+        paths = [path for _, path, _, _ in changed]
+        if len(paths) >= POOL_THRESHOLD and (workers is None or workers > 1):
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                chunks = [paths[i:i + POOL_CHUNK_SIZE] for i in range(0, len(paths), POOL_CHUNK_SIZE)]
+                timed = [item for chunk in pool.map(_parse_many, chunks) for item in chunk]
+        else:
+            timed = _parse_many(paths)
+
+        metrics = instrument.get()
+        results = []
+        for result, seconds in timed:
+            metrics.observe('metadata.parse_seconds', seconds)
+            results.append(result)
+        metrics.count('metadata.parsed', len(changed))
+        metrics.count('metadata.unchanged', len(present) - len(changed))
+
+        with self.db:
+            self.db.executemany("DELETE FROM files WHERE name = ?", ((name,) for name in removed))
+            self.db.executemany(
+                "INSERT OR REPLACE INTO files (name, mtime_ns, size, token_id, attributes, warning) VALUES (?, ?, ?, ?, ?, ?)",
+                ((name, mtime_ns, size, token_id, json.dumps(attributes), warning)
+                 for (name, _, mtime_ns, size), (token_id, attributes, warning) in zip(changed, results)),
+            )
+
+        return {'parsed': len(changed), 'unchanged': len(present) - len(changed), 'removed': len(removed)}
+
+    def warnings(self):
+        """(file name, warning) for every file that could not be indexed cleanly."""
+        return list(self.db.execute("SELECT name, warning FROM files WHERE warning IS NOT NULL ORDER BY name"))
+
+    def tokens(self):
+        """
+        Yields (token id, [[trait_type, value], ...]) ordered by token id.
+        """
+        for token_id, attributes in self.db.execute(
+                "SELECT token_id, attributes FROM files WHERE token_id IS NOT NULL ORDER BY token_id, name"):
+            yield token_id, json.loads(attributes)
+
+    def trait_rows(self, trait_type):
+        """(token id, value) for every attribute of the given type, ordered by token id."""
+        for token_id, attributes in self.tokens():
+            for name, value in attributes:
+                if name == trait_type:
+                    yield token_id, value
+
+
+def export_rarity(folder, metadata_csv=None, rarity_csv=None, trait_type='Rarity', index_path=None):
+    """
+    Writes the Rarity exports from one up-to-date index pass.
+
+    Args:
+        folder: Metadata JSON folder.
+        metadata_csv: Path for tokenId,Rarity rows (metadata.csv), or None.
+        rarity_csv: Path for the Rarity-only column (newdata.csv), or None.
+        trait_type: Attribute to export.
+        index_path: See MetadataIndex.
+
+    Returns:
+        (refresh counts, warnings)
+    """
+    with MetadataIndex(folder, index_path) as index:
+        counts = index.refresh()
+        rows = list(index.trait_rows(trait_type))
+        warnings = index.warnings()
+
+    if metadata_csv:
+        with atomic_open(metadata_csv, 'w', newline='', encoding='utf-8') as f:
+            writer = csv.writer(f)
+            writer.writerow(["tokenId", trait_type])
+            writer.writerows(rows)
+    if rarity_csv:
+        with atomic_open(rarity_csv, 'w', newline='', encoding='utf-8') as f:
+            writer = csv.writer(f)
+            writer.writerow([trait_type])
+            writer.writerows([value] for _, value in rows)
+    return counts, warnings
@@ -0,0 +1,308 @@
+import hashlib
+import json
+import os
+import sqlite3
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from birdpy import instrument
+from birdpy.assets import file_digest
+
+# Digest cache and last run of every stage, kept next to the pipeline definition.
+STATE_NAME = '.pipeline.sqlite'
+
+DEFAULT_WORKERS = 4
+
+
+class Stage:
+    """
+    One build step with declared inputs and outputs.
+
+    Args:
+        name: Unique stage name.
+        run: Callable without arguments that produces the outputs.
+        inputs: Files or folders the stage reads.
+        outputs: Files or folders the stage writes.
+        after: Names of stages that must run first even though no output of
+            theirs is a declared input.
+        params: JSON-serializable settings that change the outputs (start
+            id, contract name, ...); changing them reruns the stage.
+    """
+
+    def __init__(self, name, run, inputs=(), outputs=(), after=(), params=None):
+        self.name = name
+        self.run = run
+        self.inputs = [os.path.normpath(path) for path in inputs]
+        self.outputs = [os.path.normpath(path) for path in outputs]
+        self.after = list(after)
+        self.params = params or {}
+
+    def __repr__(self):
+        return f"Stage({self.name!r})"
+
+
+def _run_stage(stage):
+    with instrument.get().stage(stage.name):
+        stage.run()
+
+
+class PipelineResult:
+    """Status per stage: 'ran', 'cached', 'failed', 'blocked' or, in a dry run, 'stale'."""
+
+    def __init__(self):
+        self.status = {}
+        self.errors = {}  # stage name -> error message
+
+    @property
+    def ok(self):
+        return all(status in ('ran', 'cached', 'stale') for status in self.status.values())
+
+    def names(self, status):
+        return [name for name, value in self.status.items() if value == status]
+
+    def __repr__(self):
+        counts = {}
+        for status in self.status.values():
+            counts[status] = counts.get(status, 0) + 1
+        return f"PipelineResult({', '.join(f'{k}={v}' for k, v in sorted(counts.items()))})"
+
+
+def _is_inside(path, folder):
+    return path == folder or path.startswith(os.path.join(folder, ''))
+
+
+class Pipeline:
+    """
+    Runs stages in dependency order, skipping the ones that are up to date.
+
+    A stage depends on every stage whose output is (or contains) one of its
+    inputs. Before running a stage its inputs are hashed; if the hash and
+    its parameters match the last successful run and its outputs still have
+    the content that run left, the stage is skipped. Stages whose
+    dependencies are done run concurrently on a thread pool.
+
+    File digests are cached by size and mtime in the state file, so
+    unchanged inputs and outputs (e.g. 2000 NFT images) are not re-read.
+    Folders are hashed over their files, ignoring dot files such as
+    .fanout-journal or .metaindex.sqlite.
+
+    Args:
+        stages: Iterable of Stage.
+        state_path: SQLite state file.
+        workers: Stages run at the same time.
+    """
+
+    def __init__(self, stages=(), state_path=STATE_NAME, workers=DEFAULT_WORKERS):
+        self.stages = {}
+        for stage in stages:
+            self.add(stage)
+        self.state_path = state_path
+        self.workers = workers
+
+    def add(self, stage):
+        if stage.name in self.stages:
+            raise ValueError(f"Duplicate stage: {stage.name}")
+        self.stages[stage.name] = stage
+        return stage
+
+    def dependencies(self):
+        """{stage name: set of stage names it depends on}."""
+        producers = [(output, stage.name) for stage in self.stages.values() for output in stage.outputs]
+        deps = {}
+        for stage in self.stages.values():
+            found = set(stage.after)
+            for path in stage.inputs:
+                found.update(name for output, name in producers
+                             if name != stage.name and (_is_inside(path, output) or _is_inside(output, path)))
+            unknown = found - set(self.stages)
+            if unknown:
+                raise ValueError(f"Stage {stage.name} runs after unknown stage(s): {', '.join(sorted(unknown))}")
+            deps[stage.name] = found
+        self._check_cycles(deps)
+        return deps
+
+    @staticmethod
+    def _check_cycles(deps):
+        state = {}
+
+        def visit(name, path):
+            if state.get(name) == 'done':
+                return
+            if state.get(name) == 'visiting':
+                raise ValueError(f"Dependency cycle: {' -> '.join(path + [name])}")
+            state[name] = 'visiting'
+            for dep in sorted(deps[name]):
+                visit(dep, path + [name])
+            state[name] = 'done'
+
+        for name in deps:
+            visit(name, [])
+
+    def _selected(self, deps, targets):
+        if not targets:
+            return set(self.stages)
+        unknown = set(targets) - set(self.stages)
+        if unknown:
+            raise ValueError(f"Unknown stage(s): {', '.join(sorted(unknown))}")
+        selected = set()
+        todo = list(targets)
+        while todo:
+            name = todo.pop()
+            if name not in selected:
+                selected.add(name)
+                todo.extend(deps[name])
+        return selected
+
+    def run(self, targets=None, force=False, dry_run=False):
+        """
+        Brings the selected stages up to date.
+
+        Args:
+            targets: Stage names to build, with everything they depend on.
+                All stages if omitted.
+            force: Run the selected stages even if they are up to date.
+            dry_run: Only report which stages are stale ('stale') and which
+                are not ('cached'); stages after a stale one are stale too.
+
+        Returns:
+            PipelineResult
+        """
+        deps = self.dependencies()
+        selected = self._selected(deps, targets)
+        result = PipelineResult()
+        with _State(self.state_path) as state:
+            if dry_run:
+                self._dry_run(deps, selected, state, force, result)
+            else:
+                self._run(deps, selected, state, force, result)
+        return result
+
+    def _ready(self, deps, selected, result):
+        return sorted(name for name in selected
+                      if name not in result.status and all(dep in result.status for dep in deps[name] & selected))
+
+    def _dry_run(self, deps, selected, state, force, result):
+        while len(result.status) < len(selected):
+            for name in self._ready(deps, selected, result):
+                stage = self.stages[name]
+                upstream_stale = any(result.status[dep] == 'stale' for dep in deps[name] & selected)
+                if force or upstream_stale or not state.is_current(stage, state.inputs_key(stage)):
+                    result.status[name] = 'stale'
+                else:
+                    result.status[name] = 'cached'
+
+    def _run(self, deps, selected, state, force, result):
+        running = {}
+        keys = {}  # inputs hashed before the stage ran
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            while len(result.status) < len(selected):
+                for name in self._ready(deps, selected, result):
+                    if name in running.values():
+                        continue
+                    stage = self.stages[name]
+                    failed = [dep for dep in deps[name] & selected if result.status[dep] in ('failed', 'blocked')]
+                    if failed:
+                        result.status[name] = 'blocked'
+                        result.errors[name] = f"not run: {', '.join(sorted(failed))} failed"
+                        continue
+                    missing = [path for path in stage.inputs if not os.path.exists(path)]
+                    if missing:
+                        result.status[name] = 'failed'
+                        result.errors[name] = f"missing input(s): {', '.join(missing)}"
+                        continue
+                    keys[name] = state.inputs_key(stage)
+                    if not force and state.is_current(stage, keys[name]):
+                        result.status[name] = 'cached'
+                        continue
+                    running[pool.submit(_run_stage, stage)] = name
+
+                if not running:
+                    continue
+                finished, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    name = running.pop(future)
+                    stage = self.stages[name]
+                    try:
+                        future.result()
+                    except Exception as e:
+                        result.status[name] = 'failed'
+                        result.errors[name] = f"{type(e).__name__}: {e}"
+                        state.forget(stage)
+                        continue
+                    missing = [path for path in stage.outputs if not os.path.exists(path)]
+                    if missing:
+                        result.status[name] = 'failed'
+                        result.errors[name] = f"output(s) not written: {', '.join(missing)}"
+                        state.forget(stage)
+                        continue
+                    state.record(stage, keys[name])
+                    result.status[name] = 'ran'
+
+
+class _State:
+    """SQLite file with the digest cache and the inputs/outputs hash of each stage's last run."""
+
+    def __init__(self, path):
+        self.db = sqlite3.connect(path)
+        self.db.execute("CREATE TABLE IF NOT EXISTS files ("
+                        " path TEXT PRIMARY KEY, size INTEGER, mtime_ns INTEGER, digest TEXT)")
+        self.db.execute("CREATE TABLE IF NOT EXISTS stages ("
+                        " name TEXT PRIMARY KEY, inputs_key TEXT, outputs_key TEXT)")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.db.commit()
+        self.db.close()
+
+    def file_digest(self, path, st):
+        row = self.db.execute("SELECT size, mtime_ns, digest FROM files WHERE path = ?", (path,)).fetchone()
+        if row and row[0] == st.st_size and row[1] == st.st_mtime_ns:
+            return row[2]
+        digest = file_digest(path)
+        self.db.execute("INSERT OR REPLACE INTO files (path, size, mtime_ns, digest) VALUES (?, ?, ?, ?)",
+                        (path, st.st_size, st.st_mtime_ns, digest))
+        return digest
+
+    def fingerprint(self, path):
+        """Digest of a file, or of every (relative name, digest) under a folder; None if missing."""
+        try:
+            st = os.stat(path)
+        except FileNotFoundError:
+            return None
+        if not os.path.isdir(path):
+            return self.file_digest(path, st)
+        digest = hashlib.sha256()
+        for folder, subfolders, names in os.walk(path):
+            subfolders[:] = sorted(d for d in subfolders if not d.startswith('.'))
+            for name in sorted(n for n in names if not n.startswith('.')):
+                file_path = os.path.join(folder, name)
+                relative = os.path.relpath(file_path, path)
+                digest.update(f"{relative}\t{self.file_digest(file_path, os.stat(file_path))}\n".encode())
+        return digest.hexdigest()
+
+    def _key(self, paths, extra=None):
+        digest = hashlib.sha256(json.dumps(extra, sort_keys=True).encode())
+        for path in paths:
+            digest.update(f"{path}\t{self.fingerprint(path)}\n".encode())
+        return digest.hexdigest()
+
+    def inputs_key(self, stage):
+        return self._key(stage.inputs, stage.params)
+
+    def outputs_key(self, stage):
+        return self._key(stage.outputs)
+
+    def is_current(self, stage, inputs_key):
+        row = self.db.execute("SELECT inputs_key, outputs_key FROM stages WHERE name = ?", (stage.name,)).fetchone()
+        return (row is not None and row[0] == inputs_key
+                and all(os.path.exists(path) for path in stage.outputs) and row[1] == self.outputs_key(stage))
+
+    def record(self, stage, inputs_key):
+        self.db.execute("INSERT OR REPLACE INTO stages (name, inputs_key, outputs_key) VALUES (?, ?, ?)",
+                        (stage.name, inputs_key, self.outputs_key(stage)))
+        self.db.commit()
+
+    def forget(self, stage):
+        self.db.execute("DELETE FROM stages WHERE name = ?", (stage.name,))
+        self.db.commit()
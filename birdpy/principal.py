@@ -0,0 +1,198 @@
+import base64
+import hashlib
+import re
+
+C32_ALPHABET = '0123456789ABCDEFGHJKMNPQRSTVWXYZ'
+_C32_INDEX = {c: i for i, c in enumerate(C32_ALPHABET)}
+# c32 is case-insensitive and maps the look-alike letters onto digits.
+_C32_NORMALIZE = str.maketrans({'O': '0', 'L': '1', 'I': '1'})
+_C32_DIGITS = re.compile('[0-9A-HJKMNP-TV-Z]*')
+# c32 digits <-> the digits int(text, 32) reads, and RFC 4648 base32 -> c32,
+# so encoding and decoding run in C instead of a loop per character.
+_C32_TO_INT_DIGITS = str.maketrans(C32_ALPHABET, '0123456789abcdefghijklmnopqrstuv')
+_BASE32_TO_C32 = bytes.maketrans(b'ABCDEFGHIJKLMNOPQRSTUVWXYZ234567', C32_ALPHABET.encode())
+
+# Address versions
+MAINNET_SINGLESIG = 22  # SP
+MAINNET_MULTISIG = 20   # SM
+TESTNET_SINGLESIG = 26  # ST
+TESTNET_MULTISIG = 21   # SN
+
+# 1 version byte + 20 byte hash160
+PRINCIPAL_SIZE = 21
+
+CONTRACT_NAME_RE = re.compile(r'^[a-zA-Z][a-zA-Z0-9_-]{0,127}$')
+
+
+class InvalidPrincipal(ValueError):
+    pass
+
+
+def c32_encode(data):
+    """c32 encoding of bytes, one leading '0' per leading zero byte (as in c32check)."""
+    zeros = len(data) - len(data.lstrip(b'\0'))
+    # base32 of the bytes left-padded to a multiple of 5 is the base-32 number, with leading zero digits
+    padded = b'\0' * (-len(data) % 5) + data
+    digits = base64.b32encode(padded).translate(_BASE32_TO_C32).lstrip(b'0').decode('ascii')
+    return '0' * zeros + digits
+
+
+def c32_decode(text):
+    """Inverse of c32_encode. Raises InvalidPrincipal on characters outside the alphabet."""
+    text = text.upper().translate(_C32_NORMALIZE)
+    if not _C32_DIGITS.fullmatch(text):
+        bad = next(c for c in text if c not in _C32_INDEX)
+        raise InvalidPrincipal(f"Invalid c32 character {bad!r}")
+    zeros = len(text) - len(text.lstrip('0'))
+    n = int(text.translate(_C32_TO_INT_DIGITS), 32) if text else 0
+    return b'\0' * zeros + n.to_bytes((n.bit_length() + 7) // 8, 'big')
+
+
+def _checksum(raw):
+    return hashlib.sha256(hashlib.sha256(raw).digest()).digest()[:4]
+
+
+def decode_address(address):
+    """
+    Decodes a standard principal (e.g. 'SP2MYQF3...') to its 21 byte form.
+
+    Args:
+        address: c32check address string.
+
+    Returns:
+        bytes: version byte followed by the 20 byte hash160.
+
+    Raises:
+        InvalidPrincipal: Bad prefix, length, character or checksum.
+    """
+    if len(address) < 3 or address[0] not in 'Ss':
+        raise InvalidPrincipal(f"Not a Stacks address: {address!r}")
+    version = _C32_INDEX.get(address[1].upper().translate(_C32_NORMALIZE))
+    if version is None:
+        raise InvalidPrincipal(f"Invalid address version in {address!r}")
+    payload = c32_decode(address[2:])
+    if len(payload) != PRINCIPAL_SIZE - 1 + 4:
+        raise InvalidPrincipal(f"Invalid address length: {address!r}")
+    raw = bytes([version]) + payload[:-4]
+    if _checksum(raw) != payload[-4:]:
+        raise InvalidPrincipal(f"Invalid address checksum: {address!r}")
+    return raw
+
+
+def encode_address(raw):
+    """Inverse of decode_address()."""
+    if len(raw) != PRINCIPAL_SIZE:
+        raise InvalidPrincipal(f"A principal is {PRINCIPAL_SIZE} bytes, got {len(raw)}")
+    return 'S' + C32_ALPHABET[raw[0]] + c32_encode(raw[1:] + _checksum(raw))
+
+
+class Principal:
+    """
+    A Stacks principal kept as 21 bytes (version + hash160) plus the contract
+    name for contract principals ('SP....marketplace-v4').
+
+    Instances are immutable and compare and hash on their binary form. Use
+    Principal.parse() to get the interned instance for a string.
+    """
+
+    __slots__ = ('raw', 'contract', '_text')
+
+    def __init__(self, raw, contract=None, _text=None):
+        if len(raw) != PRINCIPAL_SIZE:
+            raise InvalidPrincipal(f"A principal is {PRINCIPAL_SIZE} bytes, got {len(raw)}")
+        self.raw = bytes(raw)
+        self.contract = contract
+        self._text = _text
+
+    @classmethod
+    def parse(cls, text):
+        """Interned, validated Principal for a string. Raises InvalidPrincipal."""
+        return intern_principal(text)
+
+    @property
+    def version(self):
+        return self.raw[0]
+
+    @property
+    def hash160(self):
+        return self.raw[1:]
+
+    @property
+    def is_contract(self):
+        return self.contract is not None
+
+    @property
+    def key(self):
+        """Binary sort/dedup key: raw bytes, plus the contract name if any."""
+        if self.contract is None:
+            return self.raw
+        return self.raw + b'.' + self.contract.encode('ascii')
+
+    def __str__(self):
+        if self._text is None:
+            text = encode_address(self.raw)
+            if self.contract is not None:
+                text = f"{text}.{self.contract}"
+            self._text = text
+        return self._text
+
+    def __repr__(self):
+        return f"Principal('{self}')"
+
+    def __eq__(self, other):
+        if not isinstance(other, Principal):
+            return NotImplemented
+        return self.raw == other.raw and self.contract == other.contract
+
+    def __lt__(self, other):
+        return self.key < other.key
+
+    def __hash__(self):
+        return hash((self.raw, self.contract))
+
+
+def _parse(text):
+    address, dot, contract = text.strip().partition('.')
+    if dot and not CONTRACT_NAME_RE.match(contract):
+        raise InvalidPrincipal(f"Invalid contract name in {text!r}")
+    raw = decode_address(address)
+    # The canonical spelling is the input one upper-cased with the look-alike
+    # letters mapped ('o' -> '0'): decode_address() accepted every digit of
+    # it, so encoding raw again would give the same text.
+    canonical = address.upper().translate(_C32_NORMALIZE)
+    return Principal(raw, contract if dot else None, f"{canonical}.{contract}" if dot else canonical)
+
+
+# Interning table: canonical spelling -> the one Principal for it. Other
+# spellings ('sp2myqf3...') are parsed again on every call instead of
+# taking an entry each, and the table starts over once it holds
+# MAX_INTERNED principals, so a long run does not keep every address it
+# ever read.
+MAX_INTERNED = 1_000_000
+_interned = {}
+
+
+def intern_principal(text):
+    """
+    Returns the shared Principal instance for text, validating it once.
+
+    Raises:
+        InvalidPrincipal
+    """
+    principal = _interned.get(text)
+    if principal is None:
+        principal = _parse(text)
+        canonical = str(principal)
+        shared = _interned.get(canonical)
+        if shared is not None:
+            return shared
+        if len(_interned) >= MAX_INTERNED:
+            _interned.clear()
+        _interned[canonical] = principal
+    return principal
+
+
+def clear_interned():
+    """Drops the interning table (e.g. between two unrelated collections)."""
+    _interned.clear()
+
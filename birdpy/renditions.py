@@ -0,0 +1,208 @@
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+try:
+    from PIL import Image, ImageSequence
+except ImportError:  # rendering needs Pillow; plain fan_out() does not
+    Image = None
+
+from birdpy.assets import AssetStore
+from birdpy.fanout import _scan, fan_out
+
+# Rendered files, named <source digest>.<profile key>.webp. Shared by every
+# profile and every run; a changed source or profile simply gets a new name.
+CACHE_NAME = '.render-cache'
+
+
+class Profile:
+    """
+    One output rendition of a source image.
+
+    Args:
+        name: Output subfolder, e.g. 'thumbnail'.
+        max_size: Longest side in pixels, or None to keep the source size.
+        quality: WebP quality (0-100).
+        lossless: Encode losslessly instead.
+        method: WebP encoder effort (0 fast - 6 small).
+    """
+
+    def __init__(self, name, max_size=None, quality=85, lossless=False, method=4):
+        self.name = name
+        self.max_size = max_size
+        self.quality = quality
+        self.lossless = lossless
+        self.method = method
+
+    @property
+    def key(self):
+        """Identifies the rendering settings in cache file names."""
+        size = self.max_size or 'full'
+        return f"{size}-{'ll' if self.lossless else 'q'}{self.quality}-m{self.method}"
+
+    def __repr__(self):
+        return f"Profile({self.name!r}, max_size={self.max_size}, quality={self.quality})"
+
+
+DEFAULT_PROFILES = (
+    Profile('web', None, 85),
+    Profile('preview', 640, 82),
+    Profile('thumbnail', 256, 80),
+)
+
+
+def default_render_workers():
+    """Encoding is CPU bound: one process per core."""
+    return os.cpu_count() or 1
+
+
+def cache_name(digest, profile):
+    return f"{digest}.{profile.key}.webp"
+
+
+def _resize(frame, max_size):
+    if max_size and max(frame.size) > max_size:
+        frame = frame.copy()
+        frame.thumbnail((max_size, max_size), Image.LANCZOS)
+    return frame
+
+
+def render(src, dst, profile):
+    """
+    Writes one rendition of src to dst (through a temp file and a rename).
+    Animated images keep all their frames.
+
+    Returns:
+        int: Size of the written file.
+    """
+    if Image is None:
+        raise RuntimeError("Pillow is required to render images")
+    tmp = f"{dst}.tmp-{os.getpid()}"
+    options = {'quality': profile.quality, 'lossless': profile.lossless, 'method': profile.method}
+    with Image.open(src) as img:
+        if getattr(img, 'is_animated', False):
+            frames = [_resize(frame.convert('RGBA'), profile.max_size) for frame in ImageSequence.Iterator(img)]
+            frames[0].save(tmp, 'WEBP', save_all=True, append_images=frames[1:],
+                           duration=img.info.get('duration', 100), loop=img.info.get('loop', 0), **options)
+        else:
+            img.draft(img.mode, (profile.max_size, profile.max_size) if profile.max_size else img.size)
+            _resize(img, profile.max_size).save(tmp, 'WEBP', **options)
+    os.replace(tmp, dst)
+    return os.path.getsize(dst)
+
+
+class RenderResult:
+    """Summary of a render_fan_out() run."""
+
+    def __init__(self):
+        self.sources = 0
+        self.rendered = 0
+        self.cached = 0
+        self.errors = []       # (source name, profile name, error message)
+        self.fan_out = {}      # profile name -> FanOutResult
+
+    @property
+    def ok(self):
+        return not self.errors and all(result.ok for result in self.fan_out.values())
+
+    def __repr__(self):
+        return (f"RenderResult(sources={self.sources}, rendered={self.rendered}, cached={self.cached}, "
+                f"errors={len(self.errors)})")
+
+
+def render_sources(sources, profiles, cache_dir, store=None, workers=None, result=None):
+    """
+    Renders every distinct source once per profile into cache_dir.
+
+    Sources with the same content share their renditions, and renditions
+    already in the cache are not rendered again.
+
+    Args:
+        sources: dict source name -> path.
+        profiles: Iterable of Profile.
+        cache_dir: Render cache folder (created if missing).
+        store: AssetStore used to hash the sources.
+        workers: Process pool size, default_render_workers() if omitted.
+        result: RenderResult to fill in.
+
+    Returns:
+        dict: (source name, profile name) -> cache file name, for every
+        rendition that exists after the run.
+    """
+    if store is None:
+        store = AssetStore()
+    if result is None:
+        result = RenderResult()
+    os.makedirs(cache_dir, exist_ok=True)
+    cached = _scan(cache_dir)
+
+    digests = {name: store.add(path) for name, path in sources.items()}
+    jobs = {}  # cache file name -> (source path, profile, source names)
+    for name, digest in digests.items():
+        for profile in profiles:
+            target = cache_name(digest, profile)
+            job = jobs.setdefault(target, (sources[name], profile, []))
+            job[2].append(name)
+    result.sources = len(set(digests.values()))
+
+    todo = [target for target in jobs if target not in cached]
+    result.cached += len(jobs) - len(todo)
+    failed = set()
+    if todo:
+        with ProcessPoolExecutor(max_workers=min(workers or default_render_workers(), len(todo))) as pool:
+            futures = {pool.submit(render, jobs[target][0], os.path.join(cache_dir, target), jobs[target][1]): target
+                       for target in todo}
+            for future in as_completed(futures):
+                target = futures[future]
+                try:
+                    future.result()
+                except Exception as e:
+                    failed.add(target)
+                    _, profile, names = jobs[target]
+                    result.errors.extend((name, profile.name, str(e)) for name in names)
+                else:
+                    result.rendered += 1
+
+    return {(name, profile.name): target
+            for target, (_, profile, names) in jobs.items() if target not in failed
+            for name in names}
+
+
+def render_fan_out(plan, src_dir, output_dir, profiles=DEFAULT_PROFILES, cache_dir=None, workers=None):
+    """
+    Pipeline stage after fan_out(): renders each distinct source once per
+    profile and links the result to every token that uses that source.
+
+    Work is proportional to the distinct sources (7 rarity stones, 111
+    cards), not to the tokens: renditions land in a content-addressed cache
+    and output_dir/<profile name>/<destination name>.webp is materialized
+    from it with fan_out(), so tokens sharing a source share the rendered file.
+
+    Args:
+        plan: Iterable of (source file name, destination file name) pairs,
+            as given to fan_out().
+        src_dir: Folder holding the source files.
+        output_dir: Gets one subfolder per profile.
+        profiles: Iterable of Profile.
+        cache_dir: Render cache, output_dir/.render-cache if omitted.
+        workers: Render process pool size.
+
+    Returns:
+        RenderResult
+    """
+    if cache_dir is None:
+        cache_dir = os.path.join(output_dir, CACHE_NAME)
+    plan = list(plan)
+    profiles = list(profiles)
+    available = _scan(src_dir)
+    sources = {src: available[src].path for src in {src for src, _ in plan} if src in available}
+
+    result = RenderResult()
+    store = AssetStore()
+    renditions = render_sources(sources, profiles, cache_dir, store=store, workers=workers, result=result)
+
+    for profile in profiles:
+        profile_plan = ((renditions.get((src, profile.name), src), os.path.splitext(dst)[0] + '.webp')
+                        for src, dst in plan if src not in sources or (src, profile.name) in renditions)
+        result.fan_out[profile.name] = fan_out(profile_plan, cache_dir, os.path.join(output_dir, profile.name),
+                                               store=store)
+    return result
@@ -0,0 +1,404 @@
+import csv
+import hashlib
+import json
+import os
+import re
+import struct
+from datetime import datetime, timezone
+
+from birdpy import fastcsv
+from birdpy.atomic import atomic_open
+from birdpy.dropgen import Budget, plan_contracts, write_contracts, write_drop_lines
+from birdpy.principal import PRINCIPAL_SIZE, InvalidPrincipal, Principal, intern_principal
+
+# Snapshot file: MAGIC, uint32 record count, then records sorted by key:
+# uint8 key length, key (Principal.key: 21 bytes + '.contract' if any), uint32 count.
+MAGIC = b'BHS1'
+_HEADER = struct.Struct('<4sI')
+_COUNT = struct.Struct('<I')
+
+MANIFEST_NAME = 'store.json'
+ISSUED_NAME = 'issued.bin'
+
+# A line of clarCodeTrait.csv / nftdrop.clar: (stones u174 'SP13J4...)
+DROP_LINE_RE = re.compile(r"\((\S+) u(\d+) '([^)\s]+)\)")
+
+
+def principal_of_key(key):
+    """Inverse of Principal.key."""
+    key = bytes(key)
+    contract = key[PRINCIPAL_SIZE + 1:].decode('ascii') if len(key) > PRINCIPAL_SIZE else None
+    return Principal(key[:PRINCIPAL_SIZE], contract)
+
+
+def write_snapshot(path, records):
+    """
+    Writes (key, count) records, which must be sorted by key and unique.
+
+    Returns:
+        int: Number of records.
+    """
+    records = list(records)
+    with atomic_open(path, 'wb') as f:
+        f.write(_HEADER.pack(MAGIC, len(records)))
+        previous = None
+        for key, count in records:
+            if previous is not None and key <= previous:
+                raise ValueError("Snapshot records must be sorted by key and unique")
+            f.write(bytes((len(key),)) + key + _COUNT.pack(count))
+            previous = key
+    return len(records)
+
+
+def read_snapshot(path):
+    """Yields the (key, count) records of a snapshot file, in key order."""
+    with open(path, 'rb') as f:
+        data = f.read()
+    magic, total = _HEADER.unpack_from(data)
+    if magic != MAGIC:
+        raise ValueError(f"{path} is not a holder snapshot")
+    offset = _HEADER.size
+    for _ in range(total):
+        length = data[offset]
+        key = data[offset + 1:offset + 1 + length]
+        (count,) = _COUNT.unpack_from(data, offset + 1 + length)
+        offset += 1 + length + _COUNT.size
+        yield key, count
+
+
+def holder_counts(path, column=0, rejected=None):
+    """
+    Reads a holder or mint export into sorted (key, rows) records: one
+    record per principal with the number of rows (mints) it has.
+
+    Args:
+        path: CSV without header, address in column.
+        column: Address column.
+        rejected: Optional list receiving (row number, text, error) for
+            invalid addresses; without it they raise InvalidPrincipal.
+    """
+    scan = fastcsv.scan_column(path, column)
+    if scan is not None:
+        counts = {}
+        try:
+            for value, n, line in scan:
+                try:
+                    key = intern_principal(value.rstrip(';')).key
+                except InvalidPrincipal as e:
+                    raise InvalidPrincipal(f"Row {line}: {e}") from None
+                counts[key] = counts.get(key, 0) + n
+        except InvalidPrincipal:
+            if rejected is None:
+                raise
+        else:
+            return sorted(counts.items())
+
+    counts = {}
+    with open(path, 'r', newline='', encoding='utf-8') as f:
+        for number, row in enumerate(csv.reader(f), 1):
+            if not row or not row[column].strip():
+                continue
+            try:
+                key = intern_principal(row[column].rstrip(';')).key
+            except InvalidPrincipal as e:
+                if rejected is None:
+                    raise InvalidPrincipal(f"Row {number}: {e}") from None
+                rejected.append((number, row[column], str(e)))
+                continue
+            counts[key] = counts.get(key, 0) + 1
+    return sorted(counts.items())
+
+
+def merge_diff(old, new):
+    """
+    Walks two key-sorted record streams once, in O(n + m).
+
+    Yields:
+        (key, old count, new count) for every key whose count differs; a
+        missing side counts as 0.
+    """
+    old = iter(old)
+    new = iter(new)
+    a = next(old, None)
+    b = next(new, None)
+    while a is not None or b is not None:
+        if b is None or (a is not None and a[0] < b[0]):
+            yield a[0], a[1], 0
+            a = next(old, None)
+        elif a is None or b[0] < a[0]:
+            yield b[0], 0, b[1]
+            b = next(new, None)
+        else:
+            if a[1] != b[1]:
+                yield a[0], a[1], b[1]
+            a = next(old, None)
+            b = next(new, None)
+
+
+def merge_add(records, delta):
+    """Key-sorted sum of two key-sorted record streams."""
+    result = []
+    records = iter(records)
+    delta = iter(delta)
+    a = next(records, None)
+    b = next(delta, None)
+    while a is not None or b is not None:
+        if b is None or (a is not None and a[0] < b[0]):
+            result.append(a)
+            a = next(records, None)
+        elif a is None or b[0] < a[0]:
+            result.append(b)
+            b = next(delta, None)
+        else:
+            result.append((a[0], a[1] + b[1]))
+            a = next(records, None)
+            b = next(delta, None)
+    return result
+
+
+class DiffSummary:
+    """Holders that appeared, left or changed their count between two snapshots."""
+
+    def __init__(self, changes=()):
+        self.added = []    # (principal, count)
+        self.removed = []  # (principal, previous count)
+        self.changed = []  # (principal, previous count, count)
+        for key, old_count, new_count in changes:
+            principal = str(principal_of_key(key))
+            if not old_count:
+                self.added.append((principal, new_count))
+            elif not new_count:
+                self.removed.append((principal, old_count))
+            else:
+                self.changed.append((principal, old_count, new_count))
+
+    def to_dict(self):
+        return {"added": self.added, "removed": self.removed, "changed": self.changed}
+
+
+def owed(issued, current, mode='holder'):
+    """
+    Drops still owed, from one merge over the issued ledger and a snapshot.
+
+    Args:
+        issued: Key-sorted (key, drops already issued) records.
+        current: Key-sorted (key, rows in the export) records.
+        mode: 'holder' for one drop per holder ever, 'units' for one drop
+            per row (e.g. per mint) the holder has.
+
+    Yields:
+        (key, drops owed), in key order.
+    """
+    if mode not in ('holder', 'units'):
+        raise ValueError(f"Unknown mode: {mode}")
+    for key, done, count in merge_diff(issued, current):
+        entitled = min(count, 1) if mode == 'holder' else count
+        if entitled > done:
+            yield key, entitled - done
+
+
+class HolderStore:
+    """
+    Versioned holder snapshots plus a ledger of every drop issued.
+
+    Layout of the folder:
+        store.json     snapshots, drops, the next token id and the ledger file
+        NNNN.bin       one snapshot per imported export (sorted binary records)
+        issued-NNN.bin drops issued up to drop NNN per principal (same format)
+
+    A new export becomes a snapshot (skipped when identical to the last
+    one), and drop() writes contracts only for what the ledger says is
+    still owed, with ids continuing from the last issued id. The ledger is
+    updated in the same call, so running it twice never drops twice.
+
+    Saving store.json is what records a drop: the new ledger is written
+    under a new name first and only becomes the ledger once store.json
+    names it, so the ledger, the drops and the next id always agree.
+
+    Args:
+        folder: Store folder (created if missing).
+    """
+
+    def __init__(self, folder):
+        self.folder = folder
+        os.makedirs(folder, exist_ok=True)
+        self.manifest_path = os.path.join(folder, MANIFEST_NAME)
+        try:
+            with open(self.manifest_path, 'r', encoding='utf-8') as f:
+                self.manifest = json.load(f)
+        except FileNotFoundError:
+            self.manifest = {"snapshots": [], "drops": [], "next_id": None}
+
+    def _save(self):
+        with atomic_open(self.manifest_path, 'w', encoding='utf-8') as f:
+            json.dump(self.manifest, f, indent=2)
+
+    @property
+    def issued_path(self):
+        # stores from before the versioned ledger have a single issued.bin
+        return os.path.join(self.folder, self.manifest.get("issued", ISSUED_NAME))
+
+    @property
+    def next_id(self):
+        return self.manifest["next_id"]
+
+    @property
+    def snapshots(self):
+        return self.manifest["snapshots"]
+
+    @property
+    def drops(self):
+        return self.manifest["drops"]
+
+    def snapshot_path(self, number):
+        return os.path.join(self.folder, f"{number:04d}.bin")
+
+    def read(self, number=None):
+        """Records of snapshot number (the latest by default)."""
+        if not self.snapshots:
+            raise ValueError(f"No snapshot in {self.folder}")
+        if number is None:
+            number = self.snapshots[-1]["number"]
+        return read_snapshot(self.snapshot_path(number))
+
+    def issued(self):
+        """Key-sorted (key, drops issued) records of the ledger."""
+        if not os.path.exists(self.issued_path):
+            return iter(())
+        return read_snapshot(self.issued_path)
+
+    def add_snapshot(self, export_path, column=0, rejected=None):
+        """
+        Imports a holder/mint export.
+
+        Returns:
+            (snapshot number, DiffSummary against the previous snapshot).
+            The number is the previous one if the export has not changed.
+        """
+        records = holder_counts(export_path, column, rejected)
+        digest = hashlib.sha256(b''.join(bytes((len(k),)) + k + _COUNT.pack(c) for k, c in records)).hexdigest()
+        previous = self.snapshots[-1] if self.snapshots else None
+        if previous and previous["sha256"] == digest:
+            return previous["number"], DiffSummary()
+
+        number = previous["number"] + 1 if previous else 1
+        write_snapshot(self.snapshot_path(number), records)
+        self.snapshots.append({
+            "number": number,
+            "source": os.path.abspath(export_path),
+            "sha256": digest,
+            "holders": len(records),
+            "rows": sum(count for _, count in records),
+            "created": datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        })
+        self._save()
+        diff = DiffSummary(merge_diff(self.read(previous["number"]) if previous else (), records))
+        return number, diff
+
+    def diff(self, old_number, new_number):
+        return DiffSummary(merge_diff(self.read(old_number), self.read(new_number)))
+
+    def import_drop_lines(self, path):
+        """
+        Seeds the ledger from an already issued clarCodeTrait.csv or .clar
+        file, so the next drop skips those holders and continues after its
+        last id.
+
+        Returns:
+            int: Drop lines imported.
+        """
+        delta = {}
+        first_id = last_id = None
+        with open(path, 'r', encoding='utf-8') as f:
+            for line in f:
+                for _, token_id, recipient in DROP_LINE_RE.findall(line):
+                    key = intern_principal(recipient).key
+                    delta[key] = delta.get(key, 0) + 1
+                    token_id = int(token_id)
+                    first_id = token_id if first_id is None else min(first_id, token_id)
+                    last_id = token_id if last_id is None else max(last_id, token_id)
+        if not delta:
+            return 0
+        self._record_drop(sorted(delta.items()), first_id, last_id, {"imported_from": os.path.abspath(path)})
+        return sum(delta.values())
+
+    def _record_drop(self, delta, first_id, last_id, info):
+        previous = self.issued_path
+        name = f"issued-{len(self.drops) + 1:03d}.bin"
+        write_snapshot(os.path.join(self.folder, name), merge_add(list(self.issued()), delta))
+        self.drops.append({"first_id": first_id, "last_id": last_id, "count": sum(c for _, c in delta),
+                           "created": datetime.now(timezone.utc).isoformat(timespec='seconds'), **info})
+        self.manifest["next_id"] = max(last_id + 1, self.next_id or 0)
+        self.manifest["issued"] = name
+        self._save()
+        if os.path.exists(previous) and previous != self.issued_path:
+            os.unlink(previous)
+
+    def pending(self, mode='holder', snapshot=None, include_contracts=False):
+        """
+        Recipient strings owed a drop by the latest (or given) snapshot, one
+        per drop, in key order. Contract principals (marketplace escrows
+        holding listed NFTs) are left out unless include_contracts is set.
+        """
+        recipients = []
+        for key, n in owed(self.issued(), self.read(snapshot), mode):
+            principal = principal_of_key(key)
+            if principal.is_contract and not include_contracts:
+                continue
+            recipients.extend([str(principal)] * n)
+        return recipients
+
+    def drop(self, spec, output_dir, mode='holder', start_id=None, prefix='nftdrop', contract_mode='calls',
+             budget=None, trait_csv_path=None, include_contracts=False, dry_run=False):
+        """
+        Writes the drop contracts for what is still owed and records them.
+
+        Args:
+            spec: DropSpec.
+            output_dir: Folder for the contracts and their manifest.
+            mode: See owed().
+            start_id: First token id; required only for the first drop of
+                a store, afterwards ids continue from the ledger.
+            prefix: Contract file prefix; the drop number is appended.
+            contract_mode: 'calls' or 'map', see plan_contracts().
+            budget: Budget.
+            trait_csv_path: Also write the drop lines in clarCodeTrait.csv form.
+            include_contracts: See pending().
+            dry_run: Plan only, nothing is written or recorded.
+
+        Returns:
+            (contracts, recipients); both empty when nothing is owed.
+        """
+        if start_id is None:
+            start_id = self.next_id
+        elif self.next_id is not None and start_id < self.next_id:
+            raise ValueError(f"Token ids up to u{self.next_id - 1} are already issued")
+        if start_id is None:
+            raise ValueError("First drop of this store: give start_id or import the issued drop lines")
+
+        recipients = self.pending(mode, include_contracts=include_contracts)
+        if not recipients:
+            return [], []
+        contracts = plan_contracts(recipients, start_id, spec, budget or Budget(), contract_mode)
+        if dry_run:
+            return contracts, recipients
+
+        # The files come first and the ledger last. If the process stops in
+        # between, the drop is not recorded, and the next call writes the
+        # same contracts again (same number, ids and recipients) over these.
+        # Deploy the contracts only once drop() has returned.
+        number = len(self.drops) + 1
+        write_contracts(contracts, output_dir, f"{prefix}-{number:03d}")
+        if trait_csv_path:
+            write_drop_lines(trait_csv_path, spec.function, start_id, recipients)
+        delta = {}
+        for recipient in recipients:
+            key = intern_principal(recipient).key
+            delta[key] = delta.get(key, 0) + 1
+        self._record_drop(sorted(delta.items()), start_id, start_id + len(recipients) - 1, {
+            "contract": spec.contract,
+            "function": spec.function,
+            "snapshot": self.snapshots[-1]["number"],
+            "mode": mode,
+        })
+        return contracts, recipients
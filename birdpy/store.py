@@ -0,0 +1,430 @@
+"""
+One SQLite file for the facts the collection scripts otherwise re-parse
+from metadata.csv, newdata.csv, apesnftlist.csv, cardList.csv,
+apes_metadata.json, the holder lists and the clarCodeTrait.csv files.
+
+    with CollectionStore('collection.sqlite') as store:
+        store.import_metadata_csv('stones', 'nftspy/metadata.csv')
+        store.import_cards('apestudio/list/cardList.csv')
+        store.import_nft_list('apes', 'apestudio/list/apesnftlist.csv')
+        store.import_holders('tlb', 'tlbpy/tlbmints.csv')
+        store.import_drop_lines('bananas-birdpy', 'nftdropbananasbirdpy/clarCodeTrait.csv')
+
+        store.trait('stones', 174, 'Rarity')           # 'Epic'
+        store.tokens_with('stones', 'Rarity', 'Epic')  # [3, 17, ...]
+        store.export_apes_json('apes', 'apes_metadata.json')
+
+Tables (STRICT, so a token id is always an integer):
+    tokens   (collection, token_id) -> name, file, card_id
+    traits   (collection, token_id, trait_type) -> value
+    cards    card_id -> name, bitcoin_text, sticker
+    holders  (collection, principal) -> rows, first_row
+    drops    (drop_name, token_id) -> function, recipient
+    assets   (collection, file) -> token_id, size, mtime_ns, digest
+
+indexed on token id, card id, trait value and principal. Every import
+replaces what an earlier import of the same kind stored for the
+collection, in one transaction.
+
+The file is in WAL mode: readers (their own CollectionStore, e.g. with
+readonly=True in another process) keep reading the last committed state
+while a writer imports.
+"""
+import csv
+import json
+import os
+import re
+import sqlite3
+
+from birdpy.assets import file_digest
+from birdpy.atomic import atomic_open
+from birdpy.cards import CARD_COLUMNS, EDITIONS_PER_CARD, metadata_entry, sequence_numbers
+from birdpy.dedup import count_unique, read_column, validated_principals
+from birdpy.dropgen import drop_line
+from birdpy.snapshots import DROP_LINE_RE
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS tokens (
+    collection TEXT NOT NULL,
+    token_id INTEGER NOT NULL,
+    name TEXT,
+    file TEXT,
+    card_id TEXT,
+    PRIMARY KEY (collection, token_id)
+) STRICT;
+CREATE INDEX IF NOT EXISTS tokens_card ON tokens (card_id, collection);
+
+CREATE TABLE IF NOT EXISTS traits (
+    collection TEXT NOT NULL,
+    token_id INTEGER NOT NULL,
+    trait_type TEXT NOT NULL,
+    value TEXT,
+    PRIMARY KEY (collection, token_id, trait_type)
+) STRICT;
+CREATE INDEX IF NOT EXISTS traits_value ON traits (collection, trait_type, value);
+
+CREATE TABLE IF NOT EXISTS cards (
+    card_id TEXT PRIMARY KEY,
+    name TEXT NOT NULL,
+    bitcoin_text TEXT NOT NULL,
+    sticker TEXT NOT NULL
+) STRICT;
+
+CREATE TABLE IF NOT EXISTS holders (
+    collection TEXT NOT NULL,
+    principal TEXT NOT NULL,
+    rows INTEGER NOT NULL,
+    first_row INTEGER NOT NULL,
+    PRIMARY KEY (collection, principal)
+) STRICT;
+CREATE INDEX IF NOT EXISTS holders_principal ON holders (principal);
+
+CREATE TABLE IF NOT EXISTS drops (
+    drop_name TEXT NOT NULL,
+    token_id INTEGER NOT NULL,
+    function TEXT NOT NULL,
+    recipient TEXT NOT NULL,
+    PRIMARY KEY (drop_name, token_id)
+) STRICT;
+CREATE INDEX IF NOT EXISTS drops_recipient ON drops (recipient);
+
+CREATE TABLE IF NOT EXISTS assets (
+    collection TEXT NOT NULL,
+    file TEXT NOT NULL,
+    token_id INTEGER,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    digest TEXT,
+    PRIMARY KEY (collection, file)
+) STRICT;
+CREATE INDEX IF NOT EXISTS assets_token ON assets (collection, token_id);
+"""
+
+# First number in a fan-out file name is its token id: 'Stone 0174 Epic.webp', '0174.webp'
+ASSET_TOKEN_RE = re.compile(r'(\d+)')
+
+# apes_metadata.json attributes that come from the card, not the token row
+_CARD_TRAITS = ('name', 'bitcoinText', 'sticker')
+
+
+def _int(text):
+    text = str(text).strip()
+    return int(text) if text.isdigit() else None
+
+
+class CollectionStore:
+    """
+    SQLite-backed store of tokens, traits, cards, holders, drops and assets.
+
+    One instance is one connection; give every thread or process its own.
+
+    Args:
+        path: Database file (created with the schema if missing).
+        readonly: Open for reading only; never blocks and is never blocked
+            by a writer.
+    """
+
+    def __init__(self, path, readonly=False):
+        self.path = path
+        if readonly:
+            self.db = sqlite3.connect(f"file:{os.path.abspath(path)}?mode=ro", uri=True)
+        else:
+            self.db = sqlite3.connect(path)
+            self.db.execute("PRAGMA journal_mode = WAL")
+            self.db.execute("PRAGMA synchronous = NORMAL")
+            self.db.executescript(SCHEMA)
+        self.db.execute("PRAGMA busy_timeout = 5000")
+
+    def close(self):
+        self.db.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    # --- import --------------------------------------------------------------
+
+    def _replace_traits(self, collection, trait_types, rows):
+        self.db.executemany("DELETE FROM traits WHERE collection = ? AND trait_type = ?",
+                            ((collection, trait_type) for trait_type in trait_types))
+        self.db.executemany("INSERT OR REPLACE INTO traits (collection, token_id, trait_type, value) "
+                            "VALUES (?, ?, ?, ?)", ((collection, *row) for row in rows))
+
+    def _upsert_tokens(self, collection, rows):
+        # rows: (token_id, name, file, card_id); None keeps what an earlier import stored
+        self.db.executemany(
+            "INSERT INTO tokens (collection, token_id, name, file, card_id) VALUES (?, ?, ?, ?, ?) "
+            "ON CONFLICT (collection, token_id) DO UPDATE SET name = coalesce(excluded.name, name), "
+            "file = coalesce(excluded.file, file), card_id = coalesce(excluded.card_id, card_id)",
+            ((collection, *row) for row in rows))
+
+    def import_metadata_csv(self, collection, path):
+        """
+        tokenId,<trait>,... rows (nftspy/metadata.csv): one token per row,
+        every other column a trait.
+
+        Returns:
+            int: Tokens imported.
+        """
+        with open(path, 'r', newline='', encoding='utf-8') as f:
+            reader = csv.DictReader(f)
+            trait_types = [column for column in reader.fieldnames or () if column != 'tokenId']
+            rows = [(token_id, row) for token_id, row in ((_int(row.get('tokenId', '')), row) for row in reader)
+                    if token_id is not None]
+        with self.db:
+            self._upsert_tokens(collection, ((token_id, None, None, None) for token_id, _ in rows))
+            self._replace_traits(collection, trait_types, ((token_id, trait_type, row[trait_type])
+                                                           for token_id, row in rows for trait_type in trait_types
+                                                           if row.get(trait_type) not in (None, '')))
+        return len(rows)
+
+    def import_metadata_folder(self, collection, folder, index_path=None):
+        """The per-token JSON files of an nftspy metadata folder, through its MetadataIndex."""
+        from birdpy.metaindex import MetadataIndex
+
+        with MetadataIndex(folder, index_path) as index:
+            index.refresh()
+            tokens = list(index.tokens())
+        trait_types = {trait_type for _, attributes in tokens for trait_type, _ in attributes}
+        with self.db:
+            self._upsert_tokens(collection, ((token_id, None, None, None) for token_id, _ in tokens))
+            self._replace_traits(collection, trait_types, ((token_id, trait_type, str(value))
+                                                           for token_id, attributes in tokens
+                                                           for trait_type, value in attributes))
+        return len(tokens)
+
+    def import_cards(self, path):
+        """cardList.csv; a card listed more than once keeps its first row, as in CardIndex."""
+        cards = {}
+        with open(path, 'r', newline='', encoding='utf-8') as f:
+            for row in csv.DictReader(f):
+                card_id = row.get('Card Id', '').strip()
+                if card_id:
+                    cards.setdefault(card_id, tuple(row.get(column, '').strip() for column in CARD_COLUMNS))
+        with self.db:
+            self.db.execute("DELETE FROM cards")
+            self.db.executemany("INSERT INTO cards (card_id, name, bitcoin_text, sticker) VALUES (?, ?, ?, ?)",
+                                ((card_id, *fields) for card_id, fields in cards.items()))
+        return len(cards)
+
+    def import_nft_list(self, collection, path):
+        """
+        apesnftlist.csv (or its thin variant): nftId, fileName and cardId
+        go to tokens, the per-token columns (fortune, power, rarity, ...)
+        to traits; the card columns stay in cards.
+        """
+        with open(path, 'r', newline='', encoding='utf-8') as f:
+            reader = csv.DictReader(f)
+            skip = {'nftId', 'fileName', 'cardId', *_CARD_TRAITS}
+            trait_types = [column for column in reader.fieldnames or () if column not in skip]
+            rows = [(token_id, row) for token_id, row in ((_int(row.get('nftId', '')), row) for row in reader)
+                    if token_id is not None]
+        with self.db:
+            self._upsert_tokens(collection, ((token_id, None, row.get('fileName') or f"{token_id:04d}.webp",
+                                              (row.get('cardId') or '').strip() or None) for token_id, row in rows))
+            self._replace_traits(collection, trait_types, ((token_id, trait_type, row[trait_type])
+                                                           for token_id, row in rows for trait_type in trait_types))
+        return len(rows)
+
+    def import_apes_json(self, collection, path, id_trait='nftId'):
+        """apes_metadata.json; the card traits are left to import_cards()."""
+        with open(path, 'r', encoding='utf-8') as f:
+            entries = json.load(f)
+        tokens, traits = [], []
+        trait_types = set()
+        for position, entry in enumerate(entries, 1):
+            meta = entry.get("meta", {})
+            attributes = {a["trait_type"]: a["value"] for a in meta.get("attributes", [])}
+            token_id = _int(attributes.get(id_trait, ''))
+            if token_id is None:
+                token_id = position
+            tokens.append((token_id, meta.get("name"), entry.get("file"), attributes.get('cardId')))
+            for trait_type, value in attributes.items():
+                if trait_type not in (id_trait, 'cardId', *_CARD_TRAITS):
+                    trait_types.add(trait_type)
+                    traits.append((token_id, trait_type, str(value)))
+        with self.db:
+            self._upsert_tokens(collection, tokens)
+            self._replace_traits(collection, trait_types, traits)
+        return len(tokens)
+
+    def import_holders(self, collection, path, column=0, skip_header=False):
+        """
+        A holder list or mint export (tlbhlist.csv, tlbmints.csv,
+        apeslist.csv): one row per principal with its number of rows, in
+        first-seen order. Addresses are validated and stored canonically.
+        """
+        counted = count_unique(validated_principals(read_column(path, column, skip_header)))
+        with self.db:
+            self.db.execute("DELETE FROM holders WHERE collection = ?", (collection,))
+            self.db.executemany("INSERT INTO holders (collection, principal, rows, first_row) VALUES (?, ?, ?, ?)",
+                                ((collection, principal, n, position)
+                                 for position, (principal, n) in enumerate(counted)))
+        return self.db.execute("SELECT count(*) FROM holders WHERE collection = ?", (collection,)).fetchone()[0]
+
+    def import_drop_lines(self, drop_name, path):
+        """A clarCodeTrait.csv or .clar file: one (function uID 'PRINCIPAL) call per drop."""
+        rows = []
+        with open(path, 'r', encoding='utf-8') as f:
+            for line in f:
+                rows.extend((int(token_id), function, recipient)
+                            for function, token_id, recipient in DROP_LINE_RE.findall(line))
+        with self.db:
+            self.db.execute("DELETE FROM drops WHERE drop_name = ?", (drop_name,))
+            self.db.executemany("INSERT OR REPLACE INTO drops (drop_name, token_id, function, recipient) "
+                                "VALUES (?, ?, ?, ?)", ((drop_name, *row) for row in rows))
+        return len(rows)
+
+    def import_assets(self, collection, folder, digests=False):
+        """
+        The files of a fan-out folder (nftspy/nfts, monkeyNfts), with the
+        token id taken from the first number in the name (ASSET_TOKEN_RE).
+
+        Args:
+            digests: Also store the sha256 of every file.
+        """
+        rows = []
+        with os.scandir(folder) as entries:
+            for entry in entries:
+                if entry.name.startswith('.') or not entry.is_file():
+                    continue
+                st = entry.stat()
+                match = ASSET_TOKEN_RE.search(entry.name)
+                rows.append((entry.name, int(match.group(1)) if match else None, st.st_size, st.st_mtime_ns,
+                             file_digest(entry.path) if digests else None))
+        with self.db:
+            self.db.execute("DELETE FROM assets WHERE collection = ?", (collection,))
+            self.db.executemany("INSERT INTO assets (collection, file, token_id, size, mtime_ns, digest) "
+                                "VALUES (?, ?, ?, ?, ?, ?)", ((collection, *row) for row in rows))
+        return len(rows)
+
+    # --- queries -------------------------------------------------------------
+
+    def query(self, sql, *params):
+        """Rows of any SELECT, for the joins the helpers below do not cover."""
+        return self.db.execute(sql, params).fetchall()
+
+    def token(self, collection, token_id):
+        """{'token_id', 'name', 'file', 'card_id', 'traits': {type: value}} or None."""
+        row = self.db.execute("SELECT name, file, card_id FROM tokens WHERE collection = ? AND token_id = ?",
+                              (collection, token_id)).fetchone()
+        if row is None:
+            return None
+        return {"token_id": token_id, "name": row[0], "file": row[1], "card_id": row[2],
+                "traits": self.traits(collection, token_id)}
+
+    def traits(self, collection, token_id):
+        return dict(self.db.execute("SELECT trait_type, value FROM traits WHERE collection = ? AND token_id = ?",
+                                    (collection, token_id)))
+
+    def trait(self, collection, token_id, trait_type):
+        row = self.db.execute("SELECT value FROM traits WHERE collection = ? AND token_id = ? AND trait_type = ?",
+                              (collection, token_id, trait_type)).fetchone()
+        return row[0] if row else None
+
+    def tokens_with(self, collection, trait_type, value):
+        """Token ids whose trait has value, ascending."""
+        return [token_id for (token_id,) in self.db.execute(
+            "SELECT token_id FROM traits WHERE collection = ? AND trait_type = ? AND value = ? ORDER BY token_id",
+            (collection, trait_type, value))]
+
+    def trait_counts(self, collection, trait_type):
+        """{value: tokens}, most common first."""
+        return dict(self.db.execute(
+            "SELECT value, count(*) AS n FROM traits WHERE collection = ? AND trait_type = ? "
+            "GROUP BY value ORDER BY n DESC, value", (collection, trait_type)))
+
+    def card(self, card_id):
+        """{'name', 'bitcoinText', 'sticker'} (the CardIndex fields) or None."""
+        row = self.db.execute("SELECT name, bitcoin_text, sticker FROM cards WHERE card_id = ?",
+                              (str(card_id),)).fetchone()
+        return dict(zip(CARD_COLUMNS.values(), row)) if row else None
+
+    def tokens_of_card(self, collection, card_id):
+        return [token_id for (token_id,) in self.db.execute(
+            "SELECT token_id FROM tokens WHERE card_id = ? AND collection = ? ORDER BY token_id",
+            (str(card_id), collection))]
+
+    def holder_rows(self, collection, principal):
+        """Rows (mints or tokens held) of a principal in the collection's export, 0 if none."""
+        row = self.db.execute("SELECT rows FROM holders WHERE collection = ? AND principal = ?",
+                              (collection, principal)).fetchone()
+        return row[0] if row else 0
+
+    def holders(self, collection):
+        """(principal, rows) in first-seen order."""
+        return self.db.execute("SELECT principal, rows FROM holders WHERE collection = ? ORDER BY first_row",
+                               (collection,)).fetchall()
+
+    def drops_to(self, principal):
+        """(drop name, function, token id) of every drop a principal received."""
+        return self.db.execute("SELECT drop_name, function, token_id FROM drops WHERE recipient = ? "
+                               "ORDER BY drop_name, token_id", (principal,)).fetchall()
+
+    def assets_of(self, collection, token_id):
+        return [file for (file,) in self.db.execute(
+            "SELECT file FROM assets WHERE collection = ? AND token_id = ? ORDER BY file", (collection, token_id))]
+
+    # --- export --------------------------------------------------------------
+
+    def export_metadata_csv(self, collection, path, trait_type='Rarity'):
+        """tokenId,<trait_type> rows ordered by token id (nftspy/metadata.csv)."""
+        rows = self.db.execute("SELECT token_id, value FROM traits WHERE collection = ? AND trait_type = ? "
+                               "ORDER BY token_id", (collection, trait_type))
+        with atomic_open(path, 'w', newline='', encoding='utf-8') as f:
+            writer = csv.writer(f)
+            writer.writerow(["tokenId", trait_type])
+            writer.writerows(rows)
+
+    def export_rarity_csv(self, collection, path, trait_type='Rarity'):
+        """The trait column alone (nftspy/newdata.csv)."""
+        rows = self.db.execute("SELECT value FROM traits WHERE collection = ? AND trait_type = ? "
+                               "ORDER BY token_id", (collection, trait_type))
+        with atomic_open(path, 'w', newline='', encoding='utf-8') as f:
+            writer = csv.writer(f)
+            writer.writerow([trait_type])
+            writer.writerows(rows)
+
+    def export_holders(self, collection, path, with_counts=False):
+        """Unique principals in first-seen order (tlbhlist.csv), optionally with their rows."""
+        with atomic_open(path, 'w', newline='', encoding='utf-8') as f:
+            writer = csv.writer(f)
+            for principal, n in self.holders(collection):
+                writer.writerow([principal, n] if with_counts else [principal])
+
+    def export_drop_lines(self, drop_name, path):
+        """clarCodeTrait.csv: one drop call per line, by token id."""
+        rows = self.db.execute("SELECT function, token_id, recipient FROM drops WHERE drop_name = ? "
+                               "ORDER BY token_id", (drop_name,))
+        with atomic_open(path, 'w', newline='', encoding='utf-8') as f:
+            writer = csv.writer(f)
+            writer.writerows([drop_line(function, token_id, recipient)] for function, token_id, recipient in rows)
+
+    def apes_entries(self, collection, editions=EDITIONS_PER_CARD):
+        """
+        Yields the apes_metadata.json entries of a collection, joining the
+        tokens with their cards in SQL (see cards.build_entries()).
+        Tokens whose card is unknown are left out.
+        """
+        rows = self.db.execute(
+            "SELECT t.token_id, t.file, t.card_id, c.name, c.bitcoin_text, c.sticker FROM tokens t "
+            "LEFT JOIN cards c ON c.card_id = t.card_id WHERE t.collection = ? ORDER BY t.token_id",
+            (collection,)).fetchall()
+        sequence, _ = sequence_numbers([row[2] for row in rows], editions)
+        traits = {}
+        for token_id, trait_type, value in self.db.execute(
+                "SELECT token_id, trait_type, value FROM traits WHERE collection = ?", (collection,)):
+            traits.setdefault(token_id, {})[trait_type] = value
+        for (token_id, file, card_id, *card), number in zip(rows, sequence):
+            if card[0] is None:
+                continue
+            row = {'nftId': str(token_id), 'fileName': file, 'cardId': card_id, **traits.get(token_id, {})}
+            yield metadata_entry(row, dict(zip(CARD_COLUMNS.values(), card)), number)
+
+    def export_apes_json(self, collection, path, compact=False):
+        """apes_metadata.json, written by jsonout.write_stream()."""
+        from birdpy.jsonout import write_stream
+
+        return write_stream(self.apes_entries(collection), path, 'json', compact=compact)
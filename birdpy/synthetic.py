@@ -0,0 +1,157 @@
+"""
+Synthetic collections shaped like the checked-in samples, at any scale.
+
+    root/
+        tlbpy/tlbmints.csv              address,tokenId per mint
+        apespy/apeslist.csv             one holder address per NFT
+        nftspy/metadata/<id>.json       {"tokenId", "name", "attributes"}
+        nftspy/metadata.csv             tokenId,Rarity
+        nftspy/webp/<Rarity>.webp       one source image per rarity
+        apestudio/list/cardList.csv     Card Id,Name,Bitcoin Text,Sticker
+        apestudio/list/apesnftlist.csv  nftId,fileName,cardId,...
+        apestudio/list/monkeyCards/<cardId>.webp
+
+Everything comes from random.Random(seed), so a seed and a scale always
+give the same files.
+"""
+import csv
+import json
+import os
+import random
+import time
+
+try:
+    from PIL import Image
+except ImportError:  # without Pillow the source images are placeholder bytes
+    Image = None
+
+from birdpy.cards import EDITIONS_PER_CARD
+from birdpy.generate import APE_RARITIES, FORTUNES, RARITY_TIERS
+from birdpy.principal import MAINNET_SINGLESIG, encode_address
+
+IMAGE_SIZE = (64, 64)
+
+
+def principals(rnd, count):
+    """count distinct valid mainnet principals."""
+    seen = set()
+    result = []
+    while len(result) < count:
+        raw = bytes((MAINNET_SINGLESIG,)) + rnd.randbytes(20)
+        if raw not in seen:
+            seen.add(raw)
+            result.append(encode_address(raw))
+    return result
+
+
+def _holder_of(rnd, holders):
+    # Skewed towards the front of the list: a few whales, a long tail of small holders
+    return holders[int(len(holders) * rnd.random() ** 3)]
+
+
+def _weighted(rnd, tiers, count):
+    names = [name for name, _ in tiers]
+    weights = [weight for _, weight in tiers]
+    return rnd.choices(names, weights, k=count)
+
+
+def write_image(path, rnd):
+    if Image is None:
+        with open(path, 'wb') as f:
+            f.write(b'RIFF' + rnd.randbytes(2048))
+        return
+    color = tuple(rnd.randrange(256) for _ in range(3))
+    Image.new('RGB', IMAGE_SIZE, color).save(path, 'WEBP', quality=80)
+
+
+def write_mints(path, rnd, rows, holders):
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerows((_holder_of(rnd, holders), token_id) for token_id in range(1, rows + 1))
+
+
+def write_holder_list(path, rnd, rows, holders):
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerows([_holder_of(rnd, holders)] for _ in range(rows))
+
+
+def write_stones(folder, rnd, tokens):
+    """nftspy shape: metadata JSON folder, metadata.csv and one source image per rarity."""
+    metadata = os.path.join(folder, 'metadata')
+    webp = os.path.join(folder, 'webp')
+    os.makedirs(metadata, exist_ok=True)
+    os.makedirs(webp, exist_ok=True)
+    rarities = _weighted(rnd, RARITY_TIERS, tokens)
+    for token_id, rarity in enumerate(rarities, 1):
+        entry = {"tokenId": token_id, "name": f"Stone #{token_id}",
+                 "attributes": [{"trait_type": "Rarity", "value": rarity}]}
+        with open(os.path.join(metadata, f"{token_id}.json"), 'w', encoding='utf-8') as f:
+            json.dump(entry, f)
+    with open(os.path.join(folder, 'metadata.csv'), 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(["tokenId", "Rarity"])
+        writer.writerows(enumerate(rarities, 1))
+    for name, _ in RARITY_TIERS:
+        write_image(os.path.join(webp, f"{name}.webp"), rnd)
+
+
+def write_apes(folder, rnd, tokens):
+    """apestudio/list shape: cardList.csv, apesnftlist.csv and one image per card."""
+    cards = max(1, tokens // EDITIONS_PER_CARD)
+    images = os.path.join(folder, 'monkeyCards')
+    os.makedirs(images, exist_ok=True)
+    card_rows = [(card_id, f"Ape {card_id}", f"Bitcoin text {card_id % 97}", f"Sticker {card_id % 13}")
+                 for card_id in range(1, cards + 1)]
+    with open(os.path.join(folder, 'cardList.csv'), 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(["Card Id", "Name", "Bitcoin Text", "Sticker"])
+        writer.writerows(card_rows)
+    for card_id, *_ in card_rows:
+        write_image(os.path.join(images, f"{card_id}.webp"), rnd)
+
+    card_ids = [card_id for card_id in range(1, cards + 1) for _ in range(EDITIONS_PER_CARD)][:tokens]
+    rnd.shuffle(card_ids)
+    rarities = _weighted(rnd, APE_RARITIES, len(card_ids))
+    fortunes = _weighted(rnd, FORTUNES, len(card_ids))
+    with open(os.path.join(folder, 'apesnftlist.csv'), 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(["nftId", "fileName", "cardId", "name", "bitcoinText", "sticker", "fortune", "power", "rarity"])
+        for nft_id, (card_id, rarity, fortune) in enumerate(zip(card_ids, rarities, fortunes), 1):
+            _, name, text, sticker = card_rows[card_id - 1]
+            writer.writerow([nft_id, f"{nft_id:04d}.webp", card_id, name, text, sticker,
+                             fortune, rnd.randint(1, 10), rarity])
+
+
+def generate_collection(root, scale, seed=0, parts=('holders', 'stones', 'apes')):
+    """
+    Writes a synthetic collection of scale tokens (and scale mint rows) under root.
+
+    Args:
+        root: Output folder, laid out like this repository.
+        scale: Tokens per collection and rows per holder export.
+        seed: Random seed.
+        parts: Which of 'holders', 'stones' and 'apes' to write.
+
+    Returns:
+        dict: part -> seconds it took to write.
+    """
+    rnd = random.Random(seed)
+    timings = {}
+    if 'holders' in parts:
+        start = time.perf_counter()
+        holders = principals(rnd, max(1, scale // 4))
+        os.makedirs(os.path.join(root, 'tlbpy'), exist_ok=True)
+        os.makedirs(os.path.join(root, 'apespy'), exist_ok=True)
+        write_mints(os.path.join(root, 'tlbpy', 'tlbmints.csv'), rnd, scale, holders)
+        write_holder_list(os.path.join(root, 'apespy', 'apeslist.csv'), rnd, scale, holders)
+        timings['holders'] = time.perf_counter() - start
+    if 'stones' in parts:
+        start = time.perf_counter()
+        write_stones(os.path.join(root, 'nftspy'), rnd, scale)
+        timings['stones'] = time.perf_counter() - start
+    if 'apes' in parts:
+        start = time.perf_counter()
+        write_apes(os.path.join(root, 'apestudio', 'list'), rnd, scale)
+        timings['apes'] = time.perf_counter() - start
+    return timings
@@ -0,0 +1,217 @@
+import csv
+import json
+from array import array
+
+try:
+    import numpy as np
+except ImportError:  # NumPy is optional; the pure Python path gives the same answers
+    np = None
+
+from birdpy.atomic import atomic_open
+from birdpy.metaindex import MetadataIndex
+
+MISSING = -1  # code of a token that does not have the trait
+
+
+class TraitColumn:
+    """
+    One dictionary-encoded trait: a code per token plus the distinct values.
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self.values = []  # code -> value
+        self._codes_by_value = {}
+        self.codes = array('i')
+
+    def code_of(self, value):
+        code = self._codes_by_value.get(value)
+        if code is None:
+            code = self._codes_by_value[value] = len(self.values)
+            self.values.append(value)
+        return code
+
+    def lookup(self, value):
+        """Code of an existing value, or None."""
+        return self._codes_by_value.get(value)
+
+    def value_at(self, row):
+        code = self.codes[row]
+        return None if code == MISSING else self.values[code]
+
+
+class TraitTable:
+    """
+    Columnar table of token traits: one TraitColumn per trait_type.
+
+    Build it once with from_metadata_folder() or from_apes_json() and run
+    projections, filters, group-by counts and rarity scores on it. With
+    NumPy installed those run as array operations.
+    """
+
+    def __init__(self):
+        self.token_ids = array('q')
+        self.columns = {}
+
+    def __len__(self):
+        return len(self.token_ids)
+
+    @property
+    def trait_types(self):
+        return list(self.columns)
+
+    def add_token(self, token_id, attributes):
+        """
+        Appends a token.
+
+        Args:
+            token_id: int
+            attributes: Iterable of (trait_type, value). If a trait repeats,
+                the last value wins.
+        """
+        row = len(self.token_ids)
+        self.token_ids.append(token_id)
+        for column in self.columns.values():
+            column.codes.append(MISSING)
+        for trait_type, value in attributes:
+            column = self.columns.get(trait_type)
+            if column is None:
+                column = self.columns[trait_type] = TraitColumn(trait_type)
+                column.codes.extend([MISSING] * (row + 1))
+            column.codes[row] = column.code_of(value)
+
+    @classmethod
+    def from_metadata_folder(cls, folder, index_path=None):
+        """Table of an nftspy metadata folder, read through its MetadataIndex."""
+        table = cls()
+        with MetadataIndex(folder, index_path) as index:
+            index.refresh()
+            for token_id, attributes in index.tokens():
+                table.add_token(token_id, attributes)
+        return table
+
+    @classmethod
+    def from_apes_json(cls, path, id_trait='nftId'):
+        """Table of apes_metadata.json ([{"file", "meta": {"name", "attributes"}}])."""
+        with open(path, 'r', encoding='utf-8') as f:
+            entries = json.load(f)
+        table = cls()
+        for position, entry in enumerate(entries, 1):
+            attributes = [(a["trait_type"], a["value"]) for a in entry.get("meta", {}).get("attributes", [])]
+            ids = [value for trait_type, value in attributes if trait_type == id_trait]
+            token_id = int(ids[0]) if ids and str(ids[0]).isdigit() else position
+            table.add_token(token_id, [(t, v) for t, v in attributes if t != id_trait])
+        return table
+
+    def _codes(self, trait_type):
+        try:
+            codes = self.columns[trait_type].codes
+        except KeyError:
+            raise KeyError(f"Unknown trait_type: {trait_type}") from None
+        return np.frombuffer(codes, dtype=np.int32) if np is not None else codes
+
+    def _take(self, rows):
+        """New table with the given row positions."""
+        table = TraitTable()
+        if np is not None:
+            rows = np.asarray(rows, dtype=np.int64)
+            table.token_ids = array('q', np.frombuffer(self.token_ids, dtype=np.int64)[rows].tobytes())
+        else:
+            table.token_ids = array('q', (self.token_ids[r] for r in rows))
+        for name, column in self.columns.items():
+            new = TraitColumn(name)
+            new.values = column.values
+            new._codes_by_value = column._codes_by_value
+            if np is not None:
+                new.codes = array('i', np.frombuffer(column.codes, dtype=np.int32)[rows].tobytes())
+            else:
+                new.codes = array('i', (column.codes[r] for r in rows))
+            table.columns[name] = new
+        return table
+
+    def where(self, trait_type, values):
+        """
+        Rows whose trait is one of values, e.g. where('Rarity', {'Epic', 'Legendary'}).
+        Use None in values to match tokens that lack the trait.
+        """
+        column = self.columns[trait_type]
+        wanted = {column.lookup(v) if v is not None else MISSING for v in values}
+        wanted.discard(None)
+        codes = self._codes(trait_type)
+        if np is not None:
+            rows = np.nonzero(np.isin(codes, list(wanted)))[0]
+        else:
+            rows = [row for row, code in enumerate(codes) if code in wanted]
+        return self._take(rows)
+
+    def filter(self, **conditions):
+        """where() for several traits at once: filter(Rarity={'Epic'}, Color={'Red'})."""
+        table = self
+        for trait_type, values in conditions.items():
+            table = table.where(trait_type, values)
+        return table
+
+    def counts(self, trait_type):
+        """Group-by count: {value: number of tokens}, most common first. Missing is counted under None."""
+        column = self.columns[trait_type]
+        codes = self._codes(trait_type)
+        if np is not None:
+            totals = np.bincount(codes + 1, minlength=len(column.values) + 1).tolist()
+        else:
+            totals = [0] * (len(column.values) + 1)
+            for code in codes:
+                totals[code + 1] += 1
+        result = {None if code == MISSING else column.values[code]: n
+                  for code, n in zip(range(MISSING, len(column.values)), totals) if n}
+        return dict(sorted(result.items(), key=lambda item: -item[1]))
+
+    def rarity_scores(self, trait_types=None):
+        """
+        Rarity score per token: sum over traits of 1 / (share of tokens with
+        that value). Tokens missing a trait are scored as a "None" value.
+
+        Returns:
+            list of (token id, score), highest score first.
+        """
+        if trait_types is None:
+            trait_types = self.trait_types
+        total = len(self)
+        if total == 0:
+            return []
+        if np is not None:
+            scores = np.zeros(total)
+            for trait_type in trait_types:
+                shifted = self._codes(trait_type) + 1
+                frequency = np.bincount(shifted)
+                scores += total / frequency[shifted]
+            token_ids = np.frombuffer(self.token_ids, dtype=np.int64)
+            order = np.lexsort((token_ids, -scores))
+            return [(int(token_ids[i]), float(scores[i])) for i in order]
+
+        scores = [0.0] * total
+        for trait_type in trait_types:
+            codes = self._codes(trait_type)
+            frequency = {}
+            for code in codes:
+                frequency[code] = frequency.get(code, 0) + 1
+            for row, code in enumerate(codes):
+                scores[row] += total / frequency[code]
+        ranked = sorted(range(total), key=lambda row: (-scores[row], self.token_ids[row]))
+        return [(self.token_ids[row], scores[row]) for row in ranked]
+
+    def rows(self, trait_types=None):
+        """Projection: yields (token id, value, ...) for the given traits (all by default)."""
+        if trait_types is None:
+            trait_types = self.trait_types
+        columns = [self.columns[t] for t in trait_types]
+        for row, token_id in enumerate(self.token_ids):
+            yield (token_id, *(column.value_at(row) for column in columns))
+
+    def to_csv(self, path, trait_types=None):
+        """Writes tokenId plus the given trait columns, ordered as in the table."""
+        if trait_types is None:
+            trait_types = self.trait_types
+        with atomic_open(path, 'w', newline='', encoding='utf-8') as f:
+            writer = csv.writer(f)
+            writer.writerow(["tokenId", *trait_types])
+            writer.writerows(self.rows(trait_types))
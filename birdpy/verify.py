@@ -0,0 +1,220 @@
+"""
+Checks a fan-out folder (nftspy/nfts, apestudio/list/monkeyNfts) against
+the metadata it was built from.
+
+The expected manifest is the fan-out plan itself: (source name,
+destination name) pairs from metadata.csv or apesnftlist.csv. Every
+destination must hold exactly the content of its source:
+
+    missing          expected destination not in the folder
+    extra            file in the folder that no metadata row asks for
+    mismatched       destination content differs from its source
+    stale            destination still holds what the last fan-out wrote
+                     (per its journal), but the source has changed since
+    missing_sources  source named by the metadata that does not exist
+
+Both folders are listed with one os.scandir pass. A destination that is a
+hardlink of its source (what fan_out creates) matches by inode without
+reading it; every other destination is hashed on a thread pool. Digests
+are cached by path, size and mtime in a sidecar file, and each source is
+hashed once however many destinations it has.
+"""
+import os
+import sqlite3
+from concurrent.futures import ThreadPoolExecutor
+
+from birdpy import instrument
+from birdpy.assets import file_digest
+from birdpy.fanout import JOURNAL_NAME, default_workers, read_journal
+
+# Digest cache kept inside the verified folder (dot files are not part of the collection).
+CACHE_NAME = '.verify.sqlite'
+
+
+class VerifyReport:
+    """Outcome of verify(); empty problem lists mean the folder is correct."""
+
+    def __init__(self):
+        self.checked = 0
+        self.matched = 0
+        self.hashed = 0
+        self.missing = []          # (destination name, source name)
+        self.extra = []            # destination name
+        self.mismatched = []       # (destination name, source name)
+        self.stale = []            # (destination name, source name)
+        self.missing_sources = []  # (source name, destinations expecting it)
+
+    @property
+    def ok(self):
+        return not (self.missing or self.extra or self.mismatched or self.stale or self.missing_sources)
+
+    def to_dict(self):
+        return {
+            "ok": self.ok,
+            "checked": self.checked,
+            "matched": self.matched,
+            "hashed": self.hashed,
+            "missing": [{"file": dst, "source": src} for dst, src in self.missing],
+            "extra": [{"file": dst} for dst in self.extra],
+            "mismatched": [{"file": dst, "source": src} for dst, src in self.mismatched],
+            "stale": [{"file": dst, "source": src} for dst, src in self.stale],
+            "missing_sources": [{"source": src, "files": count} for src, count in self.missing_sources],
+        }
+
+    def __repr__(self):
+        return (f"VerifyReport(checked={self.checked}, matched={self.matched}, missing={len(self.missing)}, "
+                f"extra={len(self.extra)}, mismatched={len(self.mismatched)}, stale={len(self.stale)}, "
+                f"missing_sources={len(self.missing_sources)})")
+
+
+class _DigestCache:
+    """path -> (size, mtime_ns, digest), in SQLite; None keeps it in memory only."""
+
+    def __init__(self, path):
+        self.db = sqlite3.connect(path or ':memory:', check_same_thread=False)
+        self.db.execute("CREATE TABLE IF NOT EXISTS files ("
+                        " name TEXT PRIMARY KEY, size INTEGER NOT NULL, mtime_ns INTEGER NOT NULL, digest TEXT NOT NULL)")
+        self.known = {name: (size, mtime_ns, digest)
+                      for name, size, mtime_ns, digest in self.db.execute("SELECT * FROM files")}
+        self.new = []
+
+    def get(self, name, st):
+        entry = self.known.get(name)
+        if entry and entry[0] == st.st_size and entry[1] == st.st_mtime_ns:
+            return entry[2]
+        return None
+
+    def put(self, name, st, digest):
+        self.new.append((name, st.st_size, st.st_mtime_ns, digest))
+
+    def close(self, present):
+        with self.db:
+            self.db.executemany("DELETE FROM files WHERE name = ?", ((name,) for name in self.known if name not in present))
+            self.db.executemany("INSERT OR REPLACE INTO files (name, size, mtime_ns, digest) VALUES (?, ?, ?, ?)",
+                                self.new)
+        self.db.close()
+
+
+def _listing(folder):
+    """One os.scandir pass: file name -> DirEntry, without dot files and fan-out temporaries."""
+    try:
+        with os.scandir(folder) as entries:
+            return {entry.name: entry for entry in entries
+                    if not entry.name.startswith('.') and '.tmp-' not in entry.name and entry.is_file()}
+    except FileNotFoundError:
+        return {}
+
+
+def verify(plan, src_dir, dst_dir, workers=None, cache_path=None, algorithm='sha256'):
+    """
+    Verifies a fan-out folder against its plan.
+
+    Args:
+        plan: Iterable of (source file name, destination file name) pairs,
+            as given to fan_out().
+        src_dir: Folder holding the source files.
+        dst_dir: Folder with the destinations.
+        workers: Hashing threads, fanout.default_workers() if omitted.
+        cache_path: Digest cache, CACHE_NAME inside dst_dir by default;
+            False to hash everything again.
+        algorithm: hashlib algorithm; must match the fan-out journal's
+            (sha256) for stale files to be told apart from mismatched ones.
+
+    Returns:
+        VerifyReport
+    """
+    expected = {}
+    for src_name, dst_name in plan:
+        expected.setdefault(dst_name, src_name)
+    sources = _listing(src_dir)
+    existing = _listing(dst_dir)
+    journal = read_journal(os.path.join(dst_dir, JOURNAL_NAME))
+    if cache_path is None:
+        cache_path = os.path.join(dst_dir, CACHE_NAME) if os.path.isdir(dst_dir) else False
+    cache = _DigestCache(cache_path or None)
+
+    report = VerifyReport()
+    report.extra = sorted(name for name in existing if name not in expected)
+
+    source_stats = {}
+    absent_sources = {}
+    to_hash = {}   # destination name -> stat
+    checks = []    # (destination name, source name, stat) still to decide on content
+    for dst_name, src_name in expected.items():
+        entry = sources.get(src_name)
+        if entry is None:
+            absent_sources[src_name] = absent_sources.get(src_name, 0) + 1
+            continue
+        dst = existing.get(dst_name)
+        if dst is None:
+            report.missing.append((dst_name, src_name))
+            continue
+        report.checked += 1
+        src_stat = source_stats.get(src_name)
+        if src_stat is None:
+            src_stat = source_stats[src_name] = entry.stat()
+        st = dst.stat()
+        if (st.st_dev, st.st_ino) == (src_stat.st_dev, src_stat.st_ino):
+            report.matched += 1  # a hardlink of its source
+            continue
+        if st.st_size != src_stat.st_size and dst_name not in journal:
+            report.mismatched.append((dst_name, src_name))
+            continue
+        if cache.get(dst_name, st) is None:
+            to_hash[dst_name] = st
+        checks.append((dst_name, src_name, st))
+    report.missing_sources = sorted(absent_sources.items())
+
+    # Sources are hashed once each, destinations once per content change
+    needed_sources = sorted({src_name for _, src_name, _ in checks})
+    with ThreadPoolExecutor(max_workers=workers or default_workers()) as pool:
+        source_digests = dict(zip(needed_sources, pool.map(
+            lambda name: file_digest(sources[name].path, algorithm), needed_sources)))
+        # Hardlinks of one file (e.g. of a since replaced source) are read once
+        inodes = {}
+        for name, st in to_hash.items():
+            inodes.setdefault((st.st_dev, st.st_ino, st.st_size, st.st_mtime_ns), []).append(name)
+        groups = list(inodes.values())
+        for names, digest in zip(groups, pool.map(lambda names: file_digest(existing[names[0]].path, algorithm),
+                                                  groups, chunksize=64)):
+            for name in names:
+                st = to_hash[name]
+                cache.put(name, st, digest)
+                cache.known[name] = (st.st_size, st.st_mtime_ns, digest)
+    report.hashed = len(groups) + len(needed_sources)
+
+    for dst_name, src_name, st in checks:
+        digest = cache.get(dst_name, st)
+        if digest == source_digests[src_name]:
+            report.matched += 1
+        elif journal.get(dst_name) == digest:
+            report.stale.append((dst_name, src_name))
+        else:
+            report.mismatched.append((dst_name, src_name))
+    report.missing.sort()
+    report.mismatched.sort()
+    report.stale.sort()
+    cache.close(existing)
+
+    metrics = instrument.get()
+    metrics.count('verify.checked', report.checked)
+    metrics.count('verify.hashed', report.hashed)
+    for problem in ('missing', 'extra', 'mismatched', 'stale', 'missing_sources'):
+        metrics.count('verify.' + problem, len(getattr(report, problem)))
+    return report
+
+
+def format_report(report, limit=10):
+    """A few human readable lines: totals, then up to limit names per kind of problem."""
+    lines = [f"{report.checked} file(s) checked, {report.matched} match, {report.hashed} hashed"]
+    for kind, items in (('missing', report.missing), ('extra', report.extra), ('mismatched', report.mismatched),
+                        ('stale', report.stale), ('missing source', report.missing_sources)):
+        if not items:
+            continue
+        lines.append(f"{len(items)} {kind}:")
+        for item in items[:limit]:
+            lines.append("  " + (item if isinstance(item, str) else f"{item[0]} ({item[1]})"))
+        if len(items) > limit:
+            lines.append(f"  ... and {len(items) - limit} more")
+    lines.append("OK" if report.ok else "FAILED")
+    return "\n".join(lines)
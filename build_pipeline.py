@@ -0,0 +1,85 @@
+"""
+Collection build: the scripts of this repository as pipeline stages.
+
+    birdpy pipeline                      # everything that is out of date
+    birdpy pipeline --stage bananas-drop # one stage and what it needs
+    birdpy pipeline --dry-run
+
+A changed holder list reruns only the stages downstream of it; the image
+fan-out is skipped as long as metadata.csv and nftspy/webp are unchanged, and
+stones-verify checks the fanned-out images whenever they change. Without the
+nftspy/metadata JSON folder there is no stones-metadata stage and
+nftspy/metadata.csv is taken as it is.
+"""
+import os
+import runpy
+
+from birdpy.pipeline import Pipeline, Stage
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+
+def path(*parts):
+    return os.path.join(ROOT, *parts)
+
+
+def script(*parts):
+    """The functions of a script; its work only runs under __main__, so loading it is free of side effects."""
+    return runpy.run_path(path(*parts))
+
+
+def checked(function, failure):
+    """
+    Stage action for a script function that prints its errors and returns
+    whether it succeeded: a falsy result fails the stage, so it is not
+    cached and runs again next time.
+    """
+    def run():
+        if not function():
+            raise RuntimeError(failure)
+    return run
+
+
+def build_pipeline():
+    pipeline = Pipeline(state_path=path('.pipeline.sqlite'))
+
+    pipeline.add(Stage(
+        'tlb-holders',
+        lambda: script('tlbpy', 'list.py')['extrair_enderecos_unicos'](
+            path('tlbpy', 'tlbmints.csv'), path('tlbpy', 'tlbhlist.csv')),
+        inputs=[path('tlbpy', 'tlbmints.csv'), path('tlbpy', 'list.py')],
+        outputs=[path('tlbpy', 'tlbhlist.csv')],
+    ))
+
+    bananas = path('nftdropbananasbirdpy', 'codetrait.py')
+    pipeline.add(Stage(
+        'bananas-drop',
+        checked(lambda: script(bananas)['main_script_runner'](), "drop not generated or holder rows skipped"),
+        inputs=[path('tlbpy', 'tlbhlist.csv'), bananas],
+        outputs=[path('nftdropbananasbirdpy', 'clarCodeTrait.csv'), path('nftdropbananasbirdpy', 'contracts')],
+    ))
+
+    # metadata.csv is built from the metadata JSON folder when there is one;
+    # without it (as in this checkout) the committed metadata.csv is the source
+    if os.path.isdir(path('nftspy', 'metadata')):
+        pipeline.add(Stage(
+            'stones-metadata',
+            checked(lambda: script('nftspy', 'mergedata.py')['json_to_csv'](), "metadata.csv not written"),
+            inputs=[path('nftspy', 'metadata'), path('nftspy', 'mergedata.py')],
+            outputs=[path('nftspy', 'metadata.csv')],
+        ))
+
+    pipeline.add(Stage(
+        'stones-images',
+        checked(lambda: script('nftspy', 'Nfts.py')['processar_csv'](), "fan-out incomplete"),
+        inputs=[path('nftspy', 'metadata.csv'), path('nftspy', 'webp'), path('nftspy', 'Nfts.py')],
+        outputs=[path('nftspy', 'nfts')],
+    ))
+
+    pipeline.add(Stage(
+        'stones-verify',
+        checked(lambda: script('nftspy', 'Nfts.py')['verificar_nfts'](), "nftspy/nfts does not match metadata.csv"),
+        inputs=[path('nftspy', 'metadata.csv'), path('nftspy', 'webp'), path('nftspy', 'nfts')],
+    ))
+
+    return pipeline
@@ -1,16 +1,62 @@
-import csv
-
-start_id = 174
-
-with open('C:\\Users\\jhosephethierry\\Documents\\Bird\\python\\apespy\\apeslisthold.csv', "r") as input_file, open('C:\\Users\\jhosephethierry\\Documents\\Bird\\python-1\\nftdropbananasapespy\\clarCodeTrait.csv', 'w', newline='') as output_file:
-    reader = csv.reader(input_file)
-    writer = csv.writer(output_file)
-    for row in reader:
-        addy = ",".join(row)
-        current_id = f"{start_id:01d}"
-        text = f"(stones u{current_id} '{addy}".rstrip(";")
-        linecodes = ((text) + ")")
-        writer.writerow([linecodes])
-        start_id += 1
-
-print("Processing complete!")
\ No newline at end of file
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from birdpy.dropgen import DropSpec, generate_drop
+from birdpy.dropsim import format_report, simulate
+
+# --- Configuration Constants ---
+# First token id of the drop
+INITIAL_ID = 174
+
+# File paths, relative to this folder (or use: birdpy drop-gen --input ... --output-dir ...)
+FOLDER = os.path.dirname(os.path.abspath(__file__))
+INPUT_CSV_FILE_PATH = os.path.join(os.path.dirname(FOLDER), 'apespy', 'apeslisthold.csv')
+OUTPUT_CSV_FILE_PATH = os.path.join(FOLDER, 'clarCodeTrait.csv')
+CONTRACTS_DIR_PATH = os.path.join(FOLDER, 'contracts')
+
+# NFT contract and private function name used in the drop contracts
+DROP_SPEC = DropSpec("SP3J9CZ0HNRZX7S5YBAFPT3SJ4KP1PBSRVP3TQAT7.stacks-stones", "stones")
+
+# --- Main Execution ---
+
+def main():
+    """
+    Writes clarCodeTrait.csv as before, plus the drop split into contracts that
+    fit the Stacks execution budget and a manifest of their id ranges, then
+    replays the contracts offline.
+
+    Returns:
+        bool: True if the drop was generated, no holder row was skipped and
+        the replay found no problem.
+    """
+    try:
+        contracts, manifest, rejected = generate_drop(
+            INPUT_CSV_FILE_PATH,
+            DROP_SPEC,
+            INITIAL_ID,
+            output_dir=CONTRACTS_DIR_PATH,
+            trait_csv_path=OUTPUT_CSV_FILE_PATH,
+        )
+    except FileNotFoundError:
+        print(f"Error: The input file was not found at '{INPUT_CSV_FILE_PATH}'")
+        return False
+    except Exception as e:
+        print(f"An unexpected error occurred during CSV processing: {e}")
+        return False
+
+    for number, text, error in rejected:
+        print(f"Skipping row {number}: {error}")
+    print(f"{len(contracts)} contract(s) written, manifest: {manifest}")
+
+    # Replay the generated contracts offline: duplicate ids, gaps and cost estimate
+    report = simulate(((f"contract {i}", c.source()) for i, c in enumerate(contracts, 1)), expected_start=INITIAL_ID)
+    print(format_report(report))
+    if not report.ok:
+        print("Error: the generated contracts did not pass the replay")
+        return False
+    print("Processing complete!")
+    return not rejected
+
+if __name__ == "__main__":
+    sys.exit(0 if main() else 1)
@@ -1,58 +1,132 @@
 import csv
+import json
 import os
-import shutil
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from birdpy import instrument
+from birdpy.fanout import fan_out
+from birdpy.renditions import DEFAULT_PROFILES, render_fan_out
+from birdpy.verify import format_report, verify
+
+PASTA_NFTSPY = os.path.dirname(os.path.abspath(__file__))
 
 def processar_csv(
-    caminho_csv = "C:\\Users\\jhosephethierry\\Documents\\Bird\\python-1\\nftspy\\metadata.csv", 
-    pasta_balls = "C:\\Users\\jhosephethierry\\Documents\\Bird\\python-1\\nftspy\\webp", 
-    pasta_nfts = "C:\\Users\\jhosephethierry\\Documents\\Bird\\python-1\\nftspy\\nfts"
+    caminho_csv = os.path.join(PASTA_NFTSPY, "metadata.csv"), 
+    pasta_balls = os.path.join(PASTA_NFTSPY, "webp"), 
+    pasta_nfts = os.path.join(PASTA_NFTSPY, "nfts"),
+    pasta_renders = None,
+    perfis = DEFAULT_PROFILES
     ):
     """
-    Processa um arquivo CSV, copiando arquivos de vídeo com base na raridade.
+    Processa um arquivo CSV, materializando arquivos de vídeo com base na raridade.
+
+    Cada arquivo de origem é lido uma única vez; os destinos viram hardlinks
+    (ou reflinks) do original, com cópia real apenas como último recurso.
+    Destinos que já têm o mesmo conteúdo são pulados, as cópias rodam em um
+    pool de threads e uma execução interrompida continua de onde parou.
 
     Args:
         caminho_csv: Caminho para o arquivo CSV.
         pasta_balls: Caminho para a pasta contendo os vídeos originais.
         pasta_nfts: Caminho para a pasta onde os vídeos serão copiados.
-    """
+        pasta_renders: Se informado, cada arquivo de origem também é
+            renderizado uma vez por perfil (miniatura, prévia, ...) e ligado
+            a todos os tokens em pasta_renders/<perfil>.
+        perfis: Perfis de saída (birdpy.renditions.Profile).
 
-    try:
-        with open(caminho_csv, 'r', encoding='utf-8') as arquivo_csv:  # encoding utf-8 para lidar com caracteres especiais
-            leitor_csv = csv.DictReader(arquivo_csv)
+    Avisos repetidos são contados por categoria (birdpy.instrument); só os
+    primeiros de cada uma são impressos.
+
+    Returns:
+        bool: True se todos os arquivos foram copiados (e renderizados), sem
+        arquivo de origem faltando.
+    """
+    instrumentacao = instrument.get()
 
-            if not os.path.exists(pasta_nfts):
-                os.makedirs(pasta_nfts) # Cria a pasta NFTs caso não exista
+    def plano(leitor_csv):
+        for linha in leitor_csv:
+            token_id = linha.get('tokenId')
+            raridade = linha.get('Rarity')
 
-            for linha in leitor_csv:
-                token_id = linha.get('tokenId')
-                raridade = linha.get('Rarity')
+            if not token_id or not raridade:
+                instrumentacao.warn('linha_incompleta', f"Aviso: Linha com tokenId ou Rarity faltando: {linha}", linha=linha)
+                continue # Pula para a proxima iteração
 
-                if not token_id or not raridade:
-                    print(f"Aviso: Linha com tokenId ou Rarity faltando: {linha}")
-                    continue # Pula para a proxima iteração
+            yield f"{raridade}.webp", f"Stone {token_id.zfill(4)} {raridade}.webp"
 
-                nome_arquivo_origem = f"{raridade}.webp"
-                caminho_origem = os.path.join(pasta_balls, nome_arquivo_origem)
+    try:
+        with instrumentacao.stage('nftspy-fan-out'):
+            with open(caminho_csv, 'r', encoding='utf-8') as arquivo_csv:  # encoding utf-8 para lidar com caracteres especiais
+                itens = list(plano(csv.DictReader(arquivo_csv)))
+            resultado = fan_out(itens, pasta_balls, pasta_nfts)
 
-                if not os.path.exists(caminho_origem):
-                    print(f"Aviso: Arquivo não encontrado: {caminho_origem}")
-                    continue # Pula para a proxima iteração
+        for nome_arquivo_origem, _ in resultado.missing_sources:
+            caminho = os.path.join(pasta_balls, nome_arquivo_origem)
+            instrumentacao.warn('origem_ausente', f"Aviso: Arquivo não encontrado: {caminho}", arquivo=caminho)
+        for nome_arquivo_destino, erro in resultado.errors:
+            instrumentacao.warn('erro_copia', f"Erro ao copiar arquivo {nome_arquivo_destino}: {erro}",
+                                level='error', arquivo=nome_arquivo_destino, erro=erro)
 
-                nome_arquivo_destino = f"Stone {token_id.zfill(4)} {raridade}.webp"
-                caminho_destino = os.path.join(pasta_nfts, nome_arquivo_destino)
+        print(f"Arquivos copiados: {resultado.created}, já atualizados: {resultado.skipped + resultado.resumed}")
+        ok = not (resultado.missing_sources or resultado.errors)
 
-                try:
-                    shutil.copy2(caminho_origem, caminho_destino) # Usando copy2 para preservar metadados
-                    print(f"Arquivo copiado: {nome_arquivo_origem} para {nome_arquivo_destino}")
-                except Exception as e:
-                    print(f"Erro ao copiar arquivo: {e}")
+        if pasta_renders:
+            with instrumentacao.stage('nftspy-render'):
+                renders = render_fan_out(itens, pasta_balls, pasta_renders, perfis)
+            for nome_arquivo_origem, perfil, erro in renders.errors:
+                instrumentacao.warn('erro_render', f"Erro ao renderizar {nome_arquivo_origem} ({perfil}): {erro}",
+                                    level='error', arquivo=nome_arquivo_origem, perfil=perfil, erro=erro)
+            print(f"Renderizações: {renders.rendered} novas, {renders.cached} em cache, "
+                  f"para {renders.sources} arquivos de origem distintos")
+            ok = ok and not renders.errors
 
     except FileNotFoundError:
         print(f"Erro: Arquivo CSV não encontrado: {caminho_csv}")
+        return False
     except csv.Error as e:
         print(f"Erro ao ler CSV: {e}")
+        return False
     except Exception as e:
         print(f"Um erro inesperado ocorreu: {e}")
+        return False
+    return ok
 
+def verificar_nfts(
+    caminho_csv = os.path.join(PASTA_NFTSPY, "metadata.csv"),
+    pasta_balls = os.path.join(PASTA_NFTSPY, "webp"),
+    pasta_nfts = os.path.join(PASTA_NFTSPY, "nfts"),
+    caminho_relatorio = None
+    ):
+    """
+    Confere se pasta_nfts tem exatamente um arquivo por linha do CSV, com o
+    conteúdo do arquivo de origem da sua raridade (birdpy.verify).
+
+    Args:
+        caminho_csv: Caminho para o arquivo CSV.
+        pasta_balls: Caminho para a pasta com os arquivos originais.
+        pasta_nfts: Caminho para a pasta a conferir.
+        caminho_relatorio: Se informado, grava o relatório em JSON.
+
+    Returns:
+        bool: True se não há arquivo faltando, sobrando, diferente ou desatualizado.
+    """
+    with open(caminho_csv, 'r', encoding='utf-8') as arquivo_csv:
+        itens = [(f"{linha['Rarity']}.webp", f"Stone {linha['tokenId'].zfill(4)} {linha['Rarity']}.webp")
+                 for linha in csv.DictReader(arquivo_csv) if linha.get('tokenId') and linha.get('Rarity')]
+    with instrument.get().stage('nftspy-verify'):
+        relatorio = verify(itens, pasta_balls, pasta_nfts)
+    print(format_report(relatorio))
+    if caminho_relatorio:
+        with open(caminho_relatorio, 'w', encoding='utf-8') as arquivo:
+            json.dump(relatorio.to_dict(), arquivo, indent=2)
+    return relatorio.ok
 
-processar_csv()
\ No newline at end of file
+if __name__ == "__main__":
+    if '--verificar' in sys.argv[1:]:
+        ok = verificar_nfts()
+        instrument.get().report()
+        sys.exit(0 if ok else 1)
+    ok = processar_csv()
+    instrument.get().report()
+    sys.exit(0 if ok else 1)
@@ -1,63 +1,51 @@
-import json
-import csv
 import os
+import sys
 
-def json_to_csv(input_folder="C:\\Users\\jhosephethierry\\Documents\\Bird\\python\\nftspy\\metadata", output_file="C:\\Users\\jhosephethierry\\Documents\\Bird\\python\\nftspy\\metadata.csv"):
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from birdpy import instrument
+from birdpy.metaindex import export_rarity
+
+PASTA_NFTSPY = os.path.dirname(os.path.abspath(__file__))
+
+def json_to_csv(input_folder=os.path.join(PASTA_NFTSPY, "metadata"), output_file=os.path.join(PASTA_NFTSPY, "metadata.csv"), newdata_file=None, trait_type="Rarity"):
     """Converte arquivos JSON em um arquivo CSV, extraindo tokenId e Rarity, e ordenando por tokenId.
 
+    Os arquivos passam por um índice incremental (.metaindex.sqlite na pasta):
+    só os JSON alterados desde a última execução são lidos de novo.
+
     Args:
         input_folder: Caminho para a pasta com os arquivos JSON.
         output_file: Nome do arquivo CSV de saída.
-    """
+        newdata_file: Se informado, escreve também o CSV só com Rarity (newdata.csv) na mesma passada.
+        trait_type: Atributo exportado; qualquer trait_type do metadata funciona.
+            Para estatísticas e filtros por vários traits use birdpy.traits.TraitTable.
 
-    data_rows = []  # Lista para armazenar as linhas de dados antes de escrever no CSV
+    Returns:
+        bool: True se o CSV foi gerado.
+    """
 
+    instrumentacao = instrument.get()
     try:
-        for filename in os.listdir(input_folder):
-            if filename.endswith('.json'):
-                file_path = os.path.join(input_folder, filename)
-
-                try:
-                    with open(file_path, 'r', encoding='utf-8') as jsonfile:  # Adicionado encoding UTF-8
-                        data = json.load(jsonfile)
-
-                        # Verifica se "tokenId" existe no JSON
-                        if "tokenId" not in data:
-                            print(f"Aviso: 'tokenId' não encontrado no arquivo: {filename}")
-                            continue
-
-                        for attribute in data.get("attributes", []): # Usando .get para evitar KeyError se "attributes" não existir
-                            if attribute.get("trait_type") == "Rarity": # Usando .get para evitar KeyError se "trait_type" não existir
-                                try:
-                                    token_id = int(data["tokenId"]) # Converte para inteiro para ordenação numérica
-                                    row = [token_id, attribute["value"]] # Inclui o tokenId na linha
-                                    data_rows.append(row)
-                                except ValueError:
-                                    print(f"Aviso: 'tokenId' com valor não numérico no arquivo: {filename}. Valor: {data['tokenId']}")
-                                except KeyError as e:
-                                    print(f"Erro: Chave '{e}' não encontrada em {filename}")
-
-                except json.JSONDecodeError:
-                    print(f"Erro: Arquivo JSON inválido: {filename}")
-                except FileNotFoundError:
-                    print(f"Erro: Arquivo não encontrado: {filename}")
-                except Exception as e:
-                    print(f"Erro ao processar o arquivo {filename}: {e}")
-
-        # Ordena as linhas pelo tokenId (primeiro elemento de cada linha)
-        data_rows.sort(key=lambda x: x[0])
-
-        # Escreve os dados ordenados no arquivo CSV
-        with open(output_file, 'w', newline='', encoding='utf-8') as csvfile: # Adicionado encoding UTF-8
-            writer = csv.writer(csvfile)
-            writer.writerow(["tokenId", "Rarity"])  # Escreve o cabeçalho CORRETO
-            writer.writerows(data_rows)
+        with instrumentacao.stage('nftspy-metadata'):
+            contagens, avisos = export_rarity(input_folder, metadata_csv=output_file, rarity_csv=newdata_file, trait_type=trait_type)
+
+        for nome_arquivo, aviso in avisos:
+            instrumentacao.warn('metadata_invalido', f"Aviso: {nome_arquivo}: {aviso}", arquivo=nome_arquivo, aviso=aviso)
 
+        print(f"Arquivos JSON lidos: {contagens['parsed']}, sem alteração: {contagens['unchanged']}, removidos: {contagens['removed']}")
         print(f"Arquivo CSV '{output_file}' criado com sucesso e ordenado por tokenId.")
+        if newdata_file:
+            print(f"Arquivo CSV '{newdata_file}' criado com sucesso (apenas coluna Rarity, ordenado por tokenId).")
 
     except OSError as e:
         print(f"Erro de sistema operacional: {e}")
+        return False
     except Exception as e:
         print(f"Ocorreu um erro geral: {e}")
+        return False
+    return True
 
-json_to_csv()
\ No newline at end of file
+if __name__ == "__main__":
+    ok = json_to_csv()
+    instrument.get().report()
+    sys.exit(0 if ok else 1)
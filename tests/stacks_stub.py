@@ -0,0 +1,153 @@
+"""
+Local stand-in for the Stacks API endpoints birdpy.fetch uses, serving an
+in-memory chain of mint events and token owners:
+
+    /extended/v1/tokens/nft/mints     newest mint first, limit/offset paging
+    /extended/v1/tokens/nft/history   newest event of one token (its owner)
+    /extended/v1/tokens/nft/holdings  tokens a principal holds, newest first
+    /extended/v1/block                the chain tip
+
+    with StubApi(StubChain(mints=500)) as api:
+        rows = list(Fetcher(api.url).iter_mints(ASSET))
+
+Failures can be injected: `fail` statuses are answered to the next
+requests, one each, and every request after `break_after` gets a 404.
+"""
+import json
+import random
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+from birdpy.synthetic import principals
+
+ASSET = 'SP000000000000000000002Q6VF78.stub-nft::stub'
+
+
+class StubChain:
+    """
+    Mint events (oldest first), and the current owner of every token with
+    the block height it was received at.
+    """
+
+    def __init__(self, mints=0, seed=0):
+        self.random = random.Random(seed)
+        self.addresses = principals(self.random, 50)
+        self.events = []
+        self.owners = {}
+        self.received = {}
+        self.height = 100
+        self.add_mints(mints)
+
+    def add_mints(self, count, per_block=3):
+        for _ in range(count):
+            if len(self.events) % per_block == 0:
+                self.height += 1
+            token_id = len(self.events) + 1
+            recipient = self.random.choice(self.addresses)
+            self.events.append({
+                "event_index": 0,
+                "tx_id": f"0x{token_id:064x}",
+                "block_height": self.height,
+                "recipient": recipient,
+                "value": {"hex": "0x01" + token_id.to_bytes(16, 'big').hex(), "repr": f"u{token_id}"},
+            })
+            self.owners[token_id] = recipient
+            self.received[token_id] = self.height
+
+    def transfer(self, count, to=None):
+        """
+        Moves count random tokens to other holders in a new block; one in
+        ten is burned. With to, they all go to that principal instead.
+        """
+        self.height += 1
+        for _ in range(count):
+            token_id = self.random.randrange(1, len(self.events) + 1)
+            if to is not None:
+                self.owners[token_id] = to
+            else:
+                self.owners[token_id] = None if self.random.random() < 0.1 else self.random.choice(self.addresses)
+            self.received[token_id] = self.height
+
+    def mint_rows(self):
+        """(recipient, token id) per mint, newest first: what iter_mints must return."""
+        return [(event['recipient'], int(event['value']['repr'][1:])) for event in reversed(self.events)]
+
+    def holder_rows(self):
+        """(owner, token id) of every token not burned, in token id order."""
+        return [(owner, token_id) for token_id, owner in sorted(self.owners.items()) if owner is not None]
+
+
+class StubApi:
+    """HTTP server for a StubChain on a free local port."""
+
+    def __init__(self, chain):
+        self.chain = chain
+        self.requests = 0
+        self.fail = []           # statuses answered to the next requests, one each
+        self.break_after = None  # requests answered normally before every further one gets a 404
+        self.lock = threading.Lock()
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), self._handler())
+        self.url = f"http://127.0.0.1:{self.server.server_port}"
+
+    def __enter__(self):
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def _answer(self, path, query):
+        with self.lock:
+            self.requests += 1
+            if self.break_after is not None and self.requests > self.break_after:
+                return 404, {}
+            if self.fail:
+                return self.fail.pop(0), {}
+        chain = self.chain
+        if path == '/extended/v1/tokens/nft/mints':
+            limit, offset = int(query['limit']), int(query['offset'])
+            newest_first = chain.events[::-1]
+            return 200, {"limit": limit, "offset": offset, "total": len(newest_first),
+                         "results": newest_first[offset:offset + limit]}
+        if path == '/extended/v1/tokens/nft/history':
+            token_id = int(query['value'][4:], 16)
+            return 200, {"limit": 1, "offset": 0, "total": 1,
+                         "results": [{"recipient": chain.owners[token_id], "block_height": chain.received[token_id]}]}
+        if path == '/extended/v1/tokens/nft/holdings':
+            limit, offset = int(query['limit']), int(query['offset'])
+            held = sorted((token_id for token_id, owner in chain.owners.items() if owner == query['principal']),
+                          key=lambda token_id: (chain.received[token_id], token_id), reverse=True)
+            return 200, {"limit": limit, "offset": offset, "total": len(held),
+                         "results": [{"asset_identifier": query['asset_identifiers'],
+                                      "value": {"repr": f"u{token_id}"}, "block_height": chain.received[token_id]}
+                                     for token_id in held[offset:offset + limit]]}
+        if path == '/extended/v1/block':
+            return 200, {"results": [{"height": chain.height}]}
+        return 404, {}
+
+    def _handler(self):
+        api = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+            wbufsize = -1  # one write per response: no delayed-ACK stalls on keep-alive connections
+
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                parts = urlsplit(self.path)
+                status, data = api._answer(parts.path, {k: v[0] for k, v in parse_qs(parts.query).items()})
+                body = json.dumps(data).encode()
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                if status == 429:
+                    self.send_header('Retry-After', '0')
+                self.end_headers()
+                self.wfile.write(body)
+                self.wfile.flush()
+
+        return Handler
@@ -0,0 +1,50 @@
+import random
+
+import pytest
+
+from birdpy import allocate, cli
+from birdpy.allocate import Allocation
+from birdpy.synthetic import principals
+
+
+@pytest.fixture
+def mints(tmp_path):
+    holders = principals(random.Random(3), 4)
+    path = tmp_path / 'tlbmints.csv'
+    path.write_text(''.join(f"{holder},{n}\n" for n, holder in enumerate(holders * 3)))
+    return path
+
+
+def test_explicit_zero_options_are_kept(tmp_path, mints, monkeypatch):
+    rules = []
+    real = allocate.allocate_csv
+
+    def spy(input_path, output_path, function, start_id, rule, **kwargs):
+        rules.append(rule)
+        return real(input_path, output_path, function, start_id, rule, **kwargs)
+
+    monkeypatch.setattr(allocate, 'allocate_csv', spy)
+    arguments = ['allocate', '--input', str(mints), '--output', str(tmp_path / 'out.csv'), '--function', 'bananas',
+                 '--start-id', '4']
+    assert cli.main(arguments + ['--minimum', '0', '--cap', '0']) == 0
+    assert (rules[-1].minimum, rules[-1].cap) == (0, 0)
+    assert (tmp_path / 'out.csv').read_text() == ''
+    assert cli.main(arguments + ['--per', '2', '--minimum', '0']) == 0
+    assert (rules[-1].per, rules[-1].minimum) == (2, 0)
+    assert cli.main(arguments + ['--per', '0']) == 2
+
+
+def test_failed_write_keeps_the_previous_lines(tmp_path, monkeypatch):
+    output = tmp_path / 'clarCodeTrait.csv'
+    output.write_text('(bananas u1 \'SP...)\n')
+    allocation = Allocation(['SPA', 'SPB'], [1, 1], [1, 1], [0, 1], 4)
+
+    def lines(self, function):
+        yield '(bananas u4 \'SPA)'
+        raise OSError("disk full")
+
+    monkeypatch.setattr(Allocation, 'lines', lines)
+    with pytest.raises(OSError):
+        allocation.write_lines(str(output), 'bananas')
+    assert output.read_text() == '(bananas u1 \'SP...)\n'
+    assert [path.name for path in tmp_path.iterdir()] == ['clarCodeTrait.csv']
@@ -0,0 +1,62 @@
+import os
+
+import pytest
+
+from birdpy import assets
+from birdpy.assets import AssetStore
+
+
+@pytest.fixture
+def sources(tmp_path):
+    folder = tmp_path / 'webp'
+    folder.mkdir()
+    (folder / 'Common.webp').write_bytes(b'common')
+    (folder / 'Copy of Common.webp').write_bytes(b'common')
+    (folder / 'Rare.webp').write_bytes(b'rare')
+    (tmp_path / 'nfts').mkdir()
+    return folder
+
+
+def test_hardlinks_identical_sources_to_one_file(tmp_path, sources):
+    store = AssetStore()
+    first, second = tmp_path / 'nfts' / '1.webp', tmp_path / 'nfts' / '2.webp'
+    assert store.materialize(str(sources / 'Common.webp'), str(first)) == 'hardlink'
+    assert store.materialize(str(sources / 'Copy of Common.webp'), str(second)) == 'hardlink'
+    assert os.stat(first).st_ino == os.stat(second).st_ino == os.stat(sources / 'Common.webp').st_ino
+    assert store.materialize(str(sources / 'Common.webp'), str(first)) == 'skipped'
+    assert store.stats['hashed'] == 2
+
+
+def test_falls_back_to_a_copy_and_remembers_the_broken_strategies(tmp_path, sources, monkeypatch):
+    calls = []
+
+    def refuse(strategy):
+        def place(*args):
+            calls.append(strategy)
+            raise OSError(18, "Invalid cross-device link")
+        return place
+
+    monkeypatch.setattr(os, 'link', refuse('hardlink'))
+    monkeypatch.setattr(assets, '_reflink', refuse('reflink'))
+    store = AssetStore()
+    for n, name in enumerate(['Common.webp', 'Rare.webp', 'Common.webp'], 1):
+        assert store.materialize(str(sources / name), str(tmp_path / 'nfts' / f'{n}.webp')) == 'copy'
+    assert calls == ['hardlink', 'reflink']  # tried once per destination folder
+    assert (tmp_path / 'nfts' / '2.webp').read_bytes() == b'rare'
+    assert os.stat(tmp_path / 'nfts' / '1.webp').st_ino != os.stat(sources / 'Common.webp').st_ino
+    assert sorted(p.name for p in (tmp_path / 'nfts').iterdir()) == ['1.webp', '2.webp', '3.webp']
+
+
+def test_no_working_strategy_leaves_the_destination_alone(tmp_path, sources, monkeypatch):
+    def refuse(*args):
+        raise OSError(28, "No space left on device")
+
+    monkeypatch.setattr(os, 'link', refuse)
+    monkeypatch.setattr(assets, '_reflink', refuse)
+    monkeypatch.setattr(assets.shutil, 'copy2', refuse)
+    dst = tmp_path / 'nfts' / '1.webp'
+    dst.write_bytes(b'old')
+    with pytest.raises(OSError, match="Could not materialize"):
+        AssetStore().materialize(str(sources / 'Rare.webp'), str(dst))
+    assert dst.read_bytes() == b'old'
+    assert [p.name for p in (tmp_path / 'nfts').iterdir()] == ['1.webp']
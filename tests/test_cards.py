@@ -0,0 +1,17 @@
+from birdpy.cards import BuildReport, CardIndex, build_entries
+
+
+def test_rows_without_an_nft_id_do_not_take_an_edition(tmp_path):
+    cards = tmp_path / 'cardList.csv'
+    cards.write_text("Card Id,Name,Bitcoin Text,Sticker\n7,Satoshi,21M,gold\n")
+    nft_list = tmp_path / 'apesnftlist.csv'
+    nft_list.write_text("nftId,cardId,fortune,power,rarity\n"
+                        "1,7,1B in Bitcoin,3,Common\n"
+                        ",7,1B in Bitcoin,3,Common\n"
+                        "3,7,5B in Bitcoin,4,Rare\n")
+    report = BuildReport()
+    entries = list(build_entries(str(nft_list), CardIndex.from_csv(str(cards)), report, editions=2))
+    assert [entry["meta"]["name"] for entry in entries] == ["Satoshi #1", "Satoshi #2"]
+    assert [entry["file"] for entry in entries] == ["0001.webp", "0003.webp"]
+    assert report.skipped == [(3, "missing nftId or cardId")]
+    assert report.edition_counts == {}
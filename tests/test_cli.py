@@ -0,0 +1,59 @@
+import random
+
+import pytest
+
+from birdpy import cli
+from birdpy.synthetic import principals
+
+A, B = principals(random.Random(1), 2)
+
+
+@pytest.fixture
+def project(tmp_path, monkeypatch):
+    """A mint export in tlbpy/, and a clean working directory and environment."""
+    (tmp_path / 'tlbpy').mkdir()
+    (tmp_path / 'tlbpy' / 'tlbmints.csv').write_text(f"{A},1\n{B},2\n{A},3\n")
+    work = tmp_path / 'work'
+    work.mkdir()
+    monkeypatch.chdir(work)
+    monkeypatch.delenv(cli.CONFIG_ENV, raising=False)
+    return tmp_path
+
+
+def config(path, output, counts='true', folder='tlbpy'):
+    path.write_text(f'[dedup]\ninput = "{folder}/tlbmints.csv"\noutput = "{output}"\ncounts = {counts}\n')
+    return path
+
+
+def test_options_come_from_the_first_config_found(project, monkeypatch):
+    config(project / 'work' / 'birdpy.toml', '../local.csv', folder='../tlbpy')
+    assert cli.main(['dedup']) == 0
+    assert (project / 'local.csv').read_text().splitlines() == [f'{A},2', f'{B},1']
+
+    monkeypatch.setenv(cli.CONFIG_ENV, str(config(project / 'env.toml', 'env.csv', counts='false')))
+    assert cli.main(['dedup']) == 0
+    # relative paths are taken from the config file's folder, not the working directory
+    assert (project / 'env.csv').read_text().splitlines() == [A, B]
+
+    assert cli.main(['--config', str(config(project / 'given.toml', 'given.csv')), 'dedup']) == 0
+    assert (project / 'given.csv').exists()
+
+
+def test_command_line_wins_over_the_config(project):
+    path = config(project / 'birdpy.toml', 'config.csv', counts='false')
+    out = project / 'work' / 'cli.csv'
+    assert cli.main(['--config', str(path), 'dedup', '--output', 'cli.csv', '--counts']) == 0
+    assert out.read_text().splitlines() == [f'{A},2', f'{B},1']
+    assert not (project / 'config.csv').exists()
+
+
+def test_unknown_or_missing_options_are_errors(project, capsys):
+    path = project / 'birdpy.toml'
+    path.write_text('[dedup]\ninput = "tlbpy/tlbmints.csv"\noutptu = "x.csv"\n')
+    with pytest.raises(SystemExit):
+        cli.main(['--config', str(path), 'dedup'])
+    assert "unknown option in config [dedup]: outptu" in capsys.readouterr().err
+    path.write_text('[dedup]\ninput = "tlbpy/tlbmints.csv"\n')
+    with pytest.raises(SystemExit):
+        cli.main(['--config', str(path), 'dedup'])
+    assert "missing --output (on the command line or in the config)" in capsys.readouterr().err
@@ -0,0 +1,39 @@
+import os
+
+from birdpy.csvrewrite import CsvRewriter, KeepValue
+
+LIST = "nftId,fileName,rarity\r\n1,0001.webp,Common\r\n2,0002.webp,Rare\r\n"
+
+
+def keep_unless_rare(value):
+    if value != 'Rare':
+        raise KeepValue(f"{value} stays")
+    return 'Super Rare'
+
+
+def test_nothing_changed_leaves_the_file_alone(tmp_path):
+    path = tmp_path / 'apesnftlist.csv'
+    path.write_bytes(LIST.encode())
+    os.utime(path, ns=(1_000_000_000, 1_000_000_000))
+    before = os.stat(path)
+
+    result = CsvRewriter(str(path)).register('fileName', str.strip).register('rarity', lambda v: v).run()
+    assert (result.rows, result.changed_rows, result.written) == (2, 0, False)
+    after = os.stat(path)
+    assert (after.st_ino, after.st_mtime_ns) == (before.st_ino, before.st_mtime_ns)
+    assert [p.name for p in tmp_path.iterdir()] == ['apesnftlist.csv']
+
+    path.write_bytes(LIST.replace('Rare', 'Epic').encode())
+    result = CsvRewriter(str(path)).register('rarity', keep_unless_rare).run()
+    assert not result.written and result.warnings == [(2, "Common stays"), (3, "Epic stays")]
+
+
+def test_a_change_rewrites_in_place_keeping_line_endings_and_mode(tmp_path):
+    path = tmp_path / 'apesnftlist.csv'
+    path.write_bytes(LIST.encode())
+    os.chmod(path, 0o644)
+    result = CsvRewriter(str(path)).register('rarity', keep_unless_rare).run()
+    assert (result.changed_rows, result.written) == (1, True)
+    assert path.read_bytes() == LIST.replace('Rare', 'Super Rare').encode()
+    assert os.stat(path).st_mode & 0o777 == 0o644
+    assert [p.name for p in tmp_path.iterdir()] == ['apesnftlist.csv']
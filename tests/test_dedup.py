@@ -0,0 +1,56 @@
+import random
+
+import pytest
+
+from birdpy import dedup
+from birdpy.dedup import count_unique, dedup_csv
+
+
+def stream(seed=1, rows=2000, distinct=300):
+    rnd = random.Random(seed)
+    return [f"SP{rnd.randrange(distinct):04d}" if rnd.random() > 0.02 else '' for _ in range(rows)]
+
+
+def first_seen(values):
+    counts = {}
+    for value in values:
+        if value:
+            counts[value] = counts.get(value, 0) + 1
+    return list(counts.items())
+
+
+@pytest.fixture
+def spills(monkeypatch, tmp_path):
+    """The temporary tables count_unique opened; each must be gone once it is done."""
+    opened = []
+
+    class Recorded(dedup._SqliteSeen):
+        def __init__(self, spill_dir=None):
+            super().__init__(spill_dir)
+            opened.append(self.path)
+
+    monkeypatch.setattr(dedup, '_SqliteSeen', Recorded)
+    monkeypatch.setattr(dedup, 'SPILL_BATCH_SIZE', 7)
+    return opened
+
+
+@pytest.mark.parametrize('budget', [1, 50, 299, 300, 10_000])
+def test_spilling_keeps_first_seen_order_and_counts(tmp_path, spills, budget):
+    values = stream()
+    assert list(count_unique(values, memory_budget=budget, spill_dir=str(tmp_path))) == first_seen(values)
+    assert len(spills) == (1 if budget < 300 else 0)
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_dedup_csv_past_the_memory_budget(tmp_path, spills):
+    values = stream(seed=2)
+    source = tmp_path / 'tlbmints.csv'
+    source.write_text("address,tokenId\n" + ''.join(f"{value},{n}\n" for n, value in enumerate(values)))
+    out = tmp_path / 'tlbhlist.csv'
+    expected = [f"{value},{n}" for value, n in first_seen(values)]
+
+    assert dedup_csv(str(source), str(out), with_counts=True, skip_header=True) == len(expected)
+    assert out.read_text().splitlines() == expected and spills == []
+    assert dedup_csv(str(source), str(out), with_counts=True, skip_header=True, memory_budget=20,
+                     spill_dir=str(tmp_path)) == len(expected)
+    assert out.read_text().splitlines() == expected and len(spills) == 1
@@ -0,0 +1,25 @@
+import json
+import random
+
+from birdpy.dropgen import Budget, DropSpec, plan_contracts, write_contracts
+from birdpy.synthetic import principals
+
+SPEC = DropSpec('SP3J9CZ0HNRZX7S5YBAFPT3SJ4KP1PBSRVP3TQAT7.return-to-ape', 'bananas')
+
+
+def test_shrinking_drop_removes_the_old_contracts(tmp_path):
+    recipients = principals(random.Random(1), 400)
+    budget = Budget(max_source_length=4000)
+    (tmp_path / 'notes.clar').write_text(';; kept')
+
+    write_contracts(plan_contracts(recipients, 1, SPEC, budget), str(tmp_path))
+    before = sorted(p.name for p in tmp_path.glob('nftdrop-*.clar'))
+    assert len(before) > 2
+
+    manifest_path = write_contracts(plan_contracts(recipients[:50], 1, SPEC, budget), str(tmp_path))
+    with open(manifest_path) as f:
+        manifest = [entry["file"] for entry in json.load(f)]
+    assert sorted(p.name for p in tmp_path.glob('nftdrop-*.clar')) == manifest
+    assert len(manifest) < len(before)
+    assert (tmp_path / 'notes.clar').exists()
+    assert not list(tmp_path.glob('*.tmp-*'))
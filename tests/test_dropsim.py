@@ -0,0 +1,33 @@
+import json
+import random
+
+from birdpy import cli
+from birdpy.dropgen import Budget, DropSpec, plan_contracts, write_contracts
+from birdpy.synthetic import principals
+
+SPEC = DropSpec('SP3J9CZ0HNRZX7S5YBAFPT3SJ4KP1PBSRVP3TQAT7.return-to-ape', 'bananas')
+
+
+def contracts(tmp_path, start_id=174):
+    recipients = principals(random.Random(2), 120)
+    write_contracts(plan_contracts(recipients, start_id, SPEC, Budget(max_source_length=4000)), str(tmp_path))
+    return sorted(str(path) for path in tmp_path.glob('nftdrop-*.clar'))
+
+
+def test_drop_sim_command(tmp_path, capsys):
+    files = contracts(tmp_path)
+    assert len(files) > 1
+    assert cli.main(['drop-sim', *files, '--expected-start', '174']) == 0
+    assert capsys.readouterr().out.rstrip().endswith('OK')
+
+    assert cli.main(['drop-sim', *files, '--expected-start', '170', '--format', 'json']) == 1
+    report = json.loads(capsys.readouterr().out)
+    assert not report["ok"]
+    assert report["calls"] == 120
+    assert report["gaps"] == [[170, 173]]
+
+
+def test_drop_sim_command_finds_a_reused_id(tmp_path, capsys):
+    files = contracts(tmp_path)
+    assert cli.main(['drop-sim', *files, files[0], '--expected-start', '174']) == 1
+    assert "Duplicate ids" in capsys.readouterr().out
@@ -0,0 +1,64 @@
+import os
+
+import pytest
+
+from birdpy.fanout import JOURNAL_NAME, fan_out, read_journal
+
+
+@pytest.fixture
+def folders(tmp_path):
+    src, dst = tmp_path / 'webp', tmp_path / 'nfts'
+    src.mkdir()
+    for rarity in ('Common', 'Rare', 'Epic'):
+        (src / f'{rarity}.webp').write_bytes(rarity.encode())
+    return src, dst
+
+
+PLAN = [('Common.webp', '1.webp'), ('Rare.webp', '2.webp'), ('Common.webp', '3.webp'), ('Epic.webp', '4.webp')]
+
+
+def test_interrupted_run_resumes_from_the_journal(folders):
+    src, dst = folders
+    plan = [(source, f'{n}.webp') for n, source in enumerate(['Common.webp', 'Rare.webp', 'Epic.webp'] * 6, 1)]
+
+    def interrupted():
+        yield from plan[:12]
+        raise KeyboardInterrupt
+
+    with pytest.raises(KeyboardInterrupt):
+        fan_out(interrupted(), str(src), str(dst), workers=1)
+    journaled = read_journal(str(dst / JOURNAL_NAME))
+    written = {path.name for path in dst.iterdir()} - {JOURNAL_NAME}
+    # only finished writes are journaled; the ones still in flight are checked again
+    assert journaled and set(journaled) <= written <= {name for _, name in plan[:12]}
+
+    result = fan_out(plan, str(src), str(dst), workers=2)
+    assert result.resumed == len(journaled)
+    assert result.skipped == len(written) - len(journaled)
+    assert result.created == len(plan) - len(written)
+    assert sorted(read_journal(str(dst / JOURNAL_NAME))) == sorted(name for _, name in plan)
+    assert fan_out(plan, str(src), str(dst)).resumed == len(plan)
+    assert (dst / '18.webp').read_bytes() == b'Epic'
+
+
+def test_journal_entries_are_redone_when_the_files_changed(folders):
+    src, dst = folders
+    fan_out(PLAN, str(src), str(dst), workers=1)
+    os.unlink(dst / '1.webp')
+    (src / 'Epic.webp').unlink()
+    (src / 'Epic.webp').write_bytes(b'Epic v2')
+    with open(dst / JOURNAL_NAME, 'a', encoding='utf-8') as journal:
+        journal.write('deadbeef\t2.we')  # torn last line
+
+    result = fan_out(PLAN, str(src), str(dst), workers=1)
+    assert (result.resumed, result.created) == (2, 2)
+    assert (dst / '1.webp').read_bytes() == b'Common' and (dst / '4.webp').read_bytes() == b'Epic v2'
+
+
+def test_without_resume_every_destination_is_checked(folders):
+    src, dst = folders
+    fan_out(PLAN, str(src), str(dst), workers=1)
+    result = fan_out(PLAN + [('Ultimate.webp', '5.webp')], str(src), str(dst), workers=1, resume=False)
+    assert (result.resumed, result.skipped, result.created) == (0, 4, 0)
+    assert result.missing_sources == [('Ultimate.webp', '5.webp')] and not result.ok
+    assert len((dst / JOURNAL_NAME).read_text().splitlines()) == 4
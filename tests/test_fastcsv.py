@@ -0,0 +1,83 @@
+import csv
+import random
+
+import pytest
+
+from birdpy import fastcsv
+
+np = pytest.importorskip('numpy')
+
+# Mostly what exports are made of, plus everything the fast path has to refuse
+ALPHABET = ['SP', 'SM', 'A', '7', 'Z', '.', ';', ',', ',', '\n', '\n', '\r\n', '\r', '"', ' ', '\t', '\x0c', 'é']
+
+
+def reference(path, column, skip_header):
+    """(value, count, first line) of the distinct non-empty values, as csv.reader sees the file."""
+    seen = {}
+    rows = []
+    with open(path, 'r', newline='', encoding='utf-8') as f:
+        for line, row in enumerate(csv.reader(f), 1):
+            if skip_header and line == 1:
+                continue
+            if column is None:
+                value = ",".join(row)
+            else:
+                value = row[column] if len(row) > column else ''
+            if not value:
+                continue
+            rows.append(value)
+            count, first = seen.get(value, (0, line))
+            seen[value] = (count + 1, first)
+    return [(value, count, first) for value, (count, first) in seen.items()], rows
+
+
+@pytest.mark.parametrize('seed', range(400))
+def test_scan_column_matches_csv_reader(tmp_path, seed):
+    rnd = random.Random(seed)
+    text = ''.join(rnd.choice(ALPHABET) for _ in range(rnd.randrange(0, 60)))
+    if rnd.random() < 0.5:
+        # a plain file most of the time, so the fast path is exercised and not only refused
+        text = ''.join(part for part in text if part not in ('\r', '"', ' ', '\t', '\x0c', 'é'))
+    path = tmp_path / 'export.csv'
+    path.write_bytes(text.encode('utf-8'))
+    column = rnd.choice([None, 0, 1, 2])
+    skip_header = rnd.random() < 0.3
+
+    scan = fastcsv.scan_column(str(path), column, skip_header, codes=True)
+    if scan is None:
+        return  # left to the csv module
+    expected, rows = reference(str(path), column, skip_header)
+    assert list(scan) == expected, repr(text)
+    assert scan.rows() == rows, repr(text)
+
+
+@pytest.mark.parametrize('text', [b'a', b'a\n', b'SP1,2\n', b'1234567', b'12345678\n'])
+def test_files_shorter_than_a_word(tmp_path, text):
+    path = tmp_path / 'short.csv'
+    path.write_bytes(text)
+    expected, _ = reference(str(path), 0, False)
+    assert list(fastcsv.scan_column(str(path))) == expected
+
+
+def test_lone_cr_is_left_to_the_csv_module(tmp_path):
+    path = tmp_path / 'cr.csv'
+    path.write_bytes(b'SPA\rSPB\n')
+    assert fastcsv.scan_column(str(path)) is None
+
+
+def test_hash_collisions_are_never_merged(tmp_path, monkeypatch):
+    path = tmp_path / 'mints.csv'
+    path.write_bytes(b'SPAAAAAAAAAA,1\nSPAAAAAAAAAB,2\nSPAAAAAAAAAA,3\n')
+    # every row in one hash group
+    monkeypatch.setattr(fastcsv, '_hashes', lambda words, starts, widths: np.zeros(len(widths), dtype=np.uint64))
+    assert fastcsv.scan_column(str(path)) is None
+    path.write_bytes(b'SPAAAAAAAAAA,1\nSPAAAAAAAAAA,3\n')
+    assert list(fastcsv.scan_column(str(path))) == [('SPAAAAAAAAAA', 2, 1)]
+
+
+def test_collisions_across_chunks_are_never_merged(tmp_path, monkeypatch):
+    path = tmp_path / 'mints.csv'
+    path.write_bytes(b'SPAAAAAAAAAA,1\nSPAAAAAAAAAB,2\n')
+    monkeypatch.setattr(fastcsv, 'CHUNK_BYTES', 15)  # one line per chunk
+    monkeypatch.setattr(fastcsv, '_hashes', lambda words, starts, widths: np.zeros(len(widths), dtype=np.uint64))
+    assert fastcsv.scan_column(str(path)) is None
@@ -0,0 +1,119 @@
+import random
+
+import pytest
+
+from birdpy import cli, instrument
+from birdpy.fetch import Fetcher, FetchError
+from birdpy.synthetic import principals
+from tests.stacks_stub import ASSET, StubApi, StubChain
+
+PAGE_SIZE = 10
+
+
+@pytest.fixture
+def metrics():
+    return instrument.configure()
+
+
+@pytest.fixture
+def api():
+    with StubApi(StubChain(mints=237)) as api:
+        yield api
+
+
+def fetcher(api, cache_path=None, **options):
+    return Fetcher(api.url, cache_path=cache_path, page_size=PAGE_SIZE, backoff=0.001, **options)
+
+
+def test_pages_through_all_mints(api, metrics):
+    assert list(fetcher(api).iter_mints(ASSET)) == api.chain.mint_rows()
+    assert api.requests == 24  # 237 events, 10 per page
+    assert metrics.counters.get('fetch.retries', 0) == 0
+
+
+def test_holders_follow_transfers_and_burns(api, metrics):
+    api.chain.transfer(40)
+    assert list(fetcher(api).iter_holders(ASSET)) == api.chain.holder_rows()
+
+
+def test_retries_failed_requests(api, metrics):
+    api.fail = [503, 429, 500]
+    assert list(fetcher(api).iter_mints(ASSET)) == api.chain.mint_rows()
+    assert metrics.counters['fetch.retries'] == 3
+
+
+def test_gives_up_after_the_retries(api, metrics):
+    api.fail = [503] * 3
+    with pytest.raises(FetchError, match="gave up after 3 attempts"):
+        list(fetcher(api, retries=2).iter_mints(ASSET))
+
+
+def test_client_errors_are_not_retried(api, metrics):
+    api.break_after = 0
+    with pytest.raises(FetchError, match="HTTP 404"):
+        list(fetcher(api).iter_mints(ASSET))
+    assert api.requests == 1
+
+
+def test_resnapshot_only_fetches_new_blocks(api, metrics, tmp_path):
+    cache = str(tmp_path / 'fetch.sqlite')
+    list(fetcher(api, cache).iter_mints(ASSET))
+    api.chain.add_mints(4)
+    api.requests = 0
+    assert list(fetcher(api, cache).iter_mints(ASSET)) == api.chain.mint_rows()
+    assert api.requests == 1
+    assert metrics.counters['fetch.mints_cached'] > 200
+
+
+def test_rewritten_boundary_resets_the_cache(api, metrics, tmp_path):
+    cache = str(tmp_path / 'fetch.sqlite')
+    list(fetcher(api, cache).iter_mints(ASSET))
+    # The newest event below the cached height is the one the re-snapshot checks
+    events = api.chain.events
+    height = events[-1]['block_height']
+    boundary = max(i for i, event in enumerate(events) if event['block_height'] < height)
+    events[boundary]['tx_id'] = '0x' + 'be' * 32
+    events[boundary]['recipient'] = api.chain.addresses[0]
+    api.chain.add_mints(5)
+    assert list(fetcher(api, cache).iter_mints(ASSET)) == api.chain.mint_rows()
+    assert metrics.counters['fetch.cache_reset'] == 1
+
+
+def test_failed_fetch_keeps_the_previous_export(api, metrics, tmp_path):
+    output = tmp_path / 'mints.csv'
+    fetcher(api).write_mints(ASSET, str(output))
+    previous = output.read_bytes()
+    api.chain.add_mints(30)
+    api.break_after = api.requests + 5
+    with pytest.raises(FetchError):
+        fetcher(api).write_mints(ASSET, str(output))
+    assert output.read_bytes() == previous
+    assert [path.name for path in tmp_path.iterdir()] == ['mints.csv']
+
+
+def test_fetch_command_keeps_the_previous_files(api, metrics, tmp_path):
+    output, unique = tmp_path / 'mints.csv', tmp_path / 'unique.csv'
+    arguments = ['fetch', '--api', api.url, '--asset', ASSET, '--output', str(output), '--unique', str(unique),
+                 '--backoff', '0.001']
+    assert cli.main(arguments) == 0
+    previous = output.read_bytes(), unique.read_bytes()
+    api.break_after = api.requests + 2
+    assert cli.main(arguments) == 1
+    assert (output.read_bytes(), unique.read_bytes()) == previous
+    assert sorted(path.name for path in tmp_path.iterdir()) == ['mints.csv', 'unique.csv']
+
+
+def test_resnapshot_applies_only_the_newer_transfers(metrics, tmp_path):
+    # few holders with many tokens each, as in the drop lists
+    chain = StubChain(mints=400)
+    cache = str(tmp_path / 'fetch.sqlite')
+    with StubApi(chain) as api:
+        assert list(fetcher(api, cache).iter_holders(ASSET)) == chain.holder_rows()
+        chain.transfer(30)
+        chain.add_mints(6)
+        chain.transfer(3, to=principals(random.Random(9), 1)[0])  # a holder the cache has not seen
+        api.requests = 0
+        assert list(fetcher(api, cache).iter_holders(ASSET)) == chain.holder_rows()
+        assert api.requests < 200  # instead of one history request per token
+        api.requests = 0
+        assert list(fetcher(api, cache).iter_holders(ASSET)) == chain.holder_rows()
@@ -0,0 +1,56 @@
+import pytest
+
+from birdpy import generate as gen
+from birdpy.generate import RARITY_TIERS, TraitSpec, generate, quotas, rebalance, write_metadata_csv
+
+TRAITS = [TraitSpec('Rarity', RARITY_TIERS), TraitSpec('power', range(1, 11))]
+CARDS = [f"card{n}" for n in range(1, 101)]  # 10 editions each: exactly 1000 tokens
+
+
+def build(tmp_path, name):
+    collection = generate(1000, TRAITS, seed=7, card_ids=CARDS)
+    path = tmp_path / f'{name}.csv'
+    write_metadata_csv(collection, str(path), ['cardId', 'Rarity', 'power'])
+    return collection, path.read_bytes(), list(collection.editions)
+
+
+def test_numpy_and_pure_python_give_the_same_collection(tmp_path, monkeypatch):
+    pytest.importorskip('numpy')
+    collection, with_numpy, editions = build(tmp_path, 'numpy')
+    monkeypatch.setattr(gen, 'np', None)
+    plain, pure_python, plain_editions = build(tmp_path, 'python')
+    assert pure_python == with_numpy
+    assert plain_editions == editions
+
+
+def test_every_value_gets_exactly_its_quota():
+    collection = generate(1000, TRAITS, seed=7, card_ids=CARDS)
+    for spec in TRAITS:
+        assert list(collection.counts(spec.name).values()) == quotas(spec.weights, 1000)
+    assert set(collection.counts('cardId').values()) == {10}
+    assert sorted(collection.editions) == sorted(list(range(1, 11)) * 100)
+
+
+@pytest.mark.parametrize('use_numpy', [True, False])
+def test_rebalance_moves_only_the_surplus(monkeypatch, use_numpy):
+    if use_numpy:
+        pytest.importorskip('numpy')
+    else:
+        monkeypatch.setattr(gen, 'np', None)
+    collection = generate(1000, TRAITS, seed=7)
+    before = collection.values('Rarity')
+    target = TraitSpec('Rarity', [('Common', 30), ('Uncommon', 30), ('Rare', 20), ('Epic', 10), ('Super Rare', 5),
+                                  ('Legendary', 4), ('Mythic', 1)])
+    moved = rebalance(collection, target)
+    after = collection.values('Rarity')
+
+    targets = dict(zip(target.values, quotas(target.weights, 1000)))
+    counts = collection.counts('Rarity')
+    assert {value: counts[value] for value in targets} == targets and counts['Ultimate'] == 0
+    old = {value: before.count(value) for value in set(before)}
+    surplus = {value: max(old[value] - targets.get(value, 0), 0) for value in old}
+    changed = [(a, b) for a, b in zip(before, after) if a != b]
+    assert moved == len(changed) == sum(surplus.values())
+    # only values over their new quota give tokens up, and each exactly its surplus
+    assert {value: sum(1 for a, _ in changed if a == value) for value in old} == surplus
+    assert all(old.get(b, 0) < targets[b] for _, b in changed)
@@ -0,0 +1,56 @@
+import pytest
+
+from birdpy import cli
+from birdpy.imageindex import ImageIndex
+
+Image = pytest.importorskip('PIL.Image')
+
+
+def card(path, shade, size=64):
+    """A left-to-right gradient; shade shifts it without changing its dHash much."""
+    image = Image.new('L', (size, size))
+    image.putdata([min(255, x * 4 + shade) for y in range(size) for x in range(size)])
+    image.save(path, 'WEBP', lossless=True)
+
+
+@pytest.fixture
+def folders(tmp_path):
+    cards, other = tmp_path / 'cards', tmp_path / 'other'
+    cards.mkdir()
+    other.mkdir()
+    card(cards / '1.webp', 0)
+    card(cards / '2.webp', 3)
+    (cards / '3.webp').write_bytes((cards / '1.webp').read_bytes())
+    (other / '1.webp').write_bytes((cards / '1.webp').read_bytes())
+    return cards, other
+
+
+def test_queries_stay_inside_the_given_folders(tmp_path, folders):
+    cards, other = (str(folder) for folder in folders)
+    with ImageIndex(str(tmp_path / 'index.sqlite')) as index:
+        index.update([cards, other], workers=1)
+        assert list(index.duplicates([cards]).values()) == [[f"{cards}/1.webp", f"{cards}/3.webp"]]
+        assert len(next(iter(index.duplicates().values()))) == 3
+        assert index.duplicates([other]) == {}
+        pairs = [sorted((a, b)) for _, a, b in index.near_duplicates(4, [cards])]
+        assert pairs == [[f"{cards}/1.webp", f"{cards}/2.webp"]]
+        assert index.near_duplicates(4, [other]) == []
+
+
+def test_image_index_command(tmp_path, folders, capsys):
+    cards, _ = folders
+    arguments = ['image-index', '--folder', str(cards), '--index', str(tmp_path / 'index.sqlite')]
+    assert cli.main(arguments) == 0
+    assert cli.main(arguments + ['--duplicates']) == 1
+    assert f"identical: {cards}/1.webp, {cards}/3.webp" in capsys.readouterr().out
+    assert cli.main(arguments + ['--like', str(cards / '2.webp'), '--max-distance', '4']) == 0
+    assert f"{cards}/1.webp" in capsys.readouterr().out
+
+
+def test_indexing_a_parent_keeps_its_subfolders(tmp_path, folders):
+    cards, _ = folders
+    with ImageIndex(str(tmp_path / 'index.sqlite')) as index:
+        index.update([str(cards)], workers=1)
+        assert index.update([str(tmp_path)], workers=1)['removed'] == 0
+        assert index.digest_of(f"{cards}/1.webp") is not None
+        assert index.update([str(cards)], workers=1) == {'hashed': 0, 'unchanged': 3, 'removed': 0}
@@ -0,0 +1,59 @@
+import io
+import threading
+import tracemalloc
+
+from birdpy.instrument import Instrumentation
+
+
+def test_nested_stages_share_the_cpu_profiler(tmp_path):
+    instrumentation = Instrumentation(profile=('cpu',), profile_dir=str(tmp_path))
+    with instrumentation.stage('outer'):
+        with instrumentation.stage('inner'):
+            sum(range(1000))
+    assert instrumentation.stages['outer']['status'] == 'ok'
+    assert instrumentation.stages['inner']['status'] == 'ok'
+    assert 'cpu_profile' not in instrumentation.stages['inner']
+    assert (tmp_path / 'outer.prof').exists()
+
+
+def test_overlapping_stages_keep_tracemalloc_running():
+    instrumentation = Instrumentation(profile=('memory',))
+    a_started, b_started, a_done = threading.Event(), threading.Event(), threading.Event()
+    errors = []
+
+    def stage_a():
+        with instrumentation.stage('a'):
+            a_started.set()
+            b_started.wait()
+        a_done.set()
+
+    def stage_b():
+        a_started.wait()
+        try:
+            with instrumentation.stage('b'):
+                b_started.set()
+                a_done.wait()  # a ends while b is still open
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=stage_a), threading.Thread(target=stage_b)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert errors == []
+    assert instrumentation.stages['b']['status'] == 'ok'
+    assert 'peak_bytes' in instrumentation.stages['b']
+    assert not tracemalloc.is_tracing()
+
+
+def test_warnings_go_to_the_stream_and_say_when_they_stop():
+    stream = io.StringIO()
+    instrumentation = Instrumentation(stream=stream, warning_samples=2)
+    instrumentation.warn('missing', "first")
+    instrumentation.warn('missing', "second")
+    assert stream.getvalue() == "first\nsecond\n"
+    instrumentation.warn('missing', "third")
+    instrumentation.warn('missing', "fourth")
+    assert stream.getvalue() == "first\nsecond\n(further 'missing' warnings are only counted)\n"
+    assert instrumentation.counters['errors.missing'] == 4
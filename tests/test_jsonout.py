@@ -0,0 +1,52 @@
+import json
+
+import pytest
+
+from birdpy.jsonout import write_shards, write_stream
+
+
+def test_failed_stream_keeps_the_previous_file(tmp_path):
+    path = tmp_path / 'apes_metadata.json'
+    path.write_text('[{"file": "0001.webp"}, {"file": "0002.webp"}]')
+
+    def entries():
+        yield {"file": "0001.webp"}
+        raise RuntimeError("card missing")
+
+    with pytest.raises(RuntimeError):
+        write_stream(entries(), str(path))
+    assert json.loads(path.read_text()) == [{"file": "0001.webp"}, {"file": "0002.webp"}]
+    assert [p.name for p in tmp_path.iterdir()] == ['apes_metadata.json']
+
+
+def test_stream_matches_json_dump(tmp_path):
+    entries = [{"file": f"{n:04}.webp", "meta": {"attributes": [{"trait_type": "power", "value": n}]}}
+               for n in range(5)]
+    path = tmp_path / 'out.json'
+    assert write_stream(entries, str(path)) == 5
+    assert path.read_text() == json.dumps(entries, indent=2)
+
+
+def test_duplicate_shard_names_are_refused(tmp_path):
+    entries = [{"nftId": 1}, {"nftId": 2}, {"nftId": 1}]
+    with pytest.raises(ValueError, match="1.json"):
+        write_shards(entries, str(tmp_path), lambda entry: f"{entry['nftId']}.json")
+
+
+def test_shards_no_longer_produced_are_removed(tmp_path):
+    name_of = lambda entry: f"{entry['nftId']}.json"
+    assert write_shards([{"nftId": n} for n in (1, 2, 3)], str(tmp_path), name_of) == 3
+    (tmp_path / 'notes.txt').write_text("kept")
+    assert write_shards([{"nftId": n} for n in (1, 3)], str(tmp_path), name_of, compact=True) == 2
+    assert sorted(p.name for p in tmp_path.iterdir()) == ['1.json', '3.json', 'notes.txt']
+    assert json.loads((tmp_path / '3.json').read_text()) == {"nftId": 3}
+
+
+def test_empty_shard_names_are_refused_and_none_is_skipped(tmp_path):
+    (tmp_path / '1.json').write_text('{}')
+    with pytest.raises(ValueError, match="'.json'"):
+        write_shards([{"nftId": 2}, {"nftId": ""}], str(tmp_path), lambda entry: f"{entry['nftId']}.json")
+    assert (tmp_path / '1.json').exists()
+    name_of = lambda entry: f"{entry['nftId']}.json" if entry['nftId'] else None
+    assert write_shards([{"nftId": 2}, {"nftId": ""}], str(tmp_path), name_of) == 1
+    assert [p.name for p in tmp_path.iterdir()] == ['2.json']
@@ -0,0 +1,49 @@
+import json
+import os
+import runpy
+
+import pytest
+
+from birdpy import metaindex
+from birdpy.metaindex import export_rarity
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.fixture
+def folder(tmp_path):
+    folder = tmp_path / 'metadata'
+    folder.mkdir()
+    for token_id, rarity in ((2, 'Epic'), (1, 'Common'), (3, 'Rare')):
+        (folder / f'{token_id}.json').write_text(json.dumps(
+            {"tokenId": token_id, "attributes": [{"trait_type": "Rarity", "value": rarity}]}))
+    return folder
+
+
+def test_exports_in_token_order(tmp_path, folder):
+    metadata_csv, rarity_csv = tmp_path / 'metadata.csv', tmp_path / 'newdata.csv'
+    export_rarity(str(folder), metadata_csv=str(metadata_csv), rarity_csv=str(rarity_csv))
+    assert metadata_csv.read_text().splitlines() == ['tokenId,Rarity', '1,Common', '2,Epic', '3,Rare']
+    assert rarity_csv.read_text().splitlines() == ['Rarity', 'Common', 'Epic', 'Rare']
+
+
+def test_failed_export_keeps_the_previous_csv(tmp_path, folder, monkeypatch):
+    metadata_csv = tmp_path / 'metadata.csv'
+    metadata_csv.write_text('tokenId,Rarity\n1,Common\n')
+
+    def broken_writer(f):
+        f.write('tokenId,')
+        raise OSError("disk full")
+
+    monkeypatch.setattr(metaindex.csv, 'writer', broken_writer)
+    with pytest.raises(OSError):
+        export_rarity(str(folder), metadata_csv=str(metadata_csv))
+    assert metadata_csv.read_text() == 'tokenId,Rarity\n1,Common\n'
+    assert sorted(path.name for path in tmp_path.iterdir()) == ['metadata', 'metadata.csv']
+
+
+@pytest.mark.parametrize('script', ['mergedata.py', 'newdata.py'])
+def test_scripts_report_success(tmp_path, folder, script):
+    json_to_csv = runpy.run_path(os.path.join(ROOT, 'nftspy', script))['json_to_csv']
+    assert json_to_csv(str(folder), str(tmp_path / 'out.csv')) is True
+    assert json_to_csv(str(tmp_path / 'missing'), str(tmp_path / 'out.csv')) is False
@@ -0,0 +1,79 @@
+import random
+
+import pytest
+
+from birdpy import principal
+from birdpy.principal import (InvalidPrincipal, Principal, c32_decode, c32_encode, decode_address,
+                              encode_address, intern_principal)
+
+# A mainnet address from the drop lists and a contract principal on it
+ADDRESS = 'SP3J9CZ0HNRZX7S5YBAFPT3SJ4KP1PBSRVP3TQAT7'
+CONTRACT = f'{ADDRESS}.stacks-stones'
+
+
+@pytest.mark.parametrize('seed', range(50))
+def test_c32_round_trip(seed):
+    rnd = random.Random(seed)
+    data = b'\0' * rnd.randrange(3) + rnd.randbytes(rnd.randrange(25))
+    assert c32_decode(c32_encode(data)) == data
+
+
+def test_address_round_trip():
+    raw = decode_address(ADDRESS)
+    assert len(raw) == principal.PRINCIPAL_SIZE
+    assert raw[0] == principal.MAINNET_SINGLESIG
+    assert encode_address(raw) == ADDRESS
+    for version in (principal.MAINNET_MULTISIG, principal.TESTNET_SINGLESIG, principal.TESTNET_MULTISIG):
+        other = bytes([version]) + raw[1:]
+        assert decode_address(encode_address(other)) == other
+
+
+def test_lower_case_and_look_alike_spellings_are_the_same_principal():
+    spelling = ADDRESS.lower().replace('0', 'o')
+    assert intern_principal(spelling) is intern_principal(ADDRESS)
+    assert str(intern_principal(spelling)) == ADDRESS
+
+
+def test_bad_checksum_is_rejected():
+    last = principal.C32_ALPHABET[(principal.C32_ALPHABET.index(ADDRESS[-1]) + 1) % 32]
+    with pytest.raises(InvalidPrincipal, match="checksum"):
+        decode_address(ADDRESS[:-1] + last)
+
+
+@pytest.mark.parametrize('text', [ADDRESS[:-1] + 'U', ADDRESS[:10] + '!' + ADDRESS[11:]])
+def test_bad_character_is_rejected(text):
+    with pytest.raises(InvalidPrincipal, match="character"):
+        decode_address(text)
+
+
+@pytest.mark.parametrize('text', ['', 'SP', 'BP3J9CZ0HNRZX7S5YBAFPT3SJ4KP1PBSRVP3TQAT7', ADDRESS[:-2]])
+def test_not_an_address(text):
+    with pytest.raises(InvalidPrincipal):
+        intern_principal(text)
+
+
+def test_contract_principals():
+    contract = intern_principal(CONTRACT)
+    assert contract.is_contract
+    assert contract.contract == 'stacks-stones'
+    assert contract.raw == intern_principal(ADDRESS).raw
+    assert contract != intern_principal(ADDRESS)
+    assert contract.key == decode_address(ADDRESS) + b'.stacks-stones'
+    assert str(Principal(contract.raw, contract.contract)) == CONTRACT
+
+
+@pytest.mark.parametrize('name', ['', '1stones', 'stacks stones', 'x' * 129])
+def test_bad_contract_names_are_rejected(name):
+    with pytest.raises(InvalidPrincipal, match="contract name"):
+        intern_principal(f'{ADDRESS}.{name}')
+
+
+def test_interning_table_is_bounded(monkeypatch):
+    monkeypatch.setattr(principal, 'MAX_INTERNED', 3)
+    principal.clear_interned()
+    rnd = random.Random(0)
+    for _ in range(10):
+        intern_principal(encode_address(bytes([principal.MAINNET_SINGLESIG]) + rnd.randbytes(20)))
+        intern_principal(ADDRESS.lower())  # other spellings take no entry of their own
+        assert len(principal._interned) <= 3
+    principal.clear_interned()
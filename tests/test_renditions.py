@@ -0,0 +1,55 @@
+import os
+
+import pytest
+
+from birdpy.renditions import CACHE_NAME, Profile, render_fan_out
+
+Image = pytest.importorskip('PIL.Image')
+
+PROFILES = [Profile('web', None, 85), Profile('thumbnail', 32, 80)]
+PLAN = [('Common.png', 'Stone 0001 Common.png'), ('Common copy.png', 'Stone 0002 Common.png'),
+        ('Rare.png', 'Stone 0003 Rare.png'), ('Common.png', 'Stone 0004 Common.png')]
+
+
+def stone(path, color):
+    Image.new('RGB', (96, 64), color).save(path, 'PNG')
+
+
+@pytest.fixture
+def sources(tmp_path):
+    folder = tmp_path / 'webp'
+    folder.mkdir()
+    stone(folder / 'Common.png', 'gray')
+    stone(folder / 'Common copy.png', 'gray')
+    stone(folder / 'Rare.png', 'blue')
+    return folder
+
+
+def test_each_distinct_source_is_rendered_once_per_profile(tmp_path, sources):
+    output = tmp_path / 'renders'
+    result = render_fan_out(PLAN, str(sources), str(output), PROFILES, workers=2)
+    assert result.ok and (result.sources, result.rendered, result.cached) == (2, 4, 0)
+    assert len(os.listdir(output / CACHE_NAME)) == 4
+    with Image.open(output / 'thumbnail' / 'Stone 0003 Rare.webp') as thumbnail:
+        assert thumbnail.size == (32, 21)
+    web = output / 'web'
+    assert os.stat(web / 'Stone 0001 Common.webp').st_ino == os.stat(web / 'Stone 0002 Common.webp').st_ino
+
+    result = render_fan_out(PLAN, str(sources), str(output), PROFILES, workers=2)
+    assert (result.rendered, result.cached) == (0, 4)
+    assert all(fanned.resumed == 4 for fanned in result.fan_out.values())
+
+
+def test_changed_sources_and_profiles_render_again(tmp_path, sources):
+    output = tmp_path / 'renders'
+    render_fan_out(PLAN, str(sources), str(output), PROFILES, workers=1)
+    stone(sources / 'Rare.png', 'red')
+    result = render_fan_out(PLAN, str(sources), str(output), PROFILES, workers=1)
+    assert (result.rendered, result.cached) == (2, 2)
+    with Image.open(output / 'web' / 'Stone 0003 Rare.webp') as web:
+        assert web.convert('RGB').getpixel((0, 0))[0] > 200
+
+    result = render_fan_out(PLAN, str(sources), str(output), [PROFILES[0], Profile('thumbnail', 48, 80)], workers=1)
+    assert (result.rendered, result.cached) == (2, 2)
+    with Image.open(output / 'thumbnail' / 'Stone 0001 Common.webp') as thumbnail:
+        assert thumbnail.size == (48, 32)
@@ -0,0 +1,62 @@
+import random
+
+import pytest
+
+from birdpy.dropgen import DropSpec
+from birdpy.snapshots import HolderStore
+from birdpy.synthetic import principals
+
+SPEC = DropSpec('SP3J9CZ0HNRZX7S5YBAFPT3SJ4KP1PBSRVP3TQAT7.stacks-stones', 'stones')
+
+
+@pytest.fixture
+def holders(tmp_path):
+    path = tmp_path / 'apeslist.csv'
+    path.write_text(''.join(f"{holder}\n" for holder in principals(random.Random(4), 6)))
+    return path
+
+
+def test_interrupted_drop_is_written_again_not_twice(tmp_path, holders, monkeypatch):
+    folder, contracts = str(tmp_path / 'store'), tmp_path / 'contracts'
+    store = HolderStore(folder)
+    store.add_snapshot(str(holders))
+
+    def crash():
+        raise OSError("killed")
+
+    monkeypatch.setattr(store, '_save', crash)
+    with pytest.raises(OSError):
+        store.drop(SPEC, str(contracts), start_id=174)
+    written = {path.name: path.read_text() for path in contracts.iterdir()}
+
+    monkeypatch.undo()
+    store = HolderStore(folder)
+    assert store.drops == [] and store.next_id is None
+    _, recipients = store.drop(SPEC, str(contracts), start_id=174)
+    assert len(recipients) == 6
+    assert {path.name: path.read_text() for path in contracts.iterdir()} == written
+
+    store = HolderStore(folder)
+    assert store.next_id == 180
+    assert store.drop(SPEC, str(contracts)) == ([], [])
+    assert sorted(path.name for path in (tmp_path / 'store').iterdir()) == ['0001.bin', 'issued-001.bin', 'store.json']
+
+
+def test_store_with_a_single_ledger_file_keeps_working(tmp_path, holders):
+    folder = tmp_path / 'store'
+    store = HolderStore(str(folder))
+    store.add_snapshot(str(holders))
+    store.drop(SPEC, str(tmp_path / 'contracts'), start_id=1)
+    # the layout before the ledger was versioned
+    (folder / 'issued-001.bin').rename(folder / 'issued.bin')
+    del store.manifest["issued"]
+    store._save()
+
+    store = HolderStore(str(folder))
+    assert store.pending() == []
+    more = tmp_path / 'more.csv'
+    more.write_text(holders.read_text() + f"{principals(random.Random(5), 1)[0]}\n")
+    store.add_snapshot(str(more))
+    _, recipients = store.drop(SPEC, str(tmp_path / 'contracts'))
+    assert len(recipients) == 1
+    assert not (folder / 'issued.bin').exists()
@@ -0,0 +1,48 @@
+import json
+
+import pytest
+
+from birdpy import store as store_module
+from birdpy.store import CollectionStore
+
+
+@pytest.fixture
+def store(tmp_path):
+    with CollectionStore(str(tmp_path / 'collection.sqlite')) as store:
+        yield store
+
+
+def apes_entry(nft_id, rarity):
+    attributes = [{"trait_type": "rarity", "value": rarity}]
+    if nft_id is not None:
+        attributes.append({"trait_type": "nftId", "value": nft_id})
+    return {"file": f"{rarity}.webp", "meta": {"name": rarity, "attributes": attributes}}
+
+
+def test_apes_json_keeps_token_id_zero(tmp_path, store):
+    path = tmp_path / 'apes_metadata.json'
+    path.write_text(json.dumps([apes_entry('0', 'Common'), apes_entry('7', 'Rare'), apes_entry(None, 'Epic')]))
+    assert store.import_apes_json('apes', str(path)) == 3
+    assert store.trait('apes', 0, 'rarity') == 'Common'
+    assert store.trait('apes', 7, 'rarity') == 'Rare'
+    assert store.trait('apes', 3, 'rarity') == 'Epic'  # no id: its position
+    assert store.trait('apes', 1, 'rarity') is None
+
+
+def test_failed_export_keeps_the_previous_file(tmp_path, store, monkeypatch):
+    metadata = tmp_path / 'metadata.csv'
+    metadata.write_text('tokenId,Rarity\n1,Common\n2,Epic\n')
+    store.import_metadata_csv('stones', str(metadata))
+    output = tmp_path / 'export.csv'
+    output.write_text('previous\n')
+
+    def broken_writer(f):
+        f.write('tokenId,')
+        raise OSError("disk full")
+
+    monkeypatch.setattr(store_module.csv, 'writer', broken_writer)
+    with pytest.raises(OSError):
+        store.export_metadata_csv('stones', str(output))
+    assert output.read_text() == 'previous\n'
+    assert sorted(path.name for path in tmp_path.iterdir() if not path.name.startswith('collection')) == [
+        'export.csv', 'metadata.csv']
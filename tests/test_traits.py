@@ -0,0 +1,77 @@
+import json
+import random
+
+import pytest
+
+from birdpy import cli, traits
+from birdpy.traits import TraitTable
+
+RARITIES = ['Common', 'Uncommon', 'Rare', 'Epic', 'Legendary']
+
+
+def collection(seed=3, tokens=500):
+    """Tokens with uneven rarities, numeric powers and a trait most of them lack."""
+    rnd = random.Random(seed)
+    table = TraitTable()
+    for token_id in rnd.sample(range(1, tokens * 4), tokens):
+        attributes = [('Rarity', rnd.choices(RARITIES, weights=[50, 25, 15, 7, 3])[0]),
+                      ('power', rnd.randrange(1, 6))]
+        if rnd.random() < 0.1:
+            attributes.append(('Halo', rnd.choice(['gold', 'silver'])))
+        table.add_token(token_id, attributes)
+    return table
+
+
+def answers(table):
+    epic = table.where('Rarity', {'Epic', 'Legendary'})
+    return (list(epic.rows()), epic.counts('power'), table.counts('Halo'), table.rarity_scores(),
+            list(table.filter(Halo={None}, power={5}).rows()), epic.rarity_scores(['power', 'Halo']))
+
+
+def test_numpy_and_pure_python_agree(monkeypatch):
+    pytest.importorskip('numpy')
+    table = collection()
+    with_numpy = answers(table)
+    monkeypatch.setattr(traits, 'np', None)
+    assert answers(table) == with_numpy
+
+
+def test_queries(monkeypatch):
+    table = TraitTable()
+    table.add_token(3, [('Rarity', 'Epic'), ('power', 2)])
+    table.add_token(1, [('Rarity', 'Common'), ('power', 2)])
+    table.add_token(2, [('Rarity', 'Common')])
+    assert table.counts('Rarity') == {'Common': 2, 'Epic': 1}
+    assert table.counts('power') == {2: 2, None: 1}
+    assert list(table.where('Rarity', {'Epic', 'Legendary'}).rows()) == [(3, 'Epic', 2)]
+    # 3 / 1 + 3 / 2 for token 3; 3 / 2 + 3 / 1 for token 2; ties by token id
+    assert table.rarity_scores() == [(2, 4.5), (3, 4.5), (1, 3.0)]
+
+
+@pytest.fixture
+def apes_json(tmp_path):
+    entries = [{"file": f"{n:04}.webp", "meta": {"name": f"Ape #{n}", "attributes": [
+        {"trait_type": "nftId", "value": str(n)}, {"trait_type": "rarity", "value": rarity},
+        {"trait_type": "power", "value": str(power)}]}}
+        for n, rarity, power in [(1, 'Common', 1), (2, 'Common', 2), (3, 'Epic', 2), (4, 'Legendary', 5)]]
+    path = tmp_path / 'apes_metadata.json'
+    path.write_text(json.dumps(entries))
+    return path
+
+
+def test_traits_command(tmp_path, apes_json, capsys):
+    out = tmp_path / 'rare.csv'
+    arguments = ['traits', '--apes-json', str(apes_json), '--where', 'rarity=Epic,Legendary', '--counts', 'power',
+                 '--rarity', '--csv', str(out), '--format', 'json']
+    assert cli.main(arguments) == 0
+    report = json.loads(capsys.readouterr().out)
+    assert report["tokens"] == 4 and report["matching"] == 2
+    assert report["counts"] == {"power": [["2", 1], ["5", 1]]}
+    assert [token_id for token_id, _ in report["rarity"]] == [4, 3]
+    assert out.read_text().splitlines() == ['tokenId,rarity,power', '3,Epic,2', '4,Legendary,5']
+
+    assert cli.main(['traits', '--apes-json', str(apes_json), '--counts', 'rarity', '--rarity', '--top', '1']) == 0
+    text = capsys.readouterr().out
+    assert "Tokens: 4\nrarity:\n  Common: 2\n" in text and "Rarest tokens:\n  4: " in text
+    assert cli.main(['traits', '--apes-json', str(apes_json), '--counts', 'Rarity']) == 2
+    assert "unknown trait_type 'Rarity'" in capsys.readouterr().err
@@ -0,0 +1,43 @@
+import shutil
+
+from birdpy.fanout import fan_out
+from birdpy.verify import verify
+
+PLAN = [('Common.webp', f'{n}.webp') for n in (1, 2, 3)] + [('Rare.webp', '4.webp'), ('Epic.webp', '5.webp')]
+
+
+def test_report_categories(tmp_path):
+    src, dst = tmp_path / 'webp', tmp_path / 'nfts'
+    src.mkdir()
+    for rarity in ('Common', 'Rare', 'Epic'):
+        (src / f'{rarity}.webp').write_bytes(rarity.encode() * 10)
+    assert fan_out(PLAN, str(src), str(dst), workers=1).ok
+    report = verify(PLAN, str(src), str(dst), workers=1)
+    assert report.ok and (report.checked, report.matched, report.hashed) == (5, 5, 0)
+
+    (dst / '1.webp').unlink()
+    (dst / '2.webp').unlink()
+    (dst / '2.webp').write_bytes(b'Uncommon' * 10)        # not what the metadata says
+    (dst / '3.webp').unlink()
+    shutil.copy(src / 'Common.webp', dst / '3.webp')     # a copy instead of a hardlink is fine
+    (src / 'Rare.webp').unlink()
+    (src / 'Rare.webp').write_bytes(b'Rare v2' * 10)     # 4.webp still holds the old stone
+    (dst / 'Stone 0006 Common.webp').write_bytes(b'Common' * 10)
+    plan = PLAN + [('Ultimate.webp', '6.webp'), ('Ultimate.webp', '7.webp')]
+
+    report = verify(plan, str(src), str(dst), workers=2)
+    assert report.to_dict() == {
+        "ok": False, "checked": 4, "matched": 2, "hashed": 5,
+        "missing": [{"file": "1.webp", "source": "Common.webp"}],
+        "extra": [{"file": "Stone 0006 Common.webp"}],
+        "mismatched": [{"file": "2.webp", "source": "Common.webp"}],
+        "stale": [{"file": "4.webp", "source": "Rare.webp"}],
+        "missing_sources": [{"source": "Ultimate.webp", "files": 2}],
+    }
+    # destinations are hashed again only when they change
+    assert verify(plan, str(src), str(dst), workers=2).hashed == 2
+
+    # the journal still vouches for 2.webp, so the repair has to check every file
+    assert fan_out(PLAN, str(src), str(dst), workers=1, resume=False).ok
+    (dst / 'Stone 0006 Common.webp').unlink()
+    assert verify(PLAN, str(src), str(dst), workers=1).ok
@@ -1,28 +1,31 @@
-import csv
+import os
+import sys
 
-def extrair_enderecos_unicos(arquivo_entrada, arquivo_saida):
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from birdpy.dedup import DEFAULT_MEMORY_BUDGET, dedup_csv
+
+def extrair_enderecos_unicos(arquivo_entrada, arquivo_saida, com_contagem=False, limite_memoria=DEFAULT_MEMORY_BUDGET):
   """
   Extrai endereços únicos de um arquivo CSV e salva em um novo arquivo.
 
+  Os endereços saem na ordem em que aparecem pela primeira vez, então a saída
+  é a mesma a cada execução. Acima de limite_memoria endereços distintos a
+  contagem passa para uma tabela temporária em disco. Endereços inválidos
+  (checksum c32check) interrompem a leitura com InvalidPrincipal.
+
   Args:
     arquivo_entrada: Caminho para o arquivo CSV de entrada.
     arquivo_saida: Caminho para o arquivo CSV de saída.
+    com_contagem: Escreve também quantas linhas cada endereço tinha (ex.: mints por holder).
+    limite_memoria: Endereços distintos mantidos em memória antes de usar o disco.
   """
 
-  enderecos = set()  # Um conjunto para armazenar endereços únicos
-  with open(arquivo_entrada, 'r') as entrada:
-    leitor = csv.reader(entrada)
-    # Assumindo que a coluna de endereços é a primeira, ajuste o índice se necessário
-    for linha in leitor:
-      endereco = linha[0]
-      enderecos.add(endereco)
-
-  with open(arquivo_saida, 'w', newline='') as saida:
-    escritor = csv.writer(saida)
-    for endereco in enderecos:
-      escritor.writerow([endereco])
+  # Assumindo que a coluna de endereços é a primeira, ajuste o índice se necessário
+  return dedup_csv(arquivo_entrada, arquivo_saida, column=0, with_counts=com_contagem, memory_budget=limite_memoria, validate=True)
 
-# Exemplo de uso
-arquivo_entrada = 'C:\\Users\\jhosephethierry\\Documents\\Bird\\python\\tlbpy\\tlbmints.csv'
-arquivo_saida = 'C:\\Users\\jhosephethierry\\Documents\\Bird\\python\\tlbpy\\tlbhlist.csv'
-extrair_enderecos_unicos(arquivo_entrada, arquivo_saida)
\ No newline at end of file
+if __name__ == "__main__":
+  # Exemplo de uso: python list.py [entrada.csv] [saida.csv], por padrão os arquivos ao lado do script
+  pasta = os.path.dirname(os.path.abspath(__file__))
+  arquivo_entrada = sys.argv[1] if len(sys.argv) > 1 else os.path.join(pasta, 'tlbmints.csv')
+  arquivo_saida = sys.argv[2] if len(sys.argv) > 2 else os.path.join(pasta, 'tlbhlist.csv')
+  extrair_enderecos_unicos(arquivo_entrada, arquivo_saida)
\ No newline at end of file